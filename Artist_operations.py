@@ -1,7 +1,11 @@
-import json
 from datetime import date
 
+from Diff_operations import get_uri, merge_unique
 from IO_operations import find_latest_content_file, save_uri_content_to_hard_drive
+from IO_operations import get_item_uris_from_cont_file, save_uri_content_in_background
+from IO_operations import save_uri_content_to_hard_drive_async
+from Playlist_operations import get_song_data_from_track
+from Request_operations import iterate_pages, iterate_pages_async
 from URI_operations import *
 
 
@@ -55,25 +59,16 @@ def get_all_albums_from_artist(sp, a_uri, album_type=None):
     #    },
     #    ...
     #    ]
+    # artist_albums yields the first page of the artist's albums, the other pages are requested while iterating
     results_dict = sp.artist_albums(artist_id=get_artist_id_from_uri(a_uri), album_type=album_type)
 
-    # get the playlists tracks
-    albums = results_dict["items"]
-
     # data is a list of dictionaries, each representing an album.
-    data = []
-    for n, track in enumerate(albums):
-        data.insert(n, {"uri": albums[n]["uri"],
-                        "name": albums[n]["name"],
-                        "artists": [art["name"] for art in albums[n]["artists"]],
-                        "album_group": albums[n]["album_group"],
-                        "album_type": albums[n]["album_type"]
-                        })
+    data = [_get_album_data(album) for album in iterate_pages(sp, results_dict)]
 
     return data
 
 
-def get_new_albums(sp, a_uri, since_date=None, as_dict=False):
+def get_new_albums(sp, a_uri, since_date=None, as_dict=False, save_content=False):
     """
     Albums that have newly been released by the artist or feature them will be returned as a list of album URIs.
     Alternatively a list of dictionaries can be returned using the ``as_dict`` flag, which are holding
@@ -90,10 +85,13 @@ def get_new_albums(sp, a_uri, since_date=None, as_dict=False):
     :param sp: the Spotify API client
     :param since_date: a date
     :param as_dict: flag to return a dictionary with more information about an album
+    :param save_content: flag to save the artist's current albums as well. The albums that have been fetched to find
+                         the new albums are saved in the background, see IO_operations.save_uri_content_in_background()
     :type a_uri: str
     :type sp: spotipy.Spotify
     :type since_date: date
     :type as_dict: bool
+    :type save_content: bool
     :return: an empty list when no content file is found, a list of uris or a list of dictionaries
     """
     # search for a content file
@@ -103,30 +101,22 @@ def get_new_albums(sp, a_uri, since_date=None, as_dict=False):
         latest_content_file = find_latest_content_file(a_uri, since_date)
 
     # if a content file exists for the uri:
-    if latest_content_file:
+    if latest_content_file and save_content:
+        # the albums are kept as Spotify sent them, so they can be saved without requesting them again
+        albums = list(iterate_pages(sp, sp.artist_albums(artist_id=get_artist_id_from_uri(a_uri))))
+        save_uri_content_in_background(a_uri, albums)
 
-        # read old artist data from file
-        with open(latest_content_file, "r") as old_artist_file:
-            old_data = json.load(old_artist_file)
-            old_album_uris = [album_data["uri"] for album_data in old_data["items"]]
+        artist_data = [_get_album_data(album) for album in albums]
+        return _select_new_albums(artist_data, latest_content_file, as_dict)
 
+    elif latest_content_file:
         # get the uri, name and artist(s) of every album released by or featuring the artist
         # entries of artist_data: {"uri" : <song_uri>,
         #                          "name": <song_name>,
         #                          "artists: <song_artist(s)>}
         artist_data = get_all_albums_from_artist(sp, a_uri)
 
-        # check the playlist for new songs by checking whether their uri was already in the old content_file
-        new_albums = [data for data in artist_data if not old_album_uris.__contains__(data["uri"])]
-
-        # remove duplicate entries using list comprehension
-        no_duplicates = [s for n, s in enumerate(new_albums) if s not in new_albums[:n]]
-
-        if as_dict:
-            return no_duplicates
-        else:
-            # only return the uris of the new albums
-            return [elem["uri"] for elem in no_duplicates]
+        return _select_new_albums(artist_data, latest_content_file, as_dict)
 
     else:
         # if there are no records of the artist yet, create the first record
@@ -141,7 +131,10 @@ def get_all_songs_from_album(sp, alb_uri):
     Dictionary fields:
         - "uri" : str
         - "name" : str
-        - "artists" : list(str)
+        - "artists" : tuple(str)
+
+    The dictionaries are the shared, read-only song records of the intern table (see
+    Playlist_operations.get_song_data_from_track()). ``dict(song)`` returns a copy that can be changed or saved as json.
 
     **If no content file is found for the album, a new content file is created.**
 
@@ -153,16 +146,8 @@ def get_all_songs_from_album(sp, alb_uri):
     """
     results_dict = sp.album_tracks(album_id=alb_uri)  # album_id can be an ID, URI or URL
 
-    # get the album tracks
-    tracks = results_dict["items"]
-
     # data is a list of dictionaries, each representing a song.
-    data = []
-    for n, track in enumerate(tracks):
-        data.insert(n, {"uri": tracks[n]["uri"],
-                        "name": tracks[n]["name"],
-                        "artists": [art["name"] for art in tracks[n]["artists"]]
-                        })
+    data = [get_song_data_from_track(track) for track in iterate_pages(sp, results_dict)]
 
     return data
 
@@ -178,7 +163,10 @@ def get_artists_songs_from_album(sp, alb_uri, art_uri):
     Dictionary fields:
         - "uri" : str
         - "name" : str
-        - "artists" : list(str)
+        - "artists" : tuple(str)
+
+    The dictionaries are the shared, read-only song records of the intern table (see
+    Playlist_operations.get_song_data_from_track()). ``dict(song)`` returns a copy that can be changed or saved as json.
 
     **If no content file is found for the album, a new content file is created.**
 
@@ -192,16 +180,142 @@ def get_artists_songs_from_album(sp, alb_uri, art_uri):
     """
     results_dict = sp.album_tracks(album_id=alb_uri)  # album_id can be an ID, URI or URL
 
-    # get the album tracks
-    tracks = results_dict["items"]
-
     # data is a list of dictionaries, each representing a song.
-    data = []
-    for n, track in enumerate(tracks):
-        if [artist["uri"] for artist in tracks[n]["artists"]].__contains__(art_uri):
-            data.insert(n, {"uri": tracks[n]["uri"],
-                            "name": tracks[n]["name"],
-                            "artists": [art["name"] for art in tracks[n]["artists"]]
-                            })
+    data = [get_song_data_from_track(track) for track in iterate_pages(sp, results_dict)
+            if [artist["uri"] for artist in track["artists"]].__contains__(art_uri)]
 
     return data
+
+
+async def get_all_albums_from_artist_async(asp, a_uri, album_type=None):
+    """
+    Async variant of get_all_albums_from_artist(). Returns a list of dictionaries holding each albums uri, name,
+    artist(s), group and type.
+
+    :param a_uri: the spotify uri of the artist
+    :param asp: the asyncio based Spotify API client
+    :param album_type: filter for albums (values: "album", "single", "compilation"
+    :type a_uri: str
+    :type asp: Async_operations.AsyncSpotify
+    :type album_type: str
+    :return: a list of dictionaries each representing an album by the artist
+    """
+    results_dict = await asp.artist_albums(artist_id=get_artist_id_from_uri(a_uri), album_type=album_type)
+    return [_get_album_data(album) async for album in iterate_pages_async(asp, results_dict)]
+
+
+async def get_new_albums_async(asp, a_uri, since_date=None, as_dict=False, save_content=False):
+    """
+    Async variant of get_new_albums(). Albums that have newly been released by the artist or feature them will be
+    returned as a list of album URIs or, using the ``as_dict`` flag, as a list of dictionaries holding each albums uri,
+    name and artist(s)
+
+    **If no content file is found for the artist, a new content file is created.**
+
+    :param a_uri: the spotify uri of the artist
+    :param asp: the asyncio based Spotify API client
+    :param since_date: a date
+    :param as_dict: flag to return a dictionary with more information about an album
+    :param save_content: flag to save the artist's current albums as well, see get_new_albums()
+    :type a_uri: str
+    :type asp: Async_operations.AsyncSpotify
+    :type since_date: date
+    :type as_dict: bool
+    :type save_content: bool
+    :return: an empty list when no content file is found, a list of uris or a list of dictionaries
+    """
+    latest_content_file = find_latest_content_file(a_uri, since_date)
+
+    if latest_content_file and save_content:
+        first_page = await asp.artist_albums(artist_id=get_artist_id_from_uri(a_uri))
+        albums = [album async for album in iterate_pages_async(asp, first_page)]
+        save_uri_content_in_background(a_uri, albums)
+
+        artist_data = [_get_album_data(album) for album in albums]
+        return _select_new_albums(artist_data, latest_content_file, as_dict)
+
+    elif latest_content_file:
+        artist_data = await get_all_albums_from_artist_async(asp, a_uri)
+        return _select_new_albums(artist_data, latest_content_file, as_dict)
+
+    else:
+        # if there are no records of the artist yet, create the first record
+        await save_uri_content_to_hard_drive_async(asp, a_uri)
+        return []
+
+
+async def get_all_songs_from_album_async(asp, alb_uri):
+    """
+    Async variant of get_all_songs_from_album(). Returns a list of dictionaries holding uri, name and artist(s) of
+    each track in the album
+
+    :param alb_uri: the spotify uri of the album
+    :param asp: the asyncio based Spotify API client
+    :type alb_uri: str
+    :type asp: Async_operations.AsyncSpotify
+    :return: a list of dictionaries each representing a track in the album
+    """
+    results_dict = await asp.album_tracks(album_id=alb_uri)  # album_id can be an ID, URI or URL
+    return [get_song_data_from_track(track) async for track in iterate_pages_async(asp, results_dict)]
+
+
+async def get_artists_songs_from_album_async(asp, alb_uri, art_uri):
+    """
+    Async variant of get_artists_songs_from_album(). Returns a list of dictionaries holding uri, name and artist(s) of
+    each track in the album that features the artist specified by ``art_uri``.
+
+    :param alb_uri: the spotify uri of the album
+    :param asp: the asyncio based Spotify API client
+    :param art_uri: the artist's uri
+    :type alb_uri: str
+    :type asp: Async_operations.AsyncSpotify
+    :type art_uri: str
+    :return: a list of dictionaries each representing a track released by the artist in the album
+    """
+    results_dict = await asp.album_tracks(album_id=alb_uri)  # album_id can be an ID, URI or URL
+    return [get_song_data_from_track(track) async for track in iterate_pages_async(asp, results_dict)
+            if [artist["uri"] for artist in track["artists"]].__contains__(art_uri)]
+
+
+def _get_album_data(album):
+    """
+    Reduces an album object, as returned by the Spotify API, to the album's uri, name, artist(s), group and type
+
+    :param album: an item of the artist's albums
+    :type album: dict
+    :return: a dictionary with the fields "uri", "name", "artists", "album_group" and "album_type"
+    """
+    return {"uri": album["uri"],
+            "name": album["name"],
+            "artists": [art["name"] for art in album["artists"]],
+            "album_group": album["album_group"],
+            "album_type": album["album_type"]
+            }
+
+
+def _select_new_albums(artist_data, content_file, as_dict):
+    """
+    Selects the albums that are not part of the content file
+
+    :param artist_data: the artist's current albums, as returned by get_all_albums_from_artist()
+    :param content_file: the content file the albums are compared to
+    :param as_dict: flag to return a dictionary with more information about an album
+    :type artist_data: list[dict]
+    :type content_file: pathlib.Path
+    :type as_dict: bool
+    :return: a list of uris or a list of dictionaries
+    """
+    # the uris of the old artist data, taken from the snapshot store instead of reading the whole file
+    old_album_uris = set(get_item_uris_from_cont_file(content_file))
+
+    # check the playlist for new songs by checking whether their uri was already in the old content_file
+    new_albums = (data for data in artist_data if data["uri"] not in old_album_uris)
+
+    # remove duplicate entries, the first occurrence of an album is kept
+    no_duplicates = merge_unique([new_albums], key=get_uri)
+
+    if as_dict:
+        return no_duplicates
+    else:
+        # only return the uris of the new albums
+        return [elem["uri"] for elem in no_duplicates]
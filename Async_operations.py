@@ -0,0 +1,368 @@
+import asyncio
+import functools
+import json
+import ssl
+import threading
+import time
+import urllib.parse
+
+import spotipy
+
+import Request_operations
+
+# the Spotify Web API, every path of a request is relative to this URL
+SPOTIFY_API_URL = "https://api.spotify.com/v1/"
+
+# the number of requests that can be sent to Spotify at the same time by one AsyncSpotify object
+DEFAULT_MAX_IN_FLIGHT = 200
+
+# an access token is valid for one hour. It is read again from the auth manager after this many seconds, the auth
+# manager refreshes it if needed
+_TOKEN_CACHE_SECONDS = 60
+
+
+class AsyncSpotify(object):
+    """
+    An asyncio based client for the Spotify Web API. It offers the read methods of spotipy.Spotify that are used by
+    this program, with the same names and parameters, but as coroutines. Many requests can be in flight at the same
+    time on a single event loop, no thread is needed per request.
+
+    Connections are kept open and reused. An AsyncSpotify object must only be used on one event loop until it is closed,
+    use SyncSpotify or Run_operations.run_groups_async() to call it from synchronous code.
+
+    Every request is sent through the request scheduler (see Request_operations.RequestScheduler). Errors returned by
+    Spotify are raised as spotipy.SpotifyException, the same way spotipy.Spotify does.
+    """
+
+    def __init__(self, auth_manager=None, access_token=None, base_url=SPOTIFY_API_URL,
+                 max_in_flight=DEFAULT_MAX_IN_FLIGHT, timeout=10, scheduler=None):
+        """
+        Creates an AsyncSpotify object
+
+        :param auth_manager: the auth manager of a spotipy.Spotify object, i.e. SpotifyOAuth or SpotifyClientCredentials
+        :type auth_manager: spotipy.oauth2.SpotifyAuthBase
+        :param access_token: a fixed access token, used instead of an auth manager
+        :type access_token: str
+        :param base_url: the URL of the API, can be set to the URL of a local server for testing
+        :type base_url: str
+        :param max_in_flight: the maximum number of requests that are sent at the same time
+        :type max_in_flight: int
+        :param timeout: the number of seconds to wait for a response
+        :type timeout: float
+        :param scheduler: the scheduler every request is sent through, the process wide scheduler if None
+        :type scheduler: Request_operations.RequestScheduler
+        """
+        self.auth_manager = auth_manager
+        self.access_token = access_token
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.scheduler = scheduler if scheduler is not None else Request_operations.get_scheduler()
+
+        # created on first use, so they belong to the event loop the object is used on
+        self._semaphore = None
+        self._idle_connections = {}  # (scheme, host, port) -> list of (reader, writer)
+
+        self._token = None
+        self._token_time = 0
+        self._token_lock = None
+
+    # ------------------------------------------------- API methods -------------------------------------------------
+
+    async def playlist(self, playlist_id, fields=None, market=None, additional_types=("track", "episode")):
+        """
+        Get a playlist, see spotipy.Spotify.playlist()
+        """
+        return await self._get("playlists/" + _get_id(playlist_id),
+                               fields=fields, market=market, additional_types=",".join(additional_types))
+
+    async def playlist_items(self, playlist_id, fields=None, limit=100, offset=0, market=None,
+                             additional_types=("track", "episode")):
+        """
+        Get the first page of a playlist's items, see spotipy.Spotify.playlist_items()
+        """
+        return await self._get("playlists/" + _get_id(playlist_id) + "/tracks", fields=fields, limit=limit,
+                               offset=offset, market=market, additional_types=",".join(additional_types))
+
+    async def artist_albums(self, artist_id, album_type=None, country=None, limit=20, offset=0):
+        """
+        Get the first page of an artist's albums, see spotipy.Spotify.artist_albums()
+        """
+        return await self._get("artists/" + _get_id(artist_id) + "/albums",
+                               include_groups=album_type, country=country, limit=limit, offset=offset)
+
+    async def album_tracks(self, album_id, limit=50, offset=0, market=None):
+        """
+        Get the first page of an album's tracks, see spotipy.Spotify.album_tracks()
+        """
+        return await self._get("albums/" + _get_id(album_id) + "/tracks", limit=limit, offset=offset, market=market)
+
+    async def next(self, result):
+        """
+        Get the next page of a paging object, see spotipy.Spotify.next()
+
+        :return: the next page or None if the result is the last page
+        """
+        if result["next"]:
+            return await self._get(result["next"])
+        else:
+            return None
+
+    async def close(self):
+        """
+        Closes every idle connection. The object can be used again afterwards, also on another event loop.
+        """
+        for connections in self._idle_connections.values():
+            for reader, writer in connections:
+                writer.close()
+        self._idle_connections = {}
+        self._semaphore = None
+        self._token_lock = None
+
+    # ---------------------------------------------------- HTTP ----------------------------------------------------
+
+    async def _get(self, url, **params):
+        """
+        Sends a GET request through the request scheduler and returns the decoded json response.
+
+        :param url: a URL or a path relative to the base URL
+        :type url: str
+        :param params: the query parameters, parameters that are None are left out
+        :return: the response as a dictionary
+        """
+        url = urllib.parse.urljoin(self.base_url, url)
+        params = {key: value for key, value in params.items() if value is not None}
+        if params:
+            url += ("&" if "?" in url else "?") + urllib.parse.urlencode(params)
+
+        # the rate limit is shared with every other client of this process, a 429 response is retried by the scheduler
+        return await self.scheduler.call_async(self._get_once, url)
+
+    async def _get_once(self, url):
+        """
+        Sends a GET request and returns the decoded json response.
+
+        :param url: the complete URL, including the query
+        :type url: str
+        :raise spotipy.SpotifyException: Spotify answered with an error
+        :return: the response as a dictionary
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        async with self._semaphore:
+            status, headers, body = await self._request("GET", url)
+
+        if status >= 400:
+            # Spotify sends errors in the format {"error": {"status": <status>, "message": <message>}}
+            try:
+                message = json.loads(body)["error"]["message"]
+            except (ValueError, KeyError, TypeError):
+                message = body.decode("utf-8", "ignore")
+            raise spotipy.SpotifyException(status, -1, url + ":\n " + message, headers=headers)
+
+        return json.loads(body) if body else None
+
+    async def _request(self, method, url):
+        """
+        Sends a request over a (reused) connection and reads the response.
+
+        :return: a tuple (status, headers, body), the header names are lower case
+        """
+        split_url = urllib.parse.urlsplit(url)
+        origin = (split_url.scheme, split_url.hostname,
+                  split_url.port or (443 if split_url.scheme == "https" else 80))
+        target = split_url.path + ("?" + split_url.query if split_url.query else "")
+        token = await self._get_token()
+
+        request = (method + " " + target + " HTTP/1.1\r\n"
+                   "Host: " + split_url.netloc + "\r\n"
+                   "Authorization: Bearer " + token + "\r\n"
+                   "Accept: application/json\r\n"
+                   "Connection: keep-alive\r\n"
+                   "\r\n").encode("latin-1")
+
+        # an idle connection might have been closed by the server in the meantime, in that case a new connection is
+        # opened and the request is sent again
+        while True:
+            reused = bool(self._idle_connections.get(origin))
+            reader, writer = self._idle_connections[origin].pop() if reused else await _open_connection(origin)
+            try:
+                writer.write(request)
+                await writer.drain()
+                status, headers, body, keep_alive = await asyncio.wait_for(_read_response(reader), self.timeout)
+                break
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                if not reused:
+                    raise
+            except asyncio.TimeoutError:
+                writer.close()
+                raise
+
+        if keep_alive:
+            self._idle_connections.setdefault(origin, []).append((reader, writer))
+        else:
+            writer.close()
+
+        return status, headers, body
+
+    async def _get_token(self):
+        """
+        :return: the access token that is sent with every request
+        """
+        if self.auth_manager is None:
+            return self.access_token or ""
+
+        if self._is_token_outdated():
+            if self._token_lock is None:
+                self._token_lock = asyncio.Lock()
+
+            # only one request reads the token, the others wait for it instead of asking the auth manager as well
+            async with self._token_lock:
+                if self._is_token_outdated():
+                    # the auth manager blocks while it refreshes the token (a request to Spotify's accounts service)
+                    # or while it waits for the user to log in, so it is called in a worker thread. Every other
+                    # request on the event loop keeps running in the meantime
+                    self._token = await asyncio.get_running_loop().run_in_executor(
+                        None, functools.partial(self.auth_manager.get_access_token, as_dict=False))
+                    self._token_time = time.monotonic()
+        return self._token
+
+    def _is_token_outdated(self):
+        """
+        :return: True if the access token has to be read (again) from the auth manager
+        """
+        return self._token is None or time.monotonic() - self._token_time > _TOKEN_CACHE_SECONDS
+
+
+class SyncSpotify(object):
+    """
+    A synchronous facade for an AsyncSpotify object. It can be passed as ``sp`` to every method that takes a
+    spotipy.Spotify object and only reads from Spotify. Methods that AsyncSpotify does not offer (i.e. adding songs to a
+    playlist) are passed on to the fallback client, wrap it in a Request_operations.ScheduledSpotify to send them
+    through the request scheduler as well.
+
+    The requests of every thread that uses the facade are sent over the same event loop, which runs in a background
+    thread. So many threads (i.e. the workers of Run_operations.fetch_sources()) share the same connections.
+    """
+
+    def __init__(self, async_sp, fallback_sp=None):
+        """
+        Creates a SyncSpotify object
+
+        :param async_sp: the asyncio based client that sends the requests
+        :type async_sp: AsyncSpotify
+        :param fallback_sp: the client that is used for every method that AsyncSpotify does not offer
+        :type fallback_sp: spotipy.Spotify
+        """
+        self.async_sp = async_sp
+        self.fallback_sp = fallback_sp
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def playlist(self, *args, **kwargs): return self._run(self.async_sp.playlist(*args, **kwargs))
+
+    def playlist_items(self, *args, **kwargs): return self._run(self.async_sp.playlist_items(*args, **kwargs))
+
+    def artist_albums(self, *args, **kwargs): return self._run(self.async_sp.artist_albums(*args, **kwargs))
+
+    def album_tracks(self, *args, **kwargs): return self._run(self.async_sp.album_tracks(*args, **kwargs))
+
+    def next(self, result): return self._run(self.async_sp.next(result))
+
+    def close(self):
+        """
+        Closes the connections and stops the background event loop
+        """
+        self._run(self.async_sp.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def _run(self, coroutine):
+        """
+        Runs the coroutine on the background event loop and waits for its result
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def __getattr__(self, name):
+        # only called for attributes that are not defined above
+        if self.fallback_sp is None:
+            raise AttributeError("SyncSpotify has no attribute '" + name + "' and no fallback client is set")
+        return getattr(self.fallback_sp, name)
+
+
+def _get_id(id_or_uri):
+    """
+    Extracts the ID out of a Spotify ID, URI or link, the same way spotipy does it: \n
+        spotify:album:37i9dQZF1DX36edUJpD76c \n
+        https://open.spotify.com/album/37i9dQZF1DX36edUJpD76c?si=abc \n
+    =>  37i9dQZF1DX36edUJpD76c
+
+    :param id_or_uri: a Spotify ID, URI or link
+    :type id_or_uri: str
+    :return: the ID
+    """
+    if id_or_uri.startswith("http"):
+        return id_or_uri.split("?")[0].rstrip("/").split("/")[-1]
+    return id_or_uri.split(":")[-1]
+
+
+async def _open_connection(origin):
+    """
+    Opens a new connection to the origin (scheme, host, port)
+
+    :return: a tuple (reader, writer)
+    """
+    scheme, host, port = origin
+    return await asyncio.open_connection(host, port, ssl=ssl.create_default_context() if scheme == "https" else None)
+
+
+async def _read_response(reader):
+    """
+    Reads an HTTP/1.1 response. Supports bodies with a Content-Length, chunked bodies and bodies that end when the
+    connection is closed.
+
+    :type reader: asyncio.StreamReader
+    :return: a tuple (status, headers, body, keep_alive), keep_alive is True when the connection can be reused
+    """
+    # status line, i.e. "HTTP/1.1 200 OK"
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("The connection was closed before a response was received")
+    version, _, status_and_reason = status_line.decode("latin-1").rstrip("\r\n").partition(" ")
+    status = status_and_reason.partition(" ")[0]
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    keep_alive = headers.get("connection", "").lower() != "close" and version != "HTTP/1.0"
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        body = bytearray()
+        while True:
+            chunk_size = int((await reader.readline()).split(b";")[0].strip(), 16)
+            if chunk_size == 0:
+                # skip the trailer
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                break
+            body += await reader.readexactly(chunk_size)
+            await reader.readexactly(2)  # the "\r\n" at the end of each chunk
+        body = bytes(body)
+
+    elif "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+
+    else:
+        body = await reader.read()
+        keep_alive = False
+
+    return int(status), headers, body, keep_alive
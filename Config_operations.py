@@ -0,0 +1,848 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+import Lock_operations
+
+# a spotify URI of a playlist / artist, as used by the config file
+URI_PLAYLIST_RE = r"spotify:playlist:\S*"
+URI_ARTIST_RE = r"spotify:artist:\S*"
+
+# the config file is written to a temporary file first, see save_config_text()
+TEMPORARY_FILE_EXTENSION = ".tmp"
+# the changes of a transaction are written to the journal before the config file, see ConfigTransaction.commit()
+JOURNAL_FILE_EXTENSION = ".journal"
+
+
+class Group(object):
+    """
+    A group object holds information about a group specified in the playlist_and_artists.txt file:
+        1. the group id
+        2. the group name
+        3. the target playlist
+        4. the playlist
+        5. the artists
+    """
+
+    def __init__(self, group_id, group_name, target_playlist, playlist_tuples, artist_tuples):
+        """
+        Creates a Group object
+
+        :param group_id: the id of the group ( in order of appearance in the .txt file, starting at 0 )
+        :type group_id: int
+        :param group_name: the name of the group
+        :type group_name: str
+        :param target_playlist: the URI of the playlist where new songs from other playlists will be added to
+        :type target_playlist: str
+        :param playlist_tuples: a list of playlist tuples (playlist_name, URI) that are observe by the group
+        :type playlist_tuples: list[tuple[string, string]]
+        :param artist_tuples: a list of artist tuples (artist_name, URI) that are observe by the group
+        :type artist_tuples: list[tuple[string, string]]
+        """
+        self.group_id = group_id
+        self.group_name = group_name
+        self.target_playlist = target_playlist
+        self.playlists = playlist_tuples
+        self.artists = artist_tuples
+
+    def get_group_id(self): return self.group_id
+
+    def get_group_name(self): return self.group_name
+
+    def get_target_playlist(self): return self.target_playlist
+
+    def get_playlist_tuples(self): return self.playlists
+
+    def get_artist_tuples(self): return self.artists
+
+
+# ------------------------------------------------------ Tokens ------------------------------------------------------
+#
+# The config file is read line by line, in a single pass. Every line of a group is one token:
+#
+#   GROUP:<group name>={
+#   ## ADD_TO:{<playlist URI>}
+#   ## PLAYLISTS={
+#   <name>=<playlist URI>                   (any number of lines)
+#   }
+#   ## ARTISTS={
+#   <name>=<artist URI>                     (any number of lines)
+#   }
+#   }
+#
+# Blank lines are allowed between the tokens of a group, the lines outside of a group (comments, ...) are skipped. The
+# closing "}" of a section and of the group may also follow the previous token on its line, i.e. "## PLAYLISTS={}" or
+# "<name>=<artist URI>}}". A group that holds any other line is malformed, it is skipped like every line outside of a
+# group and reported by GroupConfig.get_malformed_groups().
+#
+# Every pattern is matched against a single line, thus a malformed group never makes the tokenizer backtrack over the
+# rest of the file.
+#
+_GROUP_LINE_RE = re.compile(r"\s*GROUP:(?P<GROUP_NAME>.*)={\s*$")
+_TARGET_LINE_RE = re.compile(r"\s*## ADD_TO:{(?P<TARGET_PLAYLIST>" + URI_PLAYLIST_RE + r")}\s*$")
+# the rest of the line may close the section, see _find_closings()
+_PLAYLISTS_LINE_RE = re.compile(r"\s*## PLAYLISTS={")
+_ARTISTS_LINE_RE = re.compile(r"\s*## ARTISTS={")
+# a line that may be the start of a group, it is reported if it isn't the start of a well-formed group
+_GROUP_START = "GROUP:"
+
+# the playlists / artists are the most lines of the file, they are split without a regular expression, see
+# _split_entry()
+_PLAYLIST_SEPARATOR = "=spotify:playlist:"
+_ARTIST_SEPARATOR = "=spotify:artist:"
+
+# the states of the tokenizer, i.e. _IN_PLAYLISTS: the next token is a playlist or the end of the playlists
+_OUTSIDE_GROUP = 0
+_BEFORE_TARGET = 1
+_BEFORE_PLAYLISTS = 2
+_IN_PLAYLISTS = 3
+_BEFORE_ARTISTS = 4
+_IN_ARTISTS = 5
+_BEFORE_GROUP_END = 6
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+
+class GroupLayout(object):
+    """
+    A group layout holds the positions of a group in the text of the config file, they are used to change the group
+    without searching the text:
+        1. the span of the whole group, from "GROUP:" up to the closing "}"
+        2. the end of the playlists / artists, new entries are inserted there
+        3. the spans of the playlists / artists, an entry's span starts at the end of the previous token so removing
+           it removes the blank lines in front of it as well
+
+    Positions are indexes into the text, a span is a tuple (start, end).
+    """
+
+    def __init__(self, span, playlists_end, artists_end, playlist_spans, artist_spans):
+        """
+        Creates a GroupLayout object, see tokenize_config()
+        """
+        self.span = span
+        self.playlists_end = playlists_end
+        self.artists_end = artists_end
+        self.playlist_spans = playlist_spans
+        self.artist_spans = artist_spans
+
+    def get_span(self): return self.span
+
+    def get_playlists_end(self): return self.playlists_end
+
+    def get_artists_end(self): return self.artists_end
+
+    def get_playlist_spans(self): return self.playlist_spans
+
+    def get_artist_spans(self): return self.artist_spans
+
+
+class GroupConfig(object):
+    """
+    A group config is the parsed content of the config file: its text, the groups in order of appearance and their
+    layouts. Groups can be looked up by name and by the URIs they observe without scanning the groups.
+
+    A group config is shared by every caller of load_config(), its groups must not be changed.
+    """
+
+    def __init__(self, text, groups, layouts, malformed_groups):
+        """
+        Creates a GroupConfig object, see tokenize_config()
+
+        :param text: the text of the config file
+        :type text: str
+        :param groups: the groups, in order of appearance
+        :type groups: list[Group]
+        :param layouts: the layout of each group
+        :type layouts: list[GroupLayout]
+        :param malformed_groups: tuples (line number, first line) of the groups that have been skipped
+        :type malformed_groups: list[tuple[int, str]]
+        """
+        self.text = text
+        self.groups = groups
+        self.layouts = layouts
+        self.malformed_groups = malformed_groups
+
+        # group name -> ID of the first group with that name
+        self.group_ids_by_name = {}
+        # playlist / artist URI -> IDs of the groups observing it
+        self.group_ids_by_uri = {}
+        for group_id, group in enumerate(groups):
+            self.group_ids_by_name.setdefault(group.get_group_name(), group_id)
+            for _, uri in group.get_playlist_tuples() + group.get_artist_tuples():
+                group_ids = self.group_ids_by_uri.get(uri)
+                if group_ids is None:
+                    self.group_ids_by_uri[uri] = [group_id]
+                elif group_ids[-1] != group_id:
+                    group_ids.append(group_id)
+
+    def get_text(self): return self.text
+
+    def get_groups(self): return self.groups
+
+    def get_layout(self, group_id): return self.layouts[group_id]
+
+    def get_malformed_groups(self): return self.malformed_groups
+
+    def find_group(self, group_name):
+        """
+        Returns the first group with the name
+
+        :param group_name: the name of a group
+        :type group_name: str
+        :return: the Group or None if there is no group with that name
+        """
+        group_id = self.group_ids_by_name.get(group_name)
+        return self.groups[group_id] if group_id is not None else None
+
+    def find_groups_observing(self, uri):
+        """
+        Returns every group that observes the playlist / artist
+
+        :param uri: the spotify URI of a playlist / artist
+        :type uri: str
+        :return: a list of Groups, in order of appearance
+        """
+        return [self.groups[group_id] for group_id in self.group_ids_by_uri.get(uri, [])]
+
+
+def tokenize_config(text):
+    """
+    Parses the text of the config file in a single pass, see the description of the tokens above
+
+    :param text: the text of the config file
+    :type text: str
+    :return: a GroupConfig
+    """
+    groups = []
+    layouts = []
+    # tuples (line number, first line) of the skipped groups
+    malformed_groups = []
+
+    state = _OUTSIDE_GROUP
+    # the tokens of the current group
+    group_start = group_line = target_playlist = None
+    group_name = group_line_number = None
+    playlists_end = artists_end = None
+    playlist_tuples, artist_tuples, playlist_spans, artist_spans = [], [], [], []
+    # the end of the previous token of the current group
+    token_end = None
+
+    offset = 0
+    for line_number, line in enumerate(text.splitlines(keepends=True), start=1):
+        line_start, offset = offset, offset + len(line)
+
+        if state != _OUTSIDE_GROUP and line.isspace():
+            continue
+
+        # the position in the line where the token ends, the rest of the line may only close sections / the group
+        rest_start = None
+
+        if state == _BEFORE_TARGET:
+            match = _TARGET_LINE_RE.match(line)
+            if match:
+                target_playlist = match.group("TARGET_PLAYLIST")
+                state = _BEFORE_PLAYLISTS
+                continue
+
+        elif state == _BEFORE_PLAYLISTS:
+            match = _PLAYLISTS_LINE_RE.match(line)
+            if match:
+                playlists_end = token_end = line_start + match.end()
+                state = _IN_PLAYLISTS
+                rest_start = match.end()
+
+        elif state == _IN_PLAYLISTS:
+            entry = _split_entry(line, _PLAYLIST_SEPARATOR)
+            if entry is not None:
+                playlist_tuples.append(entry[:2])
+                playlist_spans.append((token_end, line_start + entry[2]))
+                playlists_end = token_end = line_start + entry[2]
+            rest_start = entry[2] if entry is not None else 0
+
+        elif state == _BEFORE_ARTISTS:
+            match = _ARTISTS_LINE_RE.match(line)
+            if match:
+                artists_end = token_end = line_start + match.end()
+                state = _IN_ARTISTS
+                rest_start = match.end()
+
+        elif state == _IN_ARTISTS:
+            entry = _split_entry(line, _ARTIST_SEPARATOR)
+            if entry is not None:
+                artist_tuples.append(entry[:2])
+                artist_spans.append((token_end, line_start + entry[2]))
+                artists_end = token_end = line_start + entry[2]
+            rest_start = entry[2] if entry is not None else 0
+
+        elif state == _BEFORE_GROUP_END:
+            rest_start = 0
+
+        closings = _find_closings(line, rest_start) if rest_start is not None else None
+        if closings is not None:
+            for closing in closings:
+                if state == _IN_PLAYLISTS:
+                    state = _BEFORE_ARTISTS
+                elif state == _IN_ARTISTS:
+                    state = _BEFORE_GROUP_END
+                elif state == _BEFORE_GROUP_END:
+                    groups.append(Group(group_id=len(groups),
+                                        group_name=group_name,
+                                        target_playlist=target_playlist,
+                                        playlist_tuples=playlist_tuples,
+                                        artist_tuples=artist_tuples))
+                    layouts.append(GroupLayout(span=(group_start, line_start + closing + 1),
+                                               playlists_end=playlists_end,
+                                               artists_end=artists_end,
+                                               playlist_spans=playlist_spans,
+                                               artist_spans=artist_spans))
+                    state = _OUTSIDE_GROUP
+                elif state != _OUTSIDE_GROUP:
+                    # the playlists are followed by a second "}" instead of the artists
+                    closings = None
+                    break
+                # a "}" after the end of the group is skipped like every line outside of a group
+
+            if closings is not None:
+                continue
+
+        # the line is outside of a group or it doesn't fit the current group, which is skipped. The line may start
+        # the next group though.
+        if state != _OUTSIDE_GROUP:
+            malformed_groups.append((group_line_number, group_line))
+
+        match = _GROUP_LINE_RE.match(line)
+        if match:
+            group_start = line_start + match.start("GROUP_NAME") - len(_GROUP_START)
+            group_name = match.group("GROUP_NAME")
+            group_line_number, group_line = line_number, line.strip()
+            playlist_tuples, artist_tuples, playlist_spans, artist_spans = [], [], [], []
+            state = _BEFORE_TARGET
+        else:
+            # i.e. a whole group on a single line
+            if line.lstrip().startswith(_GROUP_START):
+                malformed_groups.append((line_number, line.strip()))
+            state = _OUTSIDE_GROUP
+
+    # the last group hasn't been closed
+    if state != _OUTSIDE_GROUP:
+        malformed_groups.append((group_line_number, group_line))
+
+    return GroupConfig(text, groups, layouts, malformed_groups)
+
+
+def _find_closings(line, rest_start):
+    """
+    Finds the "}" that close the current section / group in the rest of a line
+
+    :param line: a line of the config file
+    :param rest_start: the position in the line where the previous token ends
+    :type line: str
+    :type rest_start: int
+    :return: the positions of the "}" in the line, or None if the rest of the line holds anything but "}" and
+             whitespace
+    """
+    rest = line[rest_start:]
+    if rest.replace("}", "").strip():
+        return None
+
+    return [rest_start + position for position, character in enumerate(rest) if character == "}"]
+
+
+def _split_entry(line, separator):
+    """
+    Splits a playlist / artist line of the format <name>=<URI> into its name and URI. Like the patterns of the other
+    tokens, the name is everything in front of the last separator, without leading whitespace, and the URI must not
+    contain whitespace.
+
+    :param line: a line of the config file
+    :param separator: "=" and the beginning of the URI, i.e. _PLAYLIST_SEPARATOR
+    :type line: str
+    :type separator: str
+    :return: a tuple (name, URI, end of the URI in the line) or None if the line isn't a playlist / artist
+    """
+    separator_start = line.rfind(separator)
+    if separator_start < 0:
+        return None
+
+    name = line[:separator_start].lstrip()
+    # the URI may be followed by the "}" of its section / group, a spotify ID never contains "}"
+    uri = line[separator_start + 1:].split("}", 1)[0].rstrip()
+    # if the URI contains whitespace, so does the URI at any earlier separator
+    if not name or len(uri.split()) != 1:
+        return None
+
+    return name, uri, separator_start + 1 + len(uri)
+
+
+# the parsed config files, path -> (version of the file, GroupConfig), see load_config()
+_configs = {}
+_configs_lock = threading.Lock()
+
+
+def load_config(file_path):
+    """
+    Reads and parses the config file. The result is cached until the file changes, thus the file is only parsed again
+    after it has been changed.
+
+    If a commit has been interrupted (see ConfigTransaction.commit()), its changes are applied from the journal first.
+
+    :param file_path: the path of the config file
+    :type file_path: str
+    :return: a GroupConfig
+    """
+    if os.path.exists(file_path + JOURNAL_FILE_EXTENSION):
+        with Lock_operations.FileLock(Lock_operations.get_lock_path(file_path)):
+            _replay_journal(file_path)
+
+    return _read_config(file_path)
+
+
+def _read_config(file_path):
+    """
+    Reads and parses the config file, unless it has been cached, see load_config()
+    """
+    version = _get_version(os.stat(file_path))
+    with _configs_lock:
+        cached = _configs.get(file_path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+    with open(file_path, "r") as file:
+        config = tokenize_config(file.read())
+
+    with _configs_lock:
+        _configs[file_path] = (version, config)
+    return config
+
+
+def _get_version(stat):
+    """
+    Returns the version of a file: its inode, modification time and size. Saving the config file replaces it with a
+    new file, thus the inode changes even if the modification time and size stay the same.
+    """
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def save_config_text(file_path, text):
+    """
+    Overwrites the config file with the text and caches its parsed content, so the next load_config() doesn't read
+    the file again.
+
+    The text is written to a temporary file first, which then replaces the config file. Thus the config file is never
+    left half written, i.e. if the program crashes while writing it.
+
+    :param file_path: the path of the config file
+    :param text: the new text of the config file
+    :type file_path: str
+    :type text: str
+    :return: the GroupConfig of the text
+    """
+    temporary_file_path = file_path + TEMPORARY_FILE_EXTENSION
+    with open(temporary_file_path, "w") as file:
+        file.write(text)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_file_path, file_path)
+
+    config = tokenize_config(text)
+    version = _get_version(os.stat(file_path))
+    with _configs_lock:
+        _configs[file_path] = (version, config)
+    return config
+
+
+# --------------------------------------------------- Transactions ---------------------------------------------------
+#
+# A transaction queues changes of the config file and writes them all at once when it is committed. The changes are
+# applied in order to the groups of the file as it is at that moment:
+#
+#   - every change refers to a group by its name, like the functions of IO_operations the first group with that name
+#     is changed. A change of a group that doesn't exist (anymore) is skipped.
+#   - a removed playlist / artist is removed from the group, no matter how often it is listed. Removing and adding an
+#     entry again moves it to the end of the group.
+#   - new playlists / artists are inserted after the group's last playlist / artist, new groups are appended to the
+#     end of the file
+#
+# Only the changed parts of the text are replaced, the rest of the file (comments, blank lines, ...) is kept as it is.
+#
+# ----------------------------------------------------------------------------------------------------------------------
+
+# the kinds of changes of a transaction
+_ADD_GROUP = 0
+_REMOVE_GROUP = 1
+_ADD_ENTRY = 2
+_REMOVE_ENTRY = 3
+
+# the sections of a group, i.e. the index of the playlists in _GroupChanges.removed / added
+_PLAYLISTS = 0
+_ARTISTS = 1
+
+
+class ConfigTransaction(object):
+    """
+    A config transaction queues changes of the config file and writes them at once, see the description above.
+
+    Committing a transaction reads the file only if it has changed since it was read the last time and writes it a
+    single time, no matter how many changes have been queued. A transaction can be used as context manager, it is
+    committed when the block is left without an error:
+
+        with ConfigTransaction("playlists_and_artists.txt") as transaction:
+            for a_tuple in artist_tuples:
+                transaction.add_artist("Release Radar", a_tuple)
+    """
+
+    def __init__(self, file_path):
+        """
+        Creates a ConfigTransaction object
+
+        :param file_path: the path of the config file
+        :type file_path: str
+        """
+        self.file_path = file_path
+
+        # tuples (kind of change, group name, section, Group / entry tuple)
+        self.changes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+    def add_group(self, group):
+        """
+        Queues a new group, it is appended to the end of the file
+
+        :param group: the new group, its ID is ignored
+        :type group: Group
+        """
+        self.changes.append((_ADD_GROUP, group.get_group_name(), None, group))
+
+    def remove_group(self, group_name):
+        """
+        Queues the removal of a group
+
+        :param group_name: the name of the group
+        :type group_name: str
+        """
+        self.changes.append((_REMOVE_GROUP, group_name, None, None))
+
+    def add_playlist(self, group_name, p_tuple):
+        """
+        Queues a playlist to be added to the group
+
+        :param group_name: the name of the group
+        :param p_tuple: a tuple (playlist_name, playlist_URI)
+        :type group_name: str
+        :type p_tuple: tuple[str, str]
+        """
+        self.changes.append((_ADD_ENTRY, group_name, _PLAYLISTS, tuple(p_tuple)))
+
+    def add_artist(self, group_name, a_tuple):
+        """
+        Queues an artist to be added to the group
+
+        :param group_name: the name of the group
+        :param a_tuple: a tuple (artist_name, artist_URI)
+        :type group_name: str
+        :type a_tuple: tuple[str, str]
+        """
+        self.changes.append((_ADD_ENTRY, group_name, _ARTISTS, tuple(a_tuple)))
+
+    def remove_playlist(self, group_name, p_tuple):
+        """
+        Queues the removal of a playlist from the group
+
+        :param group_name: the name of the group
+        :param p_tuple: a tuple (playlist_name, playlist_URI)
+        :type group_name: str
+        :type p_tuple: tuple[str, str]
+        """
+        self.changes.append((_REMOVE_ENTRY, group_name, _PLAYLISTS, tuple(p_tuple)))
+
+    def remove_artist(self, group_name, a_tuple):
+        """
+        Queues the removal of an artist from the group
+
+        :param group_name: the name of the group
+        :param a_tuple: a tuple (artist_name, artist_URI)
+        :type group_name: str
+        :type a_tuple: tuple[str, str]
+        """
+        self.changes.append((_REMOVE_ENTRY, group_name, _ARTISTS, tuple(a_tuple)))
+
+    def commit(self):
+        """
+        Applies the queued changes to the config file, the file is written once. The file is locked while the changes
+        are applied, see Lock_operations.
+
+        :return: the GroupConfig of the changed file
+        """
+        changes, self.changes = self.changes, []
+
+        # other processes (i.e. the GUI and a scheduled run) wait until the file has been written, so no change of
+        # either one gets lost
+        with Lock_operations.FileLock(Lock_operations.get_lock_path(self.file_path)):
+            _replay_journal(self.file_path)
+
+            config = _read_config(self.file_path)
+            text = _apply_changes(config, changes)
+            if text == config.get_text():
+                return config
+
+            # if the program crashes before the file is replaced, the changes are applied by the next load_config()
+            _append_to_journal(self.file_path, config.get_text(), changes)
+            config = save_config_text(self.file_path, text)
+            _remove_journal(self.file_path)
+
+        return config
+
+    def rollback(self):
+        """
+        Drops the queued changes
+        """
+        self.changes = []
+
+
+def _append_to_journal(file_path, base_text, changes):
+    """
+    Appends the changes of a transaction to the journal of the config file and flushes it to the hard drive. Every
+    record holds the hash of the text the changes are applied to, so they are never applied twice, see
+    _replay_journal().
+
+    :param file_path: the path of the config file
+    :param base_text: the text of the config file the changes are applied to
+    :param changes: the changes, as queued by a ConfigTransaction
+    :type file_path: str
+    :type base_text: str
+    :type changes: list[tuple]
+    """
+    record = {"base": _get_text_hash(base_text), "changes": [_encode_change(change) for change in changes]}
+    with open(file_path + JOURNAL_FILE_EXTENSION, "a") as journal:
+        journal.write(json.dumps(record) + "\n")
+        journal.flush()
+        os.fsync(journal.fileno())
+
+
+def _replay_journal(file_path):
+    """
+    Applies the changes of the journal that haven't been written to the config file yet, i.e. because the program
+    crashed while committing a transaction, and removes the journal. The lock of the config file must be held.
+
+    :param file_path: the path of the config file
+    :type file_path: str
+    """
+    try:
+        with open(file_path + JOURNAL_FILE_EXTENSION, "r") as journal:
+            lines = journal.readlines()
+    except FileNotFoundError:
+        return
+
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            # the record has been cut off by a crash, its changes were never applied and nothing follows it
+            break
+
+        # the changes are only applied to the text they were made for, otherwise they have been applied already
+        config = _read_config(file_path)
+        if record["base"] == _get_text_hash(config.get_text()):
+            changes = [_decode_change(change) for change in record["changes"]]
+            save_config_text(file_path, _apply_changes(config, changes))
+
+    _remove_journal(file_path)
+
+
+def _remove_journal(file_path):
+    try:
+        os.remove(file_path + JOURNAL_FILE_EXTENSION)
+    except FileNotFoundError:
+        pass
+
+
+def _get_text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _encode_change(change):
+    """
+    Converts a change of a transaction into a list that can be saved as JSON, see _decode_change()
+    """
+    kind, group_name, section, entry = change
+    if kind == _ADD_GROUP:
+        entry = [entry.get_group_name(), entry.get_target_playlist(), entry.get_playlist_tuples(),
+                 entry.get_artist_tuples()]
+
+    return [kind, group_name, section, entry]
+
+
+def _decode_change(encoded_change):
+    """
+    Converts a change that has been read from the journal back into a change of a transaction, see _encode_change()
+    """
+    kind, group_name, section, entry = encoded_change
+    if kind == _ADD_GROUP:
+        entry = Group(group_id=0,
+                      group_name=entry[0],
+                      target_playlist=entry[1],
+                      playlist_tuples=[tuple(p_tuple) for p_tuple in entry[2]],
+                      artist_tuples=[tuple(a_tuple) for a_tuple in entry[3]])
+    elif entry is not None:
+        entry = tuple(entry)
+
+    return kind, group_name, section, entry
+
+
+class _GroupChanges(object):
+    """
+    The changes of a single group in a transaction, see _apply_changes()
+    """
+
+    def __init__(self, group):
+        self.group = group
+        self.is_removed = False
+        # the playlists / artists removed from the group as it was read from the file
+        self.removed = (set(), set())
+        # the new playlists / artists, in order
+        self.added = ([], [])
+
+    def add(self, section, entry):
+        self.added[section].append(entry)
+
+    def remove(self, section, entry):
+        self.removed[section].add(entry)
+        if entry in self.added[section]:
+            self.added[section][:] = [added_entry for added_entry in self.added[section] if added_entry != entry]
+
+
+def _apply_changes(config, changes):
+    """
+    Applies the changes of a transaction to the text of the config file, see ConfigTransaction
+
+    :param config: the config file the changes are applied to
+    :param changes: the changes, as queued by a ConfigTransaction
+    :type config: GroupConfig
+    :type changes: list[tuple]
+    :return: the changed text
+    """
+    groups = config.get_groups()
+    # the changes of every group of the file that has been changed, group ID -> _GroupChanges
+    changed_groups = {}
+    # the changes of the new groups, in order
+    new_groups = []
+
+    for kind, group_name, section, entry in changes:
+        if kind == _ADD_GROUP:
+            new_groups.append(_GroupChanges(entry))
+            continue
+
+        group_changes = _find_group_changes(config, changed_groups, new_groups, group_name)
+        if group_changes is None:
+            continue
+
+        if kind == _REMOVE_GROUP:
+            group_changes.is_removed = True
+        elif kind == _ADD_ENTRY:
+            group_changes.add(section, entry)
+        else:
+            group_changes.remove(section, entry)
+
+    # tuples (start, end, replacement) of the changed parts of the text
+    replacements = []
+    for group_id, group_changes in changed_groups.items():
+        layout = config.get_layout(group_id)
+        if group_changes.is_removed:
+            replacements.append(layout.get_span() + ("",))
+            continue
+
+        for section, entry_tuples, spans, end in (
+                (_PLAYLISTS, groups[group_id].get_playlist_tuples(), layout.get_playlist_spans(),
+                 layout.get_playlists_end()),
+                (_ARTISTS, groups[group_id].get_artist_tuples(), layout.get_artist_spans(), layout.get_artists_end())):
+            removed = group_changes.removed[section]
+            if removed:
+                replacements += [span + ("",) for entry_tuple, span in zip(entry_tuples, spans)
+                                 if entry_tuple in removed]
+            if group_changes.added[section]:
+                replacements.append((end, end, "".join("\n\n\t" + entry_tuple[0] + "=" + entry_tuple[1]
+                                                       for entry_tuple in group_changes.added[section])))
+
+    # the spans don't overlap, new entries are inserted at the end of a section, after its last removed entry
+    replacements.sort(key=lambda replacement: replacement[:2])
+
+    text = config.get_text()
+    parts = []
+    position = 0
+    for start, end, replacement in replacements:
+        parts += [text[position:start], replacement]
+        position = end
+    parts.append(text[position:])
+
+    for group_changes in new_groups:
+        if not group_changes.is_removed:
+            parts.append(_format_group(group_changes))
+
+    return "".join(parts)
+
+
+def _find_group_changes(config, changed_groups, new_groups, group_name):
+    """
+    Returns the changes of the first group with the name that hasn't been removed, the groups of the file come before
+    the new groups
+
+    :return: a _GroupChanges object or None if there is no such group
+    """
+    group = config.find_group(group_name)
+    if group is not None:
+        group_ids = [group.get_group_id()]
+        # only if the first group has been removed, another group with the name can be changed
+        if group.get_group_id() in changed_groups and changed_groups[group.get_group_id()].is_removed:
+            group_ids = [other.get_group_id() for other in config.get_groups()[group.get_group_id():]
+                         if other.get_group_name() == group_name]
+
+        for group_id in group_ids:
+            group_changes = changed_groups.get(group_id)
+            if group_changes is None:
+                group_changes = changed_groups[group_id] = _GroupChanges(config.get_groups()[group_id])
+            if not group_changes.is_removed:
+                return group_changes
+
+    for group_changes in new_groups:
+        if group_changes.group.get_group_name() == group_name and not group_changes.is_removed:
+            return group_changes
+
+    return None
+
+
+def _format_group(group_changes):
+    """
+    Returns the text of a new group, in the format of IO_operations.save_group_to_file()
+
+    :param group_changes: the new group and the changes of it
+    :type group_changes: _GroupChanges
+    :return: the text that is appended to the config file
+    """
+    group = group_changes.group
+    playlist_tuples, artist_tuples = [
+        [entry_tuple for entry_tuple in entry_tuples if entry_tuple not in group_changes.removed[section]] +
+        group_changes.added[section]
+        for section, entry_tuples in ((_PLAYLISTS, group.get_playlist_tuples()), (_ARTISTS, group.get_artist_tuples()))]
+
+    return ("\n\n\n" +
+            "GROUP:" + group.get_group_name() + "={\n" +
+            "## ADD_TO:{" + group.get_target_playlist() + "}\n" +
+            "\n" +
+            "## PLAYLISTS={\n" +
+            "".join("\t" + p_tuple[0] + "=" + p_tuple[1] + "\n" for p_tuple in playlist_tuples) +
+            "}\n" +
+            "\n" +
+            "## ARTISTS={\n" +
+            "".join(a_tuple[0] + "=" + a_tuple[1] + "\n" for a_tuple in artist_tuples) +
+            "}\n" +
+            "}\n")
@@ -0,0 +1,260 @@
+from bisect import bisect_left
+
+import URI_operations
+
+
+def merge_unique(streams, key=None):
+    """
+    Merges several streams (lists, generators, ...) into a single list without duplicates. The first occurrence of an
+    element is kept, every later occurrence is dropped, so the merged list keeps the order in which the elements were
+    first seen: every element of the first stream, then the new elements of the second stream and so on.
+
+    Elements are compared by their key, which is the element itself if no key function is given. Every key is stored in
+    a hash set, thus the streams are merged in a single pass no matter how many elements they hold.
+
+        merge_unique([["a", "b"], ["b", "c", "a"]]) = ["a", "b", "c"]
+
+        merge_unique([[{"uri": "x", ...}], [{"uri": "x", ...}]], key=lambda song: song["uri"]) = [{"uri": "x", ...}]
+
+    :param streams: an iterable of iterables, i.e. a list holding the new songs of each playlist of a group
+    :param key: a function returning a hashable key for an element, i.e. the song's URI. The element itself is used as
+                key if None
+    :type streams: typing.Iterable[typing.Iterable]
+    :type key: typing.Callable
+    :return: a list holding every unique element of the streams
+    """
+    seen_keys = set()
+    merged = []
+    for stream in streams:
+        for element in stream:
+            element_key = element if key is None else key(element)
+            if element_key not in seen_keys:
+                seen_keys.add(element_key)
+                merged.append(element)
+
+    return merged
+
+
+def get_uri(data):
+    """
+    Returns the "uri" field of a song or album dictionary, used as key to compare songs and albums.
+
+    :param data: a dictionary with the field "uri", i.e. as returned by Playlist_operations.get_song_data_from_track()
+    :type data: dict
+    :return: the URI
+    """
+    return data["uri"]
+
+
+def get_id(data):
+    """
+    Returns the "id" field of a song dictionary, the song's ID in the intern table (see Intern_operations). Comparing
+    IDs is an integer comparison, thus it is cheaper than comparing URIs.
+
+    :param data: a song record, i.e. as returned by Playlist_operations.get_song_data_from_track()
+    :type data: dict
+    :return: the ID
+    """
+    return data["id"]
+
+
+def get_track_key(data):
+    """
+    Returns the "uri" field of a song dictionary as the track's ID in 128 bit (see URI_operations.uri_to_int()), used
+    as key to compare songs whose records don't come from the intern table. An int takes less memory than the URI and
+    hashes faster, so the indexes of large snapshots stay small. The URI of a local file or an episode is the key
+    itself.
+
+    :param data: a dictionary with the field "uri", i.e. a song read from a content file
+    :type data: dict
+    :return: the track's ID as an int or the URI
+    """
+    return URI_operations.uri_to_int(data["uri"], "track")
+
+
+class PlaylistDiff(object):
+    """
+    A playlist diff holds the changes between two snapshots of a playlist (or any other list of songs / albums):
+        1. the added entries
+        2. the removed entries
+        3. the moved entries
+        4. the duplicate entries of the new snapshot
+
+    Positions are the indexes of the entries in the lists that were compared, starting at 0.
+    """
+
+    def __init__(self, added, removed, moved, duplicates, old_keys):
+        """
+        Creates a PlaylistDiff object, see diff_snapshots()
+
+        :param added: a list of tuples (new_position, entry) of the entries that are only part of the new snapshot
+        :type added: list[tuple[int, dict]]
+        :param removed: a list of tuples (old_position, entry) of the entries that are only part of the old snapshot
+        :type removed: list[tuple[int, dict]]
+        :param moved: a list of tuples (old_position, new_position, entry) of the entries that are part of both
+                      snapshots, but changed their position relative to the other entries
+        :type moved: list[tuple[int, int, dict]]
+        :param duplicates: a list of tuples (entry, new_positions) of the entries that are part of the new snapshot
+                           more than once
+        :type duplicates: list[tuple[dict, list[int]]]
+        :param old_keys: the keys of every entry of the old snapshot
+        :type old_keys: typing.AbstractSet
+        """
+        self.added = added
+        self.removed = removed
+        self.moved = moved
+        self.duplicates = duplicates
+        self.old_keys = old_keys
+
+    def get_added(self): return self.added
+
+    def get_removed(self): return self.removed
+
+    def get_moved(self): return self.moved
+
+    def get_duplicates(self): return self.duplicates
+
+    def has_changes(self): return bool(self.added or self.removed or self.moved)
+
+    def get_new_entries(self, key=get_uri):
+        """
+        Returns the added entries that weren't part of the old snapshot at all, in order of their position in the new
+        snapshot. Additional occurrences of an entry that was already part of the old snapshot, and any later
+        occurrence of an added entry, are left out.
+
+        :param key: the function that was used to create the diff
+        :type key: typing.Callable
+        :return: a list of entries
+        """
+        return merge_unique([(entry for _, entry in self.added if key(entry) not in self.old_keys)], key=key)
+
+
+def diff_snapshots(old_entries, new_entries, key=get_uri):
+    """
+    Compares two snapshots of a playlist and returns the changes as a PlaylistDiff.
+
+    Both snapshots are indexed by key (key -> list of positions), so an entry is looked up in constant time instead of
+    searching the other snapshot. If a key occurs several times, the n-th occurrence in the old snapshot is matched
+    with the n-th occurrence in the new snapshot, every unmatched occurrence has been added or removed.
+
+    An entry that is part of both snapshots has only been moved if its position changed relative to the other entries.
+    Adding a song at the top of a playlist shifts the position of every other song, but doesn't move them. The largest
+    set of entries that kept their relative order (the longest increasing subsequence of the new positions, sorted by
+    the old positions) stays in place, every other matched entry has been moved.
+
+    :param old_entries: the entries of the old snapshot, i.e. as returned by get_song_data_from_track()
+    :param new_entries: the entries of the new snapshot, i.e. as returned by get_all_songs_from_playlist()
+    :param key: a function returning a hashable key for an entry, i.e. the song's URI or, for large snapshots, the
+                song's ID as an int (see get_track_key())
+    :type old_entries: list[dict]
+    :type new_entries: list[dict]
+    :type key: typing.Callable
+    :return: a PlaylistDiff holding the added, removed, moved and duplicate entries
+    """
+    old_index = _index_positions(old_entries, key)
+    new_index = _index_positions(new_entries, key)
+
+    added = []
+    removed = []
+    # tuples (old_position, new_position) of every entry that is part of both snapshots
+    matched = []
+    duplicates = []
+
+    for entry_key, new_positions in new_index.items():
+        old_positions = old_index.get(entry_key, [])
+        matched += zip(old_positions, new_positions)
+        added += [(position, new_entries[position]) for position in new_positions[len(old_positions):]]
+
+        if len(new_positions) > 1:
+            duplicates.append((new_entries[new_positions[0]], new_positions))
+
+    for entry_key, old_positions in old_index.items():
+        new_positions = new_index.get(entry_key, [])
+        removed += [(position, old_entries[position]) for position in old_positions[len(new_positions):]]
+
+    # sort the matched entries by their old position, the entries that are not part of the longest increasing
+    # subsequence of new positions have been moved
+    matched.sort()
+    kept = _longest_increasing_subsequence([new_position for _, new_position in matched])
+    moved = [(old_position, new_position, new_entries[new_position])
+             for n, (old_position, new_position) in enumerate(matched) if n not in kept]
+
+    # report the changes in order of their position
+    added.sort(key=lambda change: change[0])
+    removed.sort(key=lambda change: change[0])
+    moved.sort(key=lambda change: change[1])
+    duplicates.sort(key=lambda duplicate: duplicate[1][0])
+
+    # the keys of the old index are used as they are, a large snapshot isn't copied into a set of its own
+    return PlaylistDiff(added, removed, moved, duplicates, old_keys=old_index.keys())
+
+
+def find_duplicates(entries, key=None):
+    """
+    Finds every entry that occurs more than once in a single pass. The first occurrence of an entry is the original,
+    every later occurrence is a duplicate.
+
+        find_duplicates(["a", "b", "a", "c", "a", "b"]) = [("a", [2, 4]), ("b", [5])]
+
+    :param entries: the entries, i.e. the URIs of every song in a playlist
+    :param key: a function returning a hashable key for an entry. The entry itself is used as key if None
+    :type entries: typing.Iterable
+    :type key: typing.Callable
+    :return: a list of tuples (key, positions of the duplicates) in order of the key's first occurrence
+    """
+    index = _index_positions(entries, key if key is not None else (lambda entry: entry))
+    return [(entry_key, positions[1:]) for entry_key, positions in index.items() if len(positions) > 1]
+
+
+def _index_positions(entries, key):
+    """
+    Maps the key of every entry to the list of positions the entry is found at, in ascending order
+
+    :param entries: a list of entries
+    :param key: a function returning a hashable key for an entry
+    :type entries: list
+    :type key: typing.Callable
+    :return: a dictionary key -> list of positions
+    """
+    index = {}
+    for position, entry in enumerate(entries):
+        index.setdefault(key(entry), []).append(position)
+
+    return index
+
+
+def _longest_increasing_subsequence(values):
+    """
+    Returns the indexes of a longest strictly increasing subsequence of the values (patience sorting, O(n log n)).
+
+        _longest_increasing_subsequence([0, 3, 1, 2]) = {0, 2, 3}
+
+    :param values: a list of distinct integers
+    :type values: list[int]
+    :return: a set of indexes into values
+    """
+    # tails[k] is the index of the smallest value ending an increasing subsequence of length k + 1
+    tails = []
+    tail_values = []
+    # predecessors[i] is the index of the value before values[i] in the subsequence ending at values[i]
+    predecessors = [-1] * len(values)
+
+    for i, value in enumerate(values):
+        k = bisect_left(tail_values, value)
+        if k > 0:
+            predecessors[i] = tails[k - 1]
+        if k == len(tails):
+            tails.append(i)
+            tail_values.append(value)
+        else:
+            tails[k] = i
+            tail_values[k] = value
+
+    # walk back from the end of the longest subsequence
+    indexes = set()
+    i = tails[-1] if tails else -1
+    while i != -1:
+        indexes.add(i)
+        i = predecessors[i]
+
+    return indexes
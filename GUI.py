@@ -7,12 +7,15 @@ import PySimpleGUI as sg
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
 
+import Async_operations
+import Diff_operations
 import IO_operations
+import Import_operations
 import Playlist_operations
+import Request_operations
+import Run_operations
 import URI_operations
-from Artist_operations import get_new_albums, get_artists_songs_from_album
 from IO_operations import get_date_from_latest_cont_file, find_latest_content_file
-from Playlist_operations import get_new_songs_in_playlist
 
 
 #########################################################################################
@@ -182,8 +185,11 @@ def update_main_window(curr_group_id=None):
 REDIRECT_URI = "https://www.duckduckgo.com"                                             #
 # to add more just add them separated by a comma                                        #
 scope = "playlist-modify-private"                                                       #
-sp = spotipy.Spotify(auth_manager=SpotifyOAuth(scope=scope,                             #
-                                               redirect_uri=REDIRECT_URI))              #
+auth_manager = SpotifyOAuth(scope=scope, redirect_uri=REDIRECT_URI)                     #
+# every request is sent through the request scheduler to respect Spotify's rate limit   #
+sp = Request_operations.create_scheduled_spotify(auth_manager=auth_manager)             #
+# the new songs of a group are fetched with the asyncio based client, see "Run" window  #
+asp = Async_operations.AsyncSpotify(auth_manager=auth_manager)                          #
 #                                                                                       #
 #########################################################################################
 
@@ -206,6 +212,13 @@ groups = []
 group_names = []
 update_groups_data()
 
+# a group that has been edited by hand and doesn't have the format of a group anymore is not shown, tell the user
+malformed_groups = IO_operations.find_malformed_groups()
+if malformed_groups:
+    sg.PopupError("Error: The following groups in the 'playlists_and_artists.txt' file are malformed and have been "
+                  "skipped:\n\n" +
+                  "".join("line " + str(line_number) + ": " + line + "\n" for line_number, line in malformed_groups))
+
 # Define the window's contents
 # the windows is divided into a grid. A layout is a list of list, representing columns and rows
 group_content_layout = generate_group_content_layout(current_group_id)
@@ -271,40 +284,18 @@ while True:
         event_run, values_run = window_run.read()
         while True:
             if event_run == "-RunButtonRunWindow-":
-                new_songs_lists = []
-
-                # get new songs from each playlist and artist and save them as lists in new_songs_lists
-                for n, info_tuple in enumerate(groups[current_group_id].get_playlist_tuples() +
-                                               groups[current_group_id].get_artist_tuples()):
-                    new_songs = []
-                    # tuples of format: (<name>, <uri>)
-                    if URI_operations.is_playlist_uri(info_tuple[1]):
-                        new_songs = get_new_songs_in_playlist(sp,
-                                                              p_uri=info_tuple[1],
-                                                              since_date=values_run["-RunWindowDateInput-"],
-                                                              as_dict=True)
-
-                    elif URI_operations.is_artist_uri(info_tuple[1]):
-                        new_albums = get_new_albums(sp,
-                                                    a_uri=info_tuple[1],
-                                                    since_date=values_run["-RunWindowDateInput-"],
-                                                    as_dict=True)
-                        for n_album in new_albums:
-                            new_songs += get_artists_songs_from_album(sp,
-                                                                      alb_uri=n_album["uri"],
-                                                                      art_uri=info_tuple[1])
-
-                    # if the tuple somehow neither contains a p_uri nor a_uri, throw an error
-                    else:
-                        raise ValueError("The tuple " + repr(info_tuple) + " does not represent a playlist or "
-                                                                           "an artist!")
-
-                    # check if the user wants to create new content files
-                    if values_run["-RunWindowSaveCheck-"]:
-                        IO_operations.save_uri_content_to_hard_drive(sp, info_tuple[1])
-
-                    # add all new songs to new_songs_lists as a list
-                    new_songs_lists.append(new_songs)
+                # get new songs from each playlist and artist at the same time and save them as lists in
+                # new_songs_lists. new_songs_lists[n] holds the new songs of the n-th playlist / artist of the group
+                # a playlist / artist that is listed more than once is only fetched (and saved) once
+                # every request is in flight at the same time on one event loop, no thread is needed per source
+                new_songs_lists = Run_operations.run_groups_async(
+                    asp,
+                    groups=[groups[current_group_id]],
+                    fetch=lambda info_tuple: Run_operations.get_new_songs_of_source_async(
+                        asp,
+                        info_tuple=info_tuple,
+                        since_date=values_run["-RunWindowDateInput-"],
+                        save_content=values_run["-RunWindowSaveCheck-"]))[0]
 
                 # Check the user's choices in the "Run" window
                 # if the "clear playlist" checkbox is ticked, clear the entire playlist (before adding the new songs)
@@ -316,16 +307,17 @@ while True:
                 if values_run["-RunWindowAddCheck-"]:
                     # add all new songs at once => only a single request is sent to Spotify instead of one per playlist
                     # also remove duplicate songs because who needs to have the same song multiple times in a playlist
-                    all_new_songs = []
-                    for song_list in new_songs_lists:
-                        for song_dic in song_list:
-                            all_new_songs.append(song_dic["uri"])
-                    no_duplicates = [s for n, s in enumerate(all_new_songs) if s not in all_new_songs[:n]]
+                    no_duplicates = Diff_operations.merge_unique(
+                        [[song_dic["uri"] for song_dic in song_list] for song_list in new_songs_lists])
                     Playlist_operations.add_songs_to_playlist(
                                                             sp,
                                                             playlist_uri=groups[current_group_id].get_target_playlist(),
                                                             song_uris=no_duplicates)
 
+                # old content files are packed / removed according to the retention policy, see Retention_operations
+                if values_run["-RunWindowSaveCheck-"]:
+                    IO_operations.compact_content_files(settings)
+
                 # Give feedback to the user
                 # show an individual window with new songs for each playlist and artist
                 for n, info_tuple in enumerate(groups[current_group_id].get_playlist_tuples() +
@@ -334,8 +326,9 @@ while True:
                     # list new songs in this layout and later add it to a column to assign a fixed size to it
                     presentation_window_songs = []
                     for song_data in new_songs_lists[n]:
-                        # song_data["artists"] is a list of strings
-                        # ", ".join(<list of str>) concat the list of strings into a single string separated by commas
+                        # song_data is a shared, read-only song record (see Intern_operations) and
+                        # song_data["artists"] is a tuple of strings
+                        # ", ".join(<tuple of str>) concat the strings into a single string separated by commas
                         # ", ".join(["ab", "c", "d"]) = 'ab, c, d'
                         presentation_window_songs.append(song_data["name"] + "  -  " + ", ".join(song_data["artists"]))
                     # finish the layout
@@ -583,7 +576,11 @@ while True:
                      "next to the artist's name there.")],
             [sg.Text("Spotify URI: ", size=(20, 1)), sg.Input(size=(40, 1), key="-AddWindowURI-")],
             [sg.Text("")],
-            [sg.Button("Confirm", size=(15, 1)), sg.Button("Go Back", size=(15, 1))]
+            [sg.Text("To add many playlists / artists at once, import a text file (one URI or link per line, "
+                     "optionally as <name>=<URI or link>) \n"
+                     "or a CSV file (one URI or link and optionally a name per row).")],
+            [sg.Button("Confirm", size=(15, 1)), sg.Button("Import File", size=(15, 1)),
+             sg.Button("Go Back", size=(15, 1))]
         ]
 
         window_add = sg.Window("What\'s new in Spotify", layout_add_window)
@@ -593,6 +590,43 @@ while True:
             if event_add in (sg.WINDOW_CLOSED, "Go Back"):
                 break
 
+            # add every playlist / artist of a text or CSV file to the group, at once
+            if event_add == "Import File":
+                import_file_path = sg.PopupGetFile("Select the text or CSV file to import:",
+                                                   file_types=(("Text / CSV files", "*.txt *.csv"),))
+                import_result = None
+                if import_file_path:
+                    try:
+                        import_result = Import_operations.import_into_group(
+                            group_name=groups[current_group_id].get_group_name(),
+                            file_path=import_file_path,
+                            sp=sp,
+                            max_workers=settings.get("max_workers", Run_operations.DEFAULT_MAX_WORKERS))
+                    # the file can't be read or decoded, or Spotify couldn't be asked for the names. Nothing has been
+                    # added to the group
+                    except (OSError, ValueError, spotipy.SpotifyException) as import_error:
+                        sg.PopupError("Error: The file could not be imported, nothing has been added to the group!\n"
+                                      "\n" +
+                                      str(import_error))
+
+                if import_result is not None:
+                    rejected_lines = import_result.get_rejected_lines()
+                    sg.Popup("Added " + str(len(import_result.get_playlist_tuples())) + " playlists and " +
+                             str(len(import_result.get_artist_tuples())) + " artists.\n" +
+                             str(import_result.get_duplicate_count()) + " entries were already part of the group "
+                             "or listed twice.\n" +
+                             str(len(rejected_lines)) + " lines are not a playlist or artist URI / link" +
+                             "".join("\n    line " + str(line_number) + ": " + text
+                                     for line_number, text in rejected_lines[:10]) +
+                             ("\n    ..." if len(rejected_lines) > 10 else ""))
+
+                    # update the whole window to show the newly added playlists / artists
+                    update_main_window()
+                    break
+
+                # read the window values again to reset the button press event and by that prevent and infinite loop
+                event_add, values_add = window_add.read()
+
             if event_add == "Confirm":
                 # Check if the input is a link instead of a uri. If it is a link try to convert it into a uri
                 # If it's not a link, it can still be a regular uri and if that's also not the case, the other following
@@ -735,15 +769,17 @@ while True:
 
                 # user has to confirm their choice
                 if rem_window_popup == "OK":
-                    for i in p_indices_to_remove:
-                        IO_operations.remove_playlist_from_group(playlist_tuple=rem_win_playlist_names_and_uris[i],
-                                                                 group=groups[current_group_id])
-                        print("removed: " + rem_win_playlist_names_and_uris[i][0])
-
-                    for i in a_indices_to_remove:
-                        IO_operations.remove_artist_from_group(artist_tuple=rem_win_artist_names_and_uris[i],
-                                                               group=groups[current_group_id])
-                        print("removed: " + rem_win_artist_names_and_uris[i][0])
+                    # every selected entry is removed from the file at once, the file is only written a single time
+                    with IO_operations.start_config_transaction() as transaction:
+                        for i in p_indices_to_remove:
+                            transaction.remove_playlist(groups[current_group_id].get_group_name(),
+                                                        rem_win_playlist_names_and_uris[i])
+                            print("removed: " + rem_win_playlist_names_and_uris[i][0])
+
+                        for i in a_indices_to_remove:
+                            transaction.remove_artist(groups[current_group_id].get_group_name(),
+                                                      rem_win_artist_names_and_uris[i])
+                            print("removed: " + rem_win_artist_names_and_uris[i][0])
 
                 update_main_window()
                 break
@@ -0,0 +1,87 @@
+from datetime import datetime
+
+from IO_operations import get_snapshot_store
+
+# ------------------------------------------------- History Queries -------------------------------------------------
+#
+# Queries over the saved history of a playlist / artist, answered by the snapshot store (see Store_operations) without
+# reading any content file. For playlists the items are songs, for artists they are albums.
+#
+# Every song / album has one or more membership intervals: the periods it was part of the playlist / artist, from the
+# date of the first snapshot holding it up to the date of the first snapshot that doesn't hold it anymore. The store
+# keeps them up to date while content files are saved, so a query only looks up a few rows, no matter how many
+# snapshots have been saved.
+#
+# As usual, the history only knows the days a snapshot was saved at: a song that was added and removed in between two
+# snapshots isn't part of it.
+#
+# ----------------------------------------------------------------------------------------------------------------------
+
+
+def get_songs_on_date(uri, on_date):
+    """
+    Returns the songs (playlists) or albums (artists) that were part of the playlist / artist at the date, according
+    to the newest snapshot saved on or before the date
+
+    :param uri: the spotify URI of a playlist / artist
+    :param on_date: a date
+    :type uri: str
+    :type on_date: date or str
+    :return: a list of song / album URIs in the order of the playlist, empty if no snapshot had been saved by then
+    """
+    return get_snapshot_store().get_item_uris_on_date(uri, on_date)
+
+
+def get_songs_added_between(uri, since_date, until_date):
+    """
+    Returns the songs (playlists) or albums (artists) that have been added to the playlist / artist after since_date,
+    up to and including until_date. A song that was part of the playlist at since_date isn't returned, even if it has
+    been removed and added again in between. If no snapshot had been saved by since_date, every song of the first
+    snapshot counts as added at its date.
+
+    :param uri: the spotify URI of a playlist / artist
+    :param since_date: a date
+    :param until_date: a date
+    :type uri: str
+    :type since_date: date or str
+    :type until_date: date or str
+    :return: a list of tuples (song / album URI, date it has been added), in the order they have been added
+    """
+    return [(item_uri, _to_date(added_date)) for item_uri, added_date in
+            get_snapshot_store().get_item_uris_added_between(uri, since_date, until_date)]
+
+
+def get_first_appearance(uri, song_uri):
+    """
+    Returns the date a song (playlists) or album (artists) has been part of the playlist / artist for the first time
+
+    :param uri: the spotify URI of a playlist / artist
+    :param song_uri: the spotify URI of a song / album
+    :type uri: str
+    :type song_uri: str
+    :return: the date of the first snapshot holding the song / album or None if it has never been part of it
+    """
+    intervals = get_snapshot_store().get_intervals(uri, song_uri)
+    return _to_date(intervals[0][0]) if intervals else None
+
+
+def get_appearances(uri, song_uri):
+    """
+    Returns every period a song (playlists) or album (artists) has been part of the playlist / artist
+
+    :param uri: the spotify URI of a playlist / artist
+    :param song_uri: the spotify URI of a song / album
+    :type uri: str
+    :type song_uri: str
+    :return: a list of tuples (first date, end date), oldest first. The song / album was part of every snapshot from
+             the first date up to (but not including) the end date, the end date is None if it is still part of it
+    """
+    return [(_to_date(first_date), _to_date(end_date) if end_date is not None else None)
+            for first_date, end_date in get_snapshot_store().get_intervals(uri, song_uri)]
+
+
+def _to_date(date_str):
+    """
+    Converts a date of the format yyyy.mm.dd, as used by the content files, into a date object
+    """
+    return datetime.strptime(date_str, "%Y.%m.%d").date()
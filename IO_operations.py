@@ -1,54 +1,18 @@
-import json
+import atexit
 import os.path
 import pathlib
 import re
-from bisect import bisect_left
+import threading
 from datetime import date, datetime
-from os import listdir
 
+import Config_operations
+import Request_operations
+import Retention_operations
+import Snapshot_operations
+import Store_operations
 import URI_operations
-
-
-class Group(object):
-    """
-    A group object holds information about a group specified in the playlist_and_artists.txt file:
-        1. the group id
-        2. the group name
-        3. the target playlist
-        4. the playlist
-        5. the artists
-    """
-
-    def __init__(self, group_id, group_name, target_playlist, playlist_tuples, artist_tuples):
-        """
-        Creates a Group object
-
-        :param group_id: the id of the group ( in order of appearance in the .txt file, starting at 0 )
-        :type group_id: int
-        :param group_name: the name of the group
-        :type group_name: str
-        :param target_playlist: the URI of the playlist where new songs from other playlists will be added to
-        :type target_playlist: str
-        :param playlist_tuples: a list of playlist tuples (playlist_name, URI) that are observe by the group
-        :type playlist_tuples: list[tuple[string, string]]
-        :param artist_tuples: a list of artist tuples (artist_name, URI) that are observe by the group
-        :type artist_tuples: list[tuple[string, string]]
-        """
-        self.group_id = group_id
-        self.group_name = group_name
-        self.target_playlist = target_playlist
-        self.playlists = playlist_tuples
-        self.artists = artist_tuples
-
-    def get_group_id(self): return self.group_id
-
-    def get_group_name(self): return self.group_name
-
-    def get_target_playlist(self): return self.target_playlist
-
-    def get_playlist_tuples(self): return self.playlists
-
-    def get_artist_tuples(self): return self.artists
+import Writer_operations
+from Config_operations import Group
 
 
 # ------------------------------------------------ Regular Expressions ------------------------------------------------
@@ -72,25 +36,27 @@ class Group(object):
 # \S matches any non-whitespace character;   \s matches any whitespace character
 #
 _NAME_RE = "[^\s].*"  # nopep8
-_URI_ARTIST_RE = "spotify:artist:\S*"  # nopep8
-_URI_PLAYLIST_RE = "spotify:playlist:\S*"  # nopep8
-
-_SUBGROUP_GROUP_NAME = "(?P<GROUP_NAME>.*)"
-_SUBGROUP_TARGET = "## ADD_TO:{(?P<TARGET_PLAYLIST>" + _URI_PLAYLIST_RE + ")}"
-_SUBGROUP_PLAYLISTS = "## PLAYLISTS={(?P<PLAYLISTS>(?:\s*" + _NAME_RE + "=" + _URI_PLAYLIST_RE + ")*)\s*}"  # nopep8
-_SUBGROUP_ARTIST = "## ARTISTS={(?P<ARTISTS>(?:\s*" + _NAME_RE + "=" + _URI_ARTIST_RE + ")*)\s*}"  # nopep8
+_URI_ARTIST_RE = Config_operations.URI_ARTIST_RE
+_URI_PLAYLIST_RE = Config_operations.URI_PLAYLIST_RE
 
-# note: a group name is NOT restricted by the playlist and artist naming standards
-_GROUP_RE = "GROUP:" + _SUBGROUP_GROUP_NAME + "={\s*" \
-            + _SUBGROUP_TARGET + "\s*" + _SUBGROUP_PLAYLISTS + "\s*" + _SUBGROUP_ARTIST + "\s*}"  # nopep8
-
-_PLAYLIST_TUPLE_RE = _NAME_RE + "=" + _URI_PLAYLIST_RE
-_ARTIST_TUPLE_RE = _NAME_RE + "=" + _URI_ARTIST_RE
+# the groups are read by Config_operations.tokenize_config(), see its description of the config file
 
 # ----------------------------------------------------------------------------------------------------------------------
 
 
 _NAME_OF_CONTENT_DIRECTORY = "content_files"
+_NAME_OF_CONFIG_FILE = "playlists_and_artists.txt"
+
+# the snapshot store is created by get_snapshot_store() when it is used for the first time
+_snapshot_store = None
+_snapshot_store_lock = threading.Lock()
+
+# the snapshot writer is created by get_snapshot_writer() when it is used for the first time
+_snapshot_writer = None
+_snapshot_writer_lock = threading.Lock()
+
+# only the fields that are read from a content file are saved (see Request_operations.PLAYLIST_ITEM_FIELDS)
+_SNAPSHOT_PAGE_FIELDS = Request_operations.get_page_fields(Request_operations.PLAYLIST_ITEM_FIELDS["snapshot"])
 
 
 def get_playlist_re():
@@ -109,48 +75,45 @@ def get_artist_re():
 
 def read_groups_from_file():
     """
-    Reads all groups from the file and returns them as a list of Group objects where group_ID starts at 0
+    Reads all groups from the file and returns them as a list of Group objects where group_ID starts at 0. The file is
+    only parsed again if it has changed since the last call (see Config_operations.load_config()), the Group objects
+    are shared and must not be changed.
 
     :return: a list of Group objects each containing a group's metadata
-    :raise IndexError: when the group signature matches, but doesn't have the subgroups group_name, target_playlist,
-            playlists and artists.
     """
-    # read input file
-    with open("playlists_and_artists.txt", "r") as file:
-        config_text = "".join(file.readlines())  # concatenates every line into a one single string
-        file.close()
+    # a new list, so the caller may change it without changing the cached config
+    return list(Config_operations.load_config(_NAME_OF_CONFIG_FILE).get_groups())
+
+
+def find_malformed_groups():
+    """
+    Returns the groups of the playlists_and_artists.txt file that are skipped by read_groups_from_file(), because they
+    don't have the format of a group (see Config_operations.tokenize_config())
+
+    :return: a list of tuples (line number, first line of the group), the first line is line 1
+    """
+    return Config_operations.load_config(_NAME_OF_CONFIG_FILE).get_malformed_groups()
 
-    matches = re.finditer(_GROUP_RE, config_text)
-    match_list = []
 
-    for matchNum, match in enumerate(matches, start=0):
+def find_group(group_name):
+    """
+    Returns the group with the name, as it is saved in the playlists_and_artists.txt file right now
 
-        # check for consistency
-        # each match will have 4 attributes: the group name, the target playlist,the playlists
-        # and the artists. The command .groups() is used to get them.
-        # group(0) is the complete match, but it's not counted by len(match.group())
-        if len(match.groups()) != 4:
-            raise IndexError("A match must have 4 groups, otherwise it's an illegal match! \n"
-                             "\t The groups are: the group name, the target playlist, the playlists "
-                             "and the artists.")
+    :param group_name: the name of a group
+    :type group_name: str
+    :return: the Group or None if there is no group with that name
+    """
+    return Config_operations.load_config(_NAME_OF_CONFIG_FILE).find_group(group_name)
 
-        # note: group(3) is the string containing all playlist tuples, but still contains white-space and new-line
-        # chars. We use another RE to extract only the tuples (still as strings) and put them into the dictionary.
-        # group(4) is the same but for the artist tuples.
-        # group(0) is the complete match as a string
-        #
-        # we need the tuple stings to be separated into (name, URI); .split() returns a list that we cast into a tuple
-        group = Group(group_id=matchNum,
-                      group_name=match.group(1),
-                      target_playlist=match.group(2),
-                      playlist_tuples=[tuple(p_list.group(0).split("=")) for p_list in
-                                       (re.finditer(_PLAYLIST_TUPLE_RE, match.group(3)))],
-                      artist_tuples=[tuple(artist.group(0).split("=")) for artist in
-                                     (re.finditer(_ARTIST_TUPLE_RE, match.group(4)))])
 
-        match_list.append(group)
+def start_config_transaction():
+    """
+    Starts a transaction on the playlists_and_artists.txt file. Changes are queued and written to the file at once
+    when the transaction is committed, see Config_operations.ConfigTransaction
 
-    return match_list
+    :return: a ConfigTransaction
+    """
+    return Config_operations.ConfigTransaction(_NAME_OF_CONFIG_FILE)
 
 
 def save_group_to_file(group):
@@ -160,30 +123,9 @@ def save_group_to_file(group):
     :param group: the group that should be saved to the file
     :type group: Group
     """
-    # 'a' means append, new lines will be added to the end of the file
-    with open("playlists_and_artists.txt", "a") as file:
-        file.write("\n\n\n")
-        file.write("GROUP:" + group.get_group_name() + "={\n")
-        file.write("## ADD_TO:{" + group.get_target_playlist() + "}\n")
-        file.write("\n")
-
-        # write the playlists to the file
-        file.write("## PLAYLISTS={\n")
-        for p_tuple in group.get_playlist_tuples():
-            file.write("\t" + p_tuple[0] + "=" + p_tuple[1] + "\n")
-        file.write("}\n")
-        file.write("\n")    # one blank line for readability
-
-        # write the artists to the file
-        file.write("## ARTISTS={\n")
-        for a_tuple in group.get_artist_tuples():
-            file.write(a_tuple[0] + "=" + a_tuple[1] + "\n")
-        file.write("}\n")
-
-        # last closing parenthesis to end the group
-        file.write("}\n")
-
-        file.close()
+    # the group is appended to the end of the file
+    with start_config_transaction() as transaction:
+        transaction.add_group(group)
 
 
 def remove_group_from_file(group):
@@ -193,27 +135,8 @@ def remove_group_from_file(group):
     :param group: the group that will be removed
     :type group: Group
     """
-    with open("playlists_and_artists.txt", "r") as file:
-        config_text = "".join(file.readlines())  # concatenates every line into one single string
-        file.close()
-
-    for match in re.finditer(pattern=_GROUP_RE, string=config_text):
-        # find the correct group
-        if match.group("GROUP_NAME") == group.get_group_name():
-            # get beginning and the end of the group entry in the file
-            span = match.span(0)  # returns a tuple; 0 represents the full match, not just a group inside the match
-
-            # overwrite the whole file with its' original content, but without the group that should be removed
-            # note: I don't know how to find the correct position / line in the file with REs. That is the sole reason
-            #       I overwrite the whole file.
-            #       I know this is ineffective but the file isn't huge so it's not that big of a deal
-            with open("playlists_and_artists.txt", "w") as file:
-                config_text = config_text[:span[0]] + config_text[span[1]:]  # leave out the matched group
-                file.write(config_text)
-                file.close()
-
-            # found the correct group and did everything that needed to be done, no need to look further
-            break
+    with start_config_transaction() as transaction:
+        transaction.remove_group(group.get_group_name())
 
 
 def save_uri_content_to_hard_drive(sp, uri):
@@ -225,36 +148,24 @@ def save_uri_content_to_hard_drive(sp, uri):
     :type sp: spotipy.Spotify
     :type uri: str
     """
-
-    # get current date and change the date format to yyyy.mm.dd
-    today = str(date.today())  # current format: yyyy-mm-dd
-    today = today.replace("-", ".")
-
-    # rename a uri like "spotify:playlist:37 ..." to "spotify_playlist_37 ..."
-    uri_directory_name = uri.replace(":", "_")
-    file_name = uri_directory_name + "_content_raw(" + today + ").json"
-
-    # get main directory (all .py files are in the main directory)
-    main_dir_path = os.path.dirname(__file__)  # returns the directory of this file
-
-    # navigate to the directory containing all content file directories
-    content_file_dir_path = os.path.join(main_dir_path, _NAME_OF_CONTENT_DIRECTORY)
-
-    uri_directory_path = os.path.join(content_file_dir_path, uri_directory_name)
-
-    # check if the needed directory already exists, if not create it
-    if not os.path.isdir(uri_directory_path):
-        os.mkdir(uri_directory_path)
-
-    # get the content of the uri and save it into a file called <uri>_content_raw(<currentDate>).json
-    file_path = os.path.join(uri_directory_path, file_name)
+    # get the content of the uri and save it as snapshot <uri>_content_raw(<currentDate>), see Snapshot_operations
+    file_path = _get_new_content_file_path(uri)
 
     # for playlists save the entire playlist content to the hard drive
     if URI_operations.is_playlist_uri(uri):
-        with open(file_path, "w") as file:
-            content = sp.playlist_items(playlist_id=URI_operations.get_playlist_id_from_uri(uri))
-            json.dump(content, file)
-            file.close()
+        # the snapshot ID is requested before the items. If the playlist changes in between, the saved snapshot ID is
+        # older than the saved items and the playlist is simply saved again by the next run
+        snapshot_id = sp.playlist(playlist_id=URI_operations.get_playlist_id_from_uri(uri),
+                                  fields=Request_operations.PLAYLIST_FIELDS["snapshot_id"])["snapshot_id"]
+
+        # skip the download if the playlist hasn't changed since it was saved the last time
+        if _is_newest_snapshot_id(uri, snapshot_id):
+            return
+
+        first_page = sp.playlist_items(playlist_id=URI_operations.get_playlist_id_from_uri(uri),
+                                       fields=_SNAPSHOT_PAGE_FIELDS)
+        saved_file_path = Snapshot_operations.save_snapshot(
+            file_path, Request_operations.iterate_pages(sp, first_page), "playlist", snapshot_id)
 
     # for artists save every album featuring the artist to the hard drive
     # artists release songs in albums or as singles or they are featured on them. Their songs can also be part of a
@@ -263,15 +174,210 @@ def save_uri_content_to_hard_drive(sp, uri):
     # So if an artist appears on a new album, they most likely released a new song OR one of their songs got added to
     # a compilations. The latter shouldn't happen that often tho.
     elif URI_operations.is_artist_uri(uri):
-        with open(file_path, "w") as file:
-            content = sp.artist_albums(artist_id=URI_operations.get_artist_id_from_uri(uri))
-            json.dump(content, file)
-            file.close()
+        first_page = sp.artist_albums(artist_id=URI_operations.get_artist_id_from_uri(uri))
+        # the artist's albums can't be projected by Spotify, only the snapshot's columns are taken from them
+        saved_file_path = Snapshot_operations.save_snapshot(
+            file_path, Request_operations.iterate_pages(sp, first_page), "artist")
 
     # make sure to throw an error to indicate something went wrong
     else:
         raise ValueError("Uri is not a playlist or artist uri")
 
+    get_snapshot_store().add_content_file(saved_file_path)
+
+
+async def save_uri_content_to_hard_drive_async(asp, uri):
+    """
+    Async variant of save_uri_content_to_hard_drive(). Saves the uri's content to a file. Supports only artist and
+    playlist uris.
+
+    :param asp: the asyncio based Spotify API client
+    :param uri: a spotify uri of a playlist or artist
+    :type asp: Async_operations.AsyncSpotify
+    :type uri: str
+    """
+    # see save_uri_content_to_hard_drive() for more details
+    snapshot_id = None
+    if URI_operations.is_playlist_uri(uri):
+        snapshot_id = (await asp.playlist(playlist_id=URI_operations.get_playlist_id_from_uri(uri),
+                                          fields=Request_operations.PLAYLIST_FIELDS["snapshot_id"]))["snapshot_id"]
+        if _is_newest_snapshot_id(uri, snapshot_id):
+            return
+        first_page = await asp.playlist_items(playlist_id=URI_operations.get_playlist_id_from_uri(uri),
+                                              fields=_SNAPSHOT_PAGE_FIELDS)
+        kind = "playlist"
+    elif URI_operations.is_artist_uri(uri):
+        first_page = await asp.artist_albums(artist_id=URI_operations.get_artist_id_from_uri(uri))
+        kind = "artist"
+    else:
+        raise ValueError("Uri is not a playlist or artist uri")
+
+    # the file is only opened once every item has been received, so a failed request never leaves a half written file
+    items = [item async for item in Request_operations.iterate_pages_async(asp, first_page)]
+    saved_file_path = Snapshot_operations.save_snapshot(_get_new_content_file_path(uri), items, kind, snapshot_id)
+    get_snapshot_store().add_content_file(saved_file_path)
+
+
+def save_uri_content_in_background(uri, items, snapshot_id=None):
+    """
+    Saves content of the uri that has already been fetched, i.e. while looking for new songs, so it doesn't have to be
+    requested a second time. The content is saved by the snapshot writer's background thread (see
+    get_snapshot_writer()), this function returns right away.
+
+    :param uri: a spotify uri of a playlist or artist
+    :param items: the items of the playlist with at least the fields of Request_operations.PLAYLIST_ITEM_FIELDS
+                  ["snapshot"] or the artist's albums (as returned by artist_albums())
+    :param snapshot_id: the playlist's snapshot ID, requested before the items (see save_uri_content_to_hard_drive())
+    :type uri: str
+    :type items: list[dict]
+    :type snapshot_id: str
+    """
+    if URI_operations.is_playlist_uri(uri):
+        # the playlist hasn't changed since it was saved the last time
+        if snapshot_id is not None and _is_newest_snapshot_id(uri, snapshot_id):
+            return
+        kind = "playlist"
+    elif URI_operations.is_artist_uri(uri):
+        kind = "artist"
+    else:
+        raise ValueError("Uri is not a playlist or artist uri")
+
+    get_snapshot_writer().save(_get_new_content_file_path(uri), items, kind, snapshot_id)
+
+
+def _get_new_content_file_path(uri):
+    """
+    Returns the path of today's content file of the uri. The uri's content file directory is created if it doesn't
+    exist yet.
+
+        content file naming format:  spotify_<playlist / artist>_<id<_content_raw(<yyyy.mm.dd>).json.gz
+
+    :param uri: a spotify uri of a playlist or artist
+    :type uri: str
+    :return: the path of the content file as a string
+    """
+    # get current date and change the date format to yyyy.mm.dd
+    today = str(date.today())  # current format: yyyy-mm-dd
+    today = today.replace("-", ".")
+
+    # rename a uri like "spotify:playlist:37 ..." to "spotify_playlist_37 ..."
+    uri_directory_name = Snapshot_operations.get_content_directory_name(uri)
+    file_name = uri_directory_name + "_content_raw(" + today + ")" + Snapshot_operations.SNAPSHOT_FILE_EXTENSION
+
+    uri_directory_path = os.path.join(_get_content_directory_path(), uri_directory_name)
+
+    # check if the needed directory already exists, if not create it
+    # (exist_ok, because several sources can be saved at the same time)
+    os.makedirs(uri_directory_path, exist_ok=True)
+
+    return os.path.join(uri_directory_path, file_name)
+
+
+def get_snapshot_id_from_cont_file(content_file):
+    """
+    Reads the snapshot ID of the playlist that was saved together with the content file. Only the beginning of the
+    file is read.
+
+    :param content_file: the path of a content file
+    :type content_file: pathlib.Path
+    :return: the snapshot ID or None if the content file has no snapshot ID (i.e. content files of artists and content
+             files saved by older versions of this program)
+    """
+    return Snapshot_operations.read_snapshot_id(content_file)
+
+
+def get_item_uris_from_cont_file(content_file):
+    """
+    Returns the URIs of the songs (playlist content file) or albums (artist content file) that were saved in the
+    content file. The URIs are taken from the snapshot store, the content file is only read if it's not indexed.
+
+    :param content_file: the path of a content file
+    :type content_file: pathlib.Path
+    :return: a list of URIs in the order they were saved in
+    """
+    item_uris = get_snapshot_store().get_item_uris(content_file)
+    if item_uris is None:
+        # only the URIs are streamed out of the content file, the items without a track are left out
+        item_uris = [item_uri for item_uri in Snapshot_operations.read_item_uris(content_file) if item_uri is not None]
+
+    return item_uris
+
+
+def get_snapshot_store():
+    """
+    Get the process wide snapshot store, the store is created when it is used for the first time
+
+    :return: the SnapshotStore of the content directory
+    """
+    global _snapshot_store
+    with _snapshot_store_lock:
+        if _snapshot_store is None:
+            _snapshot_store = Store_operations.SnapshotStore(_get_content_directory_path())
+
+    return _snapshot_store
+
+
+def get_snapshot_writer():
+    """
+    Get the process wide snapshot writer, the writer is created when it is used for the first time. Every content file
+    it saves is added to the snapshot store. The queued snapshots are saved before the program exits.
+
+    :return: the SnapshotWriter
+    """
+    global _snapshot_writer
+    with _snapshot_writer_lock:
+        if _snapshot_writer is None:
+            _snapshot_writer = Writer_operations.SnapshotWriter(
+                on_saved=lambda saved_file_path: get_snapshot_store().add_content_file(saved_file_path))
+            atexit.register(_snapshot_writer.close)
+
+    return _snapshot_writer
+
+
+def compact_content_files(settings):
+    """
+    Applies the retention policy configured in settings.json to the content files of every playlist / artist, see
+    Retention_operations. The snapshots that are still queued are saved first.
+
+    :param settings: the content of settings.json
+    :type settings: dict
+    :return: the number of compacted content file directories
+    """
+    get_snapshot_writer().flush()
+
+    content_directory_path = _get_content_directory_path()
+    if not os.path.isdir(content_directory_path):
+        return 0
+
+    return Retention_operations.compact_content_files(content_directory_path,
+                                                      Retention_operations.get_retention_policy(settings))
+
+
+def _get_content_directory_path():
+    """
+    Returns the path of the directory containing all content file directories
+    """
+    # get main directory (all .py files are in the main directory)
+    main_dir_path = os.path.dirname(__file__)  # returns the directory of this file
+
+    return os.path.join(main_dir_path, _NAME_OF_CONTENT_DIRECTORY)
+
+
+def _is_newest_snapshot_id(uri, snapshot_id):
+    """
+    Checks whether the snapshot ID is the snapshot ID of the newest content file of the playlist (today's content file
+    included)
+
+    :param uri: the spotify URI of the playlist
+    :param snapshot_id: the playlist's current snapshot ID
+    :type uri: str
+    :type snapshot_id: str
+    :return: True if the playlist hasn't changed since the newest content file was saved
+    """
+    # the snapshot ID of the newest content file is part of the snapshot store, the content file isn't read
+    newest_snapshot_id = get_snapshot_store().get_newest_snapshot_id(uri)
+    return newest_snapshot_id is not None and newest_snapshot_id == snapshot_id
+
 
 def read_playlists_and_artists_uris_from_file():
     """
@@ -414,7 +520,8 @@ def find_latest_content_file(uri, since_date=None):
         Searches for the most recently saved content file of the playlist.
 
     When since_date is NOT None:
-        Searches for the newest content file of the URI that is closest to the given date
+        Searches for the content file of the URI from the given date. If there is none, the newest content file before
+        the given date is returned, or the oldest content file after it if there is no older content file.
 
     :param uri: the spotify URI of the playlist / artist
     :type uri: str
@@ -426,6 +533,7 @@ def find_latest_content_file(uri, since_date=None):
     # directory structure:
     # main dir (containing all the .py files)
     #   - content_files ( =: _NAME_OF_CONTENT_DIRECTORY )
+    #       -snapshots.sqlite3 (the snapshot store, an index of every content file, see Store_operations)
     #       -spotify:playlist:<id>
     #           -spotify:playlist:<id>_content_raw_<date> (dictionary / json file)
     #           -spotify:playlist:<id>_content_raw_<date2> (dictionary / json file)
@@ -433,86 +541,27 @@ def find_latest_content_file(uri, since_date=None):
     #       -spotify:artist:<id>
     #           ...
 
-    # remove ":"s from uri and replace them with "_" as ":" must not be part of filename on some OS
     if uri is None or uri == "":
         return None
-    else:
-        uri = uri.replace(":", "_")
 
-    # get main directory (all .py files are in the main directory)
-    main_dir_path = os.path.dirname(__file__)  # returns the directory of this file
-
-    # navigate to the directory containing all content file directories
-    content_file_dir_path = os.path.join(main_dir_path, _NAME_OF_CONTENT_DIRECTORY)
-
-    # list all files and directories of the content directory (NOT recursive)
-    content_overview = listdir(content_file_dir_path)
-
-    # if no since_date is passed, search for the most recent content file of the URI, that is not from today
-    if since_date is None:
-        for directory in content_overview:
-            if directory == uri and not os.path.isfile(directory):
-                # find the newest / most recently saved content file
-                content_files = listdir(os.path.join(content_file_dir_path, directory))
-                content_files.sort()
-
-                # because of the date format yyyy.mm.dd the newest file will be at the end of the SORTED list
-                latest_content_file = content_files[len(content_files) - 1]
+    # the snapshot store answers with an indexed query instead of listing the content directories
+    latest_content_file = get_snapshot_store().find_content_file(uri, since_date=since_date)
 
-                # ignore the file if it is from the current day. Otherwise the method works only once a day correctly
-                # content files always end with a date at the end,
-                # i.e.: spotify_playlist_<id>_content_raw(2021.01.14).json
-                content_file_date = latest_content_file.replace(".json", "")[-11:-1]  # gets the date
-                today = str(date.today()).replace("-", ".")  # format now: yyyy.mm.dd
-
-                if not today == content_file_date:
-                    # return the path to the file as a Path object (better than a String when run on different OS)
-                    return pathlib.Path(os.path.join(content_file_dir_path, directory, latest_content_file))
-
-                elif len(content_files) > 1:
-                    # get the second most recent entry
-                    return pathlib.Path(
-                        os.path.join(content_file_dir_path, directory, content_files[len(content_files) - 2]))
-
-                else:
-                    # if there is only one content file and it's from today, act like there is no content file
-                    return None
-
-        # if no content file is found, return nothing
-        return None
-
-    # if a since_date is passed, search for the newest content file of the URI that is closest to the given date
-    else:
-        for directory in content_overview:
-            if directory == uri and not os.path.isfile(directory):
-                # find the most recently saved content file closest to the given date using binary search
-                # binary search requires a sorted list
-                content_files = listdir(os.path.join(content_file_dir_path, directory))
-                content_files.sort()  # oldest content file at index 0
-                index = bisect_left(content_files, x=uri + "_content_raw(" + str(since_date).replace("-", ".") + ")")
-
-                # if index is len(content_files) there is no content file from or after the specified date
-                if index == len(content_files):
-                    return None
-                latest_content_file = content_files[index]
-
-                return pathlib.Path(os.path.join(content_file_dir_path, directory, latest_content_file))
-
-        # if no content file is found, return nothing
-        return None
+    # return the path to the file as a Path object (better than a String when run on different OS)
+    return pathlib.Path(latest_content_file) if latest_content_file else None
 
 
 def get_date_from_cont_file(content_file) -> date:
     """
     Extracts the date from the content file name and returns it as a datetime.date object
 
-        content file naming format:  spotify_<playlist / artist>_<id<_content_raw(<yyyy.mm.dd>).json
+        content file naming format:  spotify_<playlist / artist>_<id<_content_raw(<yyyy.mm.dd>).json.gz
 
     :param content_file: the path of a content file (as pathlib.Path object)
     :type content_file: pathlib.Path
     :return: the date of the content file
     """
-    date_wrong_format = str(content_file).replace(".json", "")[-11:-1]  # gets the date, format: yyyy.mm.dd
+    date_wrong_format = get_date_str_of_content_file(pathlib.Path(content_file).name)  # format: yyyy.mm.dd
     return datetime.strptime(date_wrong_format.replace(".", "-"), "%Y-%m-%d")
 
 
@@ -525,154 +574,76 @@ def get_date_from_latest_cont_file(uri) -> date:
     :return: the date of the latest content file
     """
     # gets the date, format: yyyy.mm.dd
-    date_wrong_format = str(find_latest_content_file(uri)).replace(".json", "")[-11:-1]
+    date_wrong_format = get_date_str_of_content_file(find_latest_content_file(uri).name)
     return datetime.strptime(date_wrong_format.replace(".", "-"), "%Y-%m-%d")
 
 
+def get_date_str_of_content_file(file_name):
+    """
+    Extracts the date from the name of a content file, no matter if it's a compact snapshot (.json.gz) or a raw content
+    file (.json)
+
+        get_date_str_of_content_file("spotify_playlist_<id>_content_raw(2021.01.14).json.gz") = "2021.01.14"
+
+    :param file_name: the name of a content file
+    :type file_name: str
+    :return: the date as a string of the format yyyy.mm.dd or None if the name contains no date
+    """
+    return Snapshot_operations.get_date_str(file_name)
+
+
 def add_playlist_to_group(p_tuple, group):
     """
-    Add the playlist specified in p_tuple to the group by writing it to the playlists_and_artists.txt file
+    Add the playlist specified in p_tuple to the group by writing it to the playlists_and_artists.txt file. To add
+    several playlists at once, use a transaction (see start_config_transaction())
 
     :param p_tuple: a tuple (playlist_name, playlist_URI)
     :type p_tuple: tuple[str,str]
     :param group: the group object that the playlist will be added to
     :type group: Group
     """
-    with open("playlists_and_artists.txt", "r") as file:
-        config_text = "".join(file.readlines())  # concatenates every line into a one single string
-        file.close()
-
-    for match in re.finditer(pattern=_GROUP_RE, string=config_text):
-        # find the correct group
-        if match.group("GROUP_NAME") == group.get_group_name():
-
-            # read the group's current playlists by getting the beginning and end of the RE's subgroup "PLAYLISTS"
-            span = match.span("PLAYLISTS")  # returns a tuple
-            current_playlists = config_text[span[0]: span[1]]
-
-            # append the new playlist
-            current_playlists += "\n\n\t" + p_tuple[0] + "=" + p_tuple[1]
-
-            # overwrite the old playlists in the file (actually overwrite the whole file)
-            # note: I don't know how to find the correct position / line in the file with REs. That is the sole reason
-            #       I overwrite the whole file.
-            #       I know this is ineffective but the file isn't huge so it's not that big of a deal
-            with open("playlists_and_artists.txt", "w") as file:
-                config_text = config_text[:span[0]] + current_playlists + config_text[span[1]:]
-                file.write(config_text)
-                file.close()
-
-            # found the correct group and did everything that needed to be done, no need to look further
-            break
+    with start_config_transaction() as transaction:
+        transaction.add_playlist(group.get_group_name(), p_tuple)
 
 
 def add_artist_to_group(a_tuple, group):
     """
-    Add the artist specified in a_tuple to the group by writing them to the playlists_and_artists.txt file
+    Add the artist specified in a_tuple to the group by writing them to the playlists_and_artists.txt file. To add
+    several artists at once, use a transaction (see start_config_transaction())
 
     :param a_tuple: a tuple (artist_name, artist_URI)
     :type a_tuple: tuple[str,str]
     :param group: the group object that the artist will be added to
     :type group: Group
     """
-    with open("playlists_and_artists.txt", "r") as file:
-        config_text = "".join(file.readlines())  # concatenates every line into a one single string
-        file.close()
-
-    for match in re.finditer(pattern=_GROUP_RE, string=config_text):
-        # find the correct group
-        if match.group("GROUP_NAME") == group.get_group_name():
-
-            # read the group's current artists by getting the beginning and end of the RE's subgroup "ARTISTS"
-            span = match.span("ARTISTS")  # returns a tuple
-            current_artists = config_text[span[0]: span[1]]
-
-            # append the new artist
-            current_artists += "\n\n\t" + a_tuple[0] + "=" + a_tuple[1]
-
-            # overwrite the old artists in the file (actually overwrite the whole file)
-            # note: I don't know how to find the correct position / line in the file with REs. That is the sole reason
-            #       I overwrite the whole file.
-            #       I know this is ineffective but the file isn't huge so it's not that big of a deal
-            with open("playlists_and_artists.txt", "w") as file:
-                config_text = config_text[:span[0]] + current_artists + config_text[span[1]:]
-                file.write(config_text)
-                file.close()
-
-            # found the correct group and did everything that needed to be done, no need to look further
-            break
+    with start_config_transaction() as transaction:
+        transaction.add_artist(group.get_group_name(), a_tuple)
 
 
 def remove_playlist_from_group(playlist_tuple, group):
     """
-        Removes the artist specified in playlist_tuple from the group by erasing the entry from the
-        playlist_and_artist.txt
-        file
+    Removes the playlist specified in playlist_tuple from the group by erasing the entry from the
+    playlist_and_artist.txt file. To remove several playlists at once, use a transaction (see
+    start_config_transaction())
 
-        :param playlist_tuple:
-        :type playlist_tuple: tuple[str, str]
-        :param group:
-        :type group: Group
-        """
-    with open("playlists_and_artists.txt", "r") as file:
-        config_text = "".join(file.readlines())  # concatenates every line into one single string
-        file.close()
-
-    for match in re.finditer(pattern=_GROUP_RE, string=config_text):
-        # find the correct group
-        if match.group("GROUP_NAME") == group.get_group_name():
-            # read the group's current playlists by getting the beginning and end of the RE's subgroup "PLAYLISTS"
-            span = match.span("PLAYLISTS")  # returns a tuple
-            current_playlists = config_text[span[0]: span[1]]
-
-            # remove the artist
-            current_playlists = current_playlists.replace("\n\n\t" + playlist_tuple[0] + "=" + playlist_tuple[1], "")
-
-            # overwrite the old artists in the file (actually overwrite the whole file)
-            # note: I don't know how to find the correct position / line in the file with REs. That is the sole reason
-            #       I overwrite the whole file.
-            #       I know this is ineffective but the file isn't huge so it's not that big of a deal
-            with open("playlists_and_artists.txt", "w") as file:
-                config_text = config_text[:span[0]] + current_playlists + config_text[span[1]:]
-                file.write(config_text)
-                file.close()
-
-            # found the correct group and did everything that needed to be done, no need to look further
-            break
+    :param playlist_tuple: a tuple (playlist_name, playlist_URI)
+    :type playlist_tuple: tuple[str, str]
+    :param group: the group object that the playlist will be removed from
+    :type group: Group
+    """
+    with start_config_transaction() as transaction:
+        transaction.remove_playlist(group.get_group_name(), playlist_tuple)
 
 
 def remove_artist_from_group(artist_tuple, group):
     """
     Removes the artist specified in artist_tuple from the group by erasing the entry from the playlist_and_artist.txt
-    file
+    file. To remove several artists at once, use a transaction (see start_config_transaction())
 
-    :param artist_tuple:
+    :param artist_tuple: a tuple (artist_name, artist_URI)
     :type artist_tuple: tuple[str, str]
-    :param group:
+    :param group: the group object that the artist will be removed from
     :type group: Group
     """
-    with open("playlists_and_artists.txt", "r") as file:
-        config_text = "".join(file.readlines())  # concatenates every line into a one single string
-        file.close()
-
-    for match in re.finditer(pattern=_GROUP_RE, string=config_text):
-        # find the correct group
-        if match.group("GROUP_NAME") == group.get_group_name():
-            # read the group's current artists by getting the beginning and end of the RE's subgroup "ARTISTS"
-            span = match.span("ARTISTS")  # returns a tuple
-            current_artists = config_text[span[0]: span[1]]
-
-            # remove the artist
-            current_artists = current_artists.replace("\n\n\t" + artist_tuple[0] + "=" + artist_tuple[1], "")
-
-            # overwrite the old artists in the file (actually overwrite the whole file)
-            # note: I don't know how to find the correct position / line in the file with REs. That is the sole reason
-            #       I overwrite the whole file.
-            #       I know this is ineffective but the file isn't huge so it's not that big of a deal
-            with open("playlists_and_artists.txt", "w") as file:
-                config_text = config_text[:span[0]] + current_artists + config_text[span[1]:]
-                file.write(config_text)
-                file.close()
-
-            # found the correct group and did everything that needed to be done, no need to look further
-            break
+    with start_config_transaction() as transaction:
+        transaction.remove_artist(group.get_group_name(), artist_tuple)
@@ -0,0 +1,283 @@
+import csv
+import re
+
+import spotipy
+
+import IO_operations
+import Request_operations
+import Run_operations
+import URI_operations
+
+# ---------------------------------------------------- Import Files ----------------------------------------------------
+#
+# An import file holds the playlists and artists that are added to a group at once, see import_into_group(). Every
+# playlist / artist is given as a spotify URI or a link (see URI_operations.REFERENCE_RE), URIs and links can be mixed.
+#
+# A text file holds one playlist / artist per line, optionally with a name, like in the playlists_and_artists.txt file:
+#
+#   <URI or link>
+#   <name>=<URI or link>
+#
+# Blank lines and lines starting with "#" are skipped.
+#
+# A CSV file (.csv) holds one playlist / artist per row. The first cell that holds a URI or link is the playlist /
+# artist, the first other cell that isn't empty is its name. The first row is skipped if it doesn't hold a URI or link
+# (a header row).
+#
+_CSV_FILE_EXTENSION = ".csv"
+_COMMENT_PREFIX = "#"
+# the encodings an import file is read with, in this order, see read_import_file()
+_ENCODINGS = ("utf-8-sig", "cp1252")
+
+# a line of a text file, the name is matched lazily, so a name may contain "=" as well as the link ("?si=...")
+_ENTRY_PATTERN = re.compile(r"\s*(?:(?P<name>.*?)\s*=\s*)?" + URI_operations.REFERENCE_RE + r"\s*")
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+# the maximum number of artists Spotify returns for a single request, see get_artist_names()
+MAX_ARTISTS_PER_REQUEST = 50
+
+# the kinds of URIs a group can observe
+_PLAYLIST = "playlist"
+_ARTIST = "artist"
+
+
+class ImportResult(object):
+    """
+    An import result holds what import_into_group() has done with the entries of an import file:
+        1. the playlist tuples (name, URI) that have been added to the group
+        2. the artist tuples (name, URI) that have been added to the group
+        3. the number of entries that have been skipped, because the group already observes the playlist / artist or
+           an earlier entry of the file refers to it as well
+        4. the entries that have been rejected, as tuples (line number, text), because they are neither a playlist
+           nor an artist URI / link
+    """
+
+    def __init__(self, playlist_tuples, artist_tuples, duplicate_count, rejected_lines):
+        """
+        Creates an ImportResult object
+
+        :param playlist_tuples: the playlist tuples (name, URI) that have been added
+        :type playlist_tuples: list[tuple[str, str]]
+        :param artist_tuples: the artist tuples (name, URI) that have been added
+        :type artist_tuples: list[tuple[str, str]]
+        :param duplicate_count: the number of entries that have been skipped as duplicates
+        :type duplicate_count: int
+        :param rejected_lines: tuples (line number, text) of the rejected entries, the first line is line 1
+        :type rejected_lines: list[tuple[int, str]]
+        """
+        self.playlists = playlist_tuples
+        self.artists = artist_tuples
+        self.duplicate_count = duplicate_count
+        self.rejected_lines = rejected_lines
+
+    def get_playlist_tuples(self): return self.playlists
+
+    def get_artist_tuples(self): return self.artists
+
+    def get_duplicate_count(self): return self.duplicate_count
+
+    def get_rejected_lines(self): return self.rejected_lines
+
+
+def import_into_group(group_name, file_path, sp=None, max_workers=Run_operations.DEFAULT_MAX_WORKERS):
+    """
+    Adds every playlist and artist of an import file (see the description of import files above) to the group. All of
+    them are written to the playlists_and_artists.txt file at once, in a single transaction.
+
+    Playlists / artists the group already observes and repeated entries of the file are skipped, even if they are
+    given as link in one place and as URI in the other. Entries that are not a playlist / artist URI or link (i.e.
+    tracks) are rejected, the rest of the file is imported anyway.
+
+    The names of the entries that don't have one are looked up on Spotify if ``sp`` is given, otherwise (or if Spotify
+    doesn't know the playlist / artist) the ID is used as name.
+
+    :param group_name: the name of the group the playlists and artists are added to
+    :param file_path: the path of a text or CSV file
+    :param sp: a spotify client used to look up the names, or None to skip the lookup
+    :param max_workers: the maximum number of playlist names that are looked up at the same time
+    :type group_name: str
+    :type file_path: str
+    :type sp: spotipy.Spotify
+    :type max_workers: int
+    :raise ValueError: there is no group with that name or the file can't be decoded, see read_import_file()
+    :raise OSError: the file can't be read
+    :raise spotipy.SpotifyException: a name couldn't be looked up
+    :return: an ImportResult
+    """
+    group = IO_operations.find_group(group_name)
+    if group is None:
+        raise ValueError("There is no group with the name: " + group_name)
+
+    # every URI the group observes and every URI of the file seen so far
+    known_uris = {uri for _, uri in group.get_playlist_tuples() + group.get_artist_tuples()}
+    # URI -> name (None if the entry has no name) of the new playlists / artists, in the order of the file
+    new_playlists = {}
+    new_artists = {}
+    duplicate_count = 0
+    rejected_lines = []
+
+    for line_number, name, uri, text in read_import_file(file_path):
+        # the URI has been normalized to spotify:<kind>:<id>
+        kind = uri.split(":")[1] if uri is not None else None
+        if kind not in (_PLAYLIST, _ARTIST):
+            rejected_lines.append((line_number, text))
+        elif uri in known_uris:
+            duplicate_count += 1
+        else:
+            known_uris.add(uri)
+            (new_playlists if kind == _PLAYLIST else new_artists)[uri] = name
+
+    if sp is not None:
+        _fill_in_names(new_playlists, get_playlist_names(
+            sp, [uri for uri, name in new_playlists.items() if name is None], max_workers))
+        _fill_in_names(new_artists, get_artist_names(sp, [uri for uri, name in new_artists.items() if name is None]))
+
+    playlist_tuples = [(_clean_name(name, uri), uri) for uri, name in new_playlists.items()]
+    artist_tuples = [(_clean_name(name, uri), uri) for uri, name in new_artists.items()]
+
+    # a single write, no matter how many playlists / artists are added
+    with IO_operations.start_config_transaction() as transaction:
+        for playlist_tuple in playlist_tuples:
+            transaction.add_playlist(group_name, playlist_tuple)
+        for artist_tuple in artist_tuples:
+            transaction.add_artist(group_name, artist_tuple)
+
+    return ImportResult(playlist_tuples, artist_tuples, duplicate_count, rejected_lines)
+
+
+def read_import_file(file_path):
+    """
+    Reads the entries of an import file, see the description of import files above. The URIs and links are normalized
+    to URIs (see URI_operations.normalize_reference()), but not checked any further.
+
+    :param file_path: the path of a text or CSV file, a CSV file must end with .csv
+    :type file_path: str
+    :raise UnicodeDecodeError: the file is neither UTF-8 nor Windows-1252
+    :return: a list of tuples (line number, name, URI, text) in the order of the file. The name is None if the entry
+             has none, the URI is None if the entry doesn't hold a valid URI or link. The first line is line 1
+    """
+    read_entries = _read_csv_entries if file_path.lower().endswith(_CSV_FILE_EXTENSION) else _read_text_entries
+
+    # "utf-8-sig" removes the byte order mark of a file saved by Excel as "CSV UTF-8". Excel's default "CSV (Comma
+    # delimited)" and Notepad on older versions of Windows save the file in the Windows code page instead
+    for encoding in _ENCODINGS:
+        try:
+            with open(file_path, "r", encoding=encoding, newline="") as import_file:
+                return read_entries(import_file)
+        except UnicodeDecodeError:
+            if encoding == _ENCODINGS[-1]:
+                raise
+
+
+def _read_text_entries(import_file):
+    """
+    Reads the entries of a text file, see read_import_file()
+    """
+    entries = []
+    for line_number, line in enumerate(import_file, start=1):
+        text = line.strip()
+        if not text or text.startswith(_COMMENT_PREFIX):
+            continue
+
+        match = _ENTRY_PATTERN.fullmatch(text)
+        if match is None:
+            entries.append((line_number, None, None, text))
+        else:
+            entries.append((line_number, match.group("name") or None,
+                            "spotify:" + match.group("kind") + ":" + match.group("id"), text))
+
+    return entries
+
+
+def _read_csv_entries(import_file):
+    """
+    Reads the entries of a CSV file, see read_import_file()
+    """
+    entries = []
+    reader = csv.reader(import_file)
+    # a quoted cell may span several lines, a row starts at the line after the last line of the previous row
+    line_number = 1
+    for row_number, row in enumerate(reader):
+        row_line_number, line_number = line_number, reader.line_num + 1
+        if not any(cell.strip() for cell in row):
+            continue
+
+        uris = URI_operations.normalize_references(row)
+        uri_position = next((position for position, uri in enumerate(uris) if uri is not None), None)
+        if uri_position is None:
+            # the header row is skipped
+            if row_number != 0:
+                entries.append((row_line_number, None, None, ",".join(row)))
+            continue
+
+        name = next((cell.strip() for position, cell in enumerate(row)
+                     if position != uri_position and cell.strip()), None)
+        entries.append((row_line_number, name, uris[uri_position], ",".join(row)))
+
+    return entries
+
+
+def get_playlist_names(sp, uris, max_workers=Run_operations.DEFAULT_MAX_WORKERS):
+    """
+    Looks up the names of playlists on Spotify. Spotify has no request that returns several playlists, so every
+    playlist is a request of its own (only asking for the name), up to ``max_workers`` of them are sent at the same
+    time (see Run_operations.fetch_sources()).
+
+    :param sp: a spotify client
+    :param uris: the URIs of the playlists
+    :param max_workers: the maximum number of playlists that are looked up at the same time
+    :type sp: spotipy.Spotify
+    :type uris: list[str]
+    :type max_workers: int
+    :return: a list, the n-th element being the name of the n-th playlist or None if Spotify doesn't know it
+    """
+    def fetch_name(playlist_tuple):
+        try:
+            return sp.playlist(playlist_id=URI_operations.get_playlist_id_from_uri(playlist_tuple[1]),
+                               fields=Request_operations.PLAYLIST_FIELDS["name"])["name"]
+        except spotipy.SpotifyException as error:
+            # a playlist that has been deleted or is private keeps its ID as name
+            if error.http_status in (400, 403, 404):
+                return None
+            raise
+
+    return Run_operations.fetch_sources([(None, uri) for uri in uris], fetch_name, max_workers)
+
+
+def get_artist_names(sp, uris):
+    """
+    Looks up the names of artists on Spotify, with one request per MAX_ARTISTS_PER_REQUEST artists
+
+    :param sp: a spotify client
+    :param uris: the URIs of the artists
+    :type sp: spotipy.Spotify
+    :type uris: list[str]
+    :return: a list, the n-th element being the name of the n-th artist or None if Spotify doesn't know it
+    """
+    names = []
+    for start in range(0, len(uris), MAX_ARTISTS_PER_REQUEST):
+        artists = sp.artists([URI_operations.get_artist_id_from_uri(uri)
+                              for uri in uris[start:start + MAX_ARTISTS_PER_REQUEST]])["artists"]
+        # Spotify returns null for an ID it doesn't know
+        names += [artist["name"] if artist is not None else None for artist in artists]
+
+    return names
+
+
+def _fill_in_names(names_by_uri, looked_up_names):
+    """
+    Sets the looked up names of the entries that have no name, in the order of names_by_uri
+    """
+    missing_uris = [uri for uri, name in names_by_uri.items() if name is None]
+    for uri, name in zip(missing_uris, looked_up_names):
+        names_by_uri[uri] = name
+
+
+def _clean_name(name, uri):
+    """
+    Returns the name as it can be written to the playlists_and_artists.txt file: a single line without surrounding
+    whitespace. The ID is used if there is no name.
+    """
+    name = " ".join(name.split()) if name is not None else ""
+    return name if name else uri.rpartition(":")[2]
@@ -0,0 +1,134 @@
+import sys
+import threading
+import types
+
+
+class InternTable(object):
+    """
+    An intern table gives every song a compact integer ID and keeps a single record of it, shared by every playlist,
+    album and run that contains the song. Artist names are stored once as well, every song refers to the same string
+    objects.
+
+    A song record is a dictionary with the fields:
+        - "id" : int
+        - "uri" : str
+        - "name" : str
+        - "artists" : tuple(str)
+
+    Records are shared, so they are read-only mappings (types.MappingProxyType): changing the record of one playlist
+    would change the song in every playlist and run. ``dict(record)`` returns a copy that can be changed or saved as
+    json. Records can be compared by their ID (see Diff_operations.get_id()), which is an integer comparison instead of
+    a string comparison.
+
+    Nothing is removed from the table, it grows with the number of distinct songs and artists that have been fetched
+    from Spotify, not with the number of runs. Songs that are only read from content files (the old snapshots a
+    playlist is compared to) are not interned.
+
+    The table is thread safe.
+    """
+
+    def __init__(self):
+        """
+        Creates an empty InternTable object
+        """
+        self.lock = threading.Lock()
+
+        # song ID -> URI / record, the ID is the position in the lists
+        self.song_uris = []
+        self.song_records = []
+        # URI -> song ID
+        self.song_ids = {}
+
+        # artist name -> artist ID, the ID is the position in artist_names
+        self.artist_ids = {}
+        self.artist_names = []
+
+    def get_song_id(self, uri):
+        """
+        Returns the ID of the song, a song that isn't part of the table yet gets a new ID
+
+        :param uri: the spotify URI of the song
+        :type uri: str
+        :return: the song's ID
+        """
+        with self.lock:
+            return self._get_song_id(uri)
+
+    def get_song_uri(self, song_id):
+        """
+        Returns the URI of the song with the ID
+
+        :param song_id: a song ID, as returned by get_song_id() or intern_song()
+        :type song_id: int
+        :return: the spotify URI of the song
+        """
+        return self.song_uris[song_id]
+
+    def get_artist_id(self, name):
+        """
+        Returns the ID of the artist, an artist that isn't part of the table yet gets a new ID
+
+        :param name: the artist's name
+        :type name: str
+        :return: the artist's ID
+        """
+        with self.lock:
+            return self._get_artist_id(name)
+
+    def intern_song(self, uri, name, artist_names):
+        """
+        Returns the shared record of the song. A new record is only created if the song isn't part of the table yet or
+        its name or artists have changed.
+
+        :param uri: the spotify URI of the song
+        :param name: the name of the song
+        :param artist_names: the names of the song's artists
+        :type uri: str
+        :type name: str
+        :type artist_names: typing.Iterable[str]
+        :return: the song record, a read-only mapping, see the class description
+        """
+        with self.lock:
+            song_id = self._get_song_id(uri)
+            artists = tuple(self.artist_names[self._get_artist_id(artist_name)] for artist_name in artist_names)
+
+            record = self.song_records[song_id]
+            if record is None or record["name"] != name or record["artists"] != artists:
+                record = types.MappingProxyType(
+                    {"id": song_id, "uri": self.song_uris[song_id], "name": sys.intern(name), "artists": artists})
+                self.song_records[song_id] = record
+
+            return record
+
+    def _get_song_id(self, uri):
+        song_id = self.song_ids.get(uri)
+        if song_id is None:
+            song_id = len(self.song_uris)
+            # interned URIs are compared by identity first, so looking them up in other dictionaries is cheap as well
+            uri = sys.intern(uri)
+            self.song_ids[uri] = song_id
+            self.song_uris.append(uri)
+            self.song_records.append(None)
+
+        return song_id
+
+    def _get_artist_id(self, name):
+        artist_id = self.artist_ids.get(name)
+        if artist_id is None:
+            artist_id = len(self.artist_names)
+            name = sys.intern(name)
+            self.artist_ids[name] = artist_id
+            self.artist_names.append(name)
+
+        return artist_id
+
+
+# the intern table is shared by every module, see get_intern_table()
+_intern_table = InternTable()
+
+
+def get_intern_table():
+    """
+    Get the process wide intern table
+    """
+    return _intern_table
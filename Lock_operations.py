@@ -0,0 +1,130 @@
+import os
+import time
+
+# fcntl is only available on Unix, msvcrt is used on Windows instead
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# the lock file of a file / directory, see get_lock_path() and get_directory_lock_path()
+LOCK_FILE_EXTENSION = ".lock"
+LOCK_FILE_NAME = ".lock"
+
+# the time between two attempts to lock a file on Windows, msvcrt can't wait for a lock
+_WINDOWS_RETRY_INTERVAL = 0.05
+
+
+class FileLock(object):
+    """
+    A file lock is an advisory lock on a lock file, it keeps several processes (i.e. a scheduled
+    spofityPlaylistChecker.py and the GUI) and threads from changing the same data at the same time. Every file or
+    directory that is changed has its own lock file (see get_lock_path() and get_directory_lock_path()), so processes
+    only wait for each other if they change the same data.
+
+    The lock is taken with fcntl.flock() on Unix and msvcrt.locking() on Windows. It isn't reentrant: a thread that
+    holds the lock of a file must not lock it again.
+
+    A file lock can be used as context manager:
+
+        with FileLock(get_lock_path(file_path)):
+            ...
+    """
+
+    def __init__(self, lock_file_path):
+        """
+        Creates a FileLock object, the lock is not taken yet
+
+        :param lock_file_path: the path of the lock file, it is created if it doesn't exist
+        :type lock_file_path: str
+        """
+        self.lock_file_path = lock_file_path
+        self.file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    def get_lock_file_path(self): return self.lock_file_path
+
+    def is_locked(self): return self.file is not None
+
+    def acquire(self, blocking=True):
+        """
+        Takes the lock
+
+        :param blocking: flag to wait until the lock is released by whoever holds it
+        :type blocking: bool
+        :return: True if the lock has been taken, False if it is held by someone else and blocking is False
+        """
+        # the lock file is never removed, so every process locks the same file
+        file = open(self.lock_file_path, "a+")
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    file.close()
+                    return False
+            else:
+                # msvcrt locks bytes of the file, the first byte is locked no matter how long the file is
+                file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        if not blocking:
+                            file.close()
+                            return False
+                        time.sleep(_WINDOWS_RETRY_INTERVAL)
+        except BaseException:
+            file.close()
+            raise
+
+        self.file = file
+        return True
+
+    def release(self):
+        """
+        Releases the lock, nothing happens if it isn't held
+        """
+        file, self.file = self.file, None
+        if file is None:
+            return
+
+        try:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            file.close()
+
+
+def get_lock_path(file_path):
+    """
+    Returns the path of the lock file of a file, it is next to the file, i.e. playlists_and_artists.txt.lock
+
+    :param file_path: the path of a file
+    :type file_path: str
+    :return: the path of the lock file
+    """
+    return file_path + LOCK_FILE_EXTENSION
+
+
+def get_directory_lock_path(directory):
+    """
+    Returns the path of the lock file of a directory, it is inside of the directory, i.e.
+    content_files/<content file directory>/.lock
+
+    :param directory: the path of a directory
+    :type directory: str
+    :return: the path of the lock file
+    """
+    return os.path.join(directory, LOCK_FILE_NAME)
@@ -1,10 +1,16 @@
-import json
 import math
 from datetime import date
 
 import spotipy
 
+from Diff_operations import diff_snapshots, find_duplicates, get_track_key
 from IO_operations import find_latest_content_file, save_uri_content_to_hard_drive
+from IO_operations import get_item_uris_from_cont_file, get_snapshot_id_from_cont_file
+from IO_operations import save_uri_content_in_background, save_uri_content_to_hard_drive_async
+from Intern_operations import get_intern_table
+from Request_operations import PLAYLIST_FIELDS, PLAYLIST_ITEM_FIELDS, get_page_fields
+from Request_operations import iterate_pages, iterate_pages_async
+from Snapshot_operations import read_content_file
 from URI_operations import *
 
 
@@ -65,77 +71,51 @@ def print_playlist_changes(sp, p_uri):
     #   "previous": null
     #   "total" : 50
 
-    # playlist_items yields a dictionary or JSON file
-    results_dict = sp.playlist_items(playlist_id=get_playlist_id_from_uri(p_uri))
-
-    # get the playlists tracks
-    latest_tracks = results_dict["items"]
-
     # read old playlist content from file
     latest_content_file = find_latest_content_file(p_uri)
     print(latest_content_file)
 
-    # if a content file exists for the uri:
-    if latest_content_file:
-        with open(latest_content_file, "r") as oldTrackFile:
-            old_results = json.load(oldTrackFile)
-            old_tracks = old_results["items"]
-
-        # both are a list of dictionaries each containing the song's name and its artists names
-        new_songs = []
-        removed_songs = []
-
-        # print("comparing tracks")
-
-        # check the playlist for new songs
-        for new_track in latest_tracks:
-            flag_is_new_song = True
-            for old_track in old_tracks:
-                # if the current track matches with a track in the old list, then it's not a new song
-                if new_track["track"]["uri"] == old_track["track"]["uri"] and new_track["track"]["uri"] is not None:
-                    flag_is_new_song = False
-                    break
-
-            if flag_is_new_song:
-                song_info = {"name": new_track["track"]["name"],
-                             "artists": new_track["track"]["artists"]}
-                new_songs.append(song_info)
-
-        # check the playlist for removed songs
-        for old_track in old_tracks:
-            flag_was_removed = True
-            for new_track in latest_tracks:
-                if old_track["track"]["name"] == new_track["track"]["name"]:
-                    flag_was_removed = False
-                    break
-
-            if flag_was_removed:
-                song_info = {"name": old_track["track"]["name"],
-                             "artists": old_track["track"]["artists"]}
-                removed_songs.append(song_info)
-
+    # if the playlist hasn't changed since the content file was saved, there are no changes to print
+    if latest_content_file and _is_unchanged_since(sp, p_uri, latest_content_file):
         print("-------------------------- New Songs: --------------------------")
-        for song in new_songs:
-            artists = ""
-            n_of_artists = len(song["artists"])
+        print("------------------------ Removed Songs: ------------------------")
 
-            for i in range(0, n_of_artists - 1):
-                artists += song["artists"][i]["name"] + ", "
-            artists += song["artists"][n_of_artists - 1]["name"]
+    # if a content file exists for the uri:
+    elif latest_content_file:
+        # get the uri, name and artist(s) of every song currently in the playlist, page by page
+        latest_tracks = get_all_songs_from_playlist(sp, p_uri)
 
-            print(song["name"] + " - " + artists)
+        # the old songs are only printed, they are not put into the intern table. A song that has been removed from
+        # the playlist would otherwise be kept in memory until the program ends
+        old_results = read_content_file(latest_content_file)
+        old_tracks = [{"uri": item["track"]["uri"], "name": item["track"]["name"],
+                       "artists": [artist["name"] for artist in item["track"]["artists"]]}
+                      for item in old_results["items"] if item["track"] is not None]
 
-        print("------------------------ Removed Songs: ------------------------")
-        for song in removed_songs:
+        # compare both snapshots by the songs' IDs in 128 bit, a renamed song or two songs with the same name are told
+        # apart
+        playlist_diff = diff_snapshots(old_tracks, latest_tracks, key=get_track_key)
 
-            artists = ""
-            n_of_artists = len(song["artists"])
-
-            for i in range(0, n_of_artists - 1):
-                artists += song["artists"][i]["name"] + ", "
-            artists += song["artists"][n_of_artists - 1]["name"]
+        print("-------------------------- New Songs: --------------------------")
+        for _, song in playlist_diff.get_added():
+            print(song["name"] + " - " + ", ".join(song["artists"]))
 
-            print(song["name"] + " - " + artists)
+        print("------------------------ Removed Songs: ------------------------")
+        for _, song in playlist_diff.get_removed():
+            print(song["name"] + " - " + ", ".join(song["artists"]))
+
+        # the moved and duplicate songs are only shown if there are any
+        if playlist_diff.get_moved():
+            print("------------------------- Moved Songs: -------------------------")
+            for old_position, new_position, song in playlist_diff.get_moved():
+                print(song["name"] + " - " + ", ".join(song["artists"]) +
+                      "  (#" + str(old_position + 1) + " -> #" + str(new_position + 1) + ")")
+
+        if playlist_diff.get_duplicates():
+            print("----------------------- Duplicate Songs: -----------------------")
+            for song, positions in playlist_diff.get_duplicates():
+                print(song["name"] + " - " + ", ".join(song["artists"]) +
+                      "  (" + ", ".join("#" + str(position + 1) for position in positions) + ")")
     else:
         print("------------------- No data for playlist yet -------------------")
 
@@ -147,7 +127,10 @@ def get_all_songs_from_playlist(sp, p_uri):
     Dictionary fields:
         - "uri" : str
         - "name" : str
-        - "artists" : list(str)
+        - "artists" : tuple(str)
+
+    The dictionaries are the shared, read-only song records of the intern table (see get_song_data_from_track()).
+    ``dict(song)`` returns a copy that can be changed or saved as json.
 
     **If no content file is found for the playlist, a new content file is created.**
 
@@ -204,24 +187,52 @@ def get_all_songs_from_playlist(sp, p_uri):
     #   "offset": 0
     #   "previous": null
     #   "total" : 50
-    # playlist_items yields a dictionary or JSON file
-    results_dict = sp.playlist_items(playlist_id=get_playlist_id_from_uri(p_uri))
-
-    # get the playlists tracks
-    latest_tracks = results_dict["items"]
 
     # data is a list of dictionaries, each representing a song.
-    data = []
-    for n, track in enumerate(latest_tracks):
-        data.insert(n, {"uri": latest_tracks[n]["track"]["uri"],
-                        "name": latest_tracks[n]["track"]["name"],
-                        "artists": [art["name"] for art in latest_tracks[n]["track"]["artists"]]
-                        })
+    # local files and unavailable episodes have no track object and are skipped
+    data = [get_song_data_from_track(item["track"])
+            for item in iterate_playlist_items(sp, p_uri, item_fields=PLAYLIST_ITEM_FIELDS["display"])
+            if item["track"] is not None]
 
     return data
 
 
-def get_new_songs_in_playlist(sp, p_uri, since_date=None, as_dict=False):
+def iterate_playlist_items(sp, p_uri, item_fields=None):
+    """
+    Yields every item of the playlist, one after another. The playlist is fetched page by page while the items are
+    consumed, so playlists with more than 100 items are read completely without holding every page in memory.
+
+    See get_all_songs_from_playlist() for a more detailed documentation of an item (json file)
+
+    :param p_uri: the spotify uri of the playlist
+    :param sp: the Spotify API client
+    :param item_fields: the fields of an item Spotify sends, i.e. Request_operations.PLAYLIST_ITEM_FIELDS["diff"].
+                        Every field is sent if None
+    :type p_uri: str
+    :type sp: spotipy.Spotify
+    :type item_fields: str
+    :return: a generator yielding the playlist's items (dictionaries with the fields "added_at", "track", ...)
+    """
+    # playlist_items yields the first page as a dictionary or JSON file
+    first_page = sp.playlist_items(playlist_id=get_playlist_id_from_uri(p_uri),
+                                   fields=get_page_fields(item_fields) if item_fields else None)
+    return iterate_pages(sp, first_page)
+
+
+def get_song_data_from_track(track):
+    """
+    Reduces a track object, as returned by the Spotify API, to the song's uri, name and artist(s). The song data is
+    taken from the intern table (see Intern_operations), a song that is part of several playlists or runs is only
+    stored once. The returned record is shared, thus it is a read-only mapping.
+
+    :param track: the track object of a playlist item
+    :type track: dict
+    :return: a read-only mapping with the fields "id", "uri", "name" and "artists" (a tuple of str)
+    """
+    return get_intern_table().intern_song(track["uri"], track["name"], (art["name"] for art in track["artists"]))
+
+
+def get_new_songs_in_playlist(sp, p_uri, since_date=None, as_dict=False, save_content=False):
     """
     Songs that have newly been added to this playlist will be returned as a list of song URIs. Alternatively a list of
     dictionaries can be returned using the ``as_dict`` flag, which are holding each songs uri, name and artist(s)
@@ -229,7 +240,10 @@ def get_new_songs_in_playlist(sp, p_uri, since_date=None, as_dict=False):
     Dictionary fields:
         - "uri" : str
         - "name" : str
-        - "artists" : list(str)
+        - "artists" : tuple(str)
+
+    The dictionaries are the shared, read-only song records of the intern table (see get_song_data_from_track()).
+    ``dict(song)`` returns a copy that can be changed or saved as json.
 
     **If no content file is found for the playlist, a new content file is created.**
 
@@ -237,10 +251,13 @@ def get_new_songs_in_playlist(sp, p_uri, since_date=None, as_dict=False):
     :param sp: the Spotify API client
     :param since_date: a date
     :param as_dict: flag to return a dictionary with more information about a song
+    :param save_content: flag to save the playlist's current content as well. The songs that have been fetched to find
+                         the new songs are saved in the background, see IO_operations.save_uri_content_in_background()
     :type p_uri: str
     :type sp: spotipy.Spotify
     :type since_date: date
     :type as_dict: bool
+    :type save_content: bool
     :return: an empty list when no content file is found, a list of uris or a list of dictionaries
     """
     # search for a content file
@@ -250,13 +267,24 @@ def get_new_songs_in_playlist(sp, p_uri, since_date=None, as_dict=False):
         latest_content_file = find_latest_content_file(p_uri, since_date)
 
     # if a content file exists for the uri:
-    if latest_content_file:
+    if latest_content_file and save_content:
+        # the snapshot ID is requested before the items, see IO_operations.save_uri_content_to_hard_drive()
+        snapshot_id = get_playlist_snapshot_id(sp, p_uri)
+        # skip the download if the playlist hasn't changed since the content file was saved
+        if snapshot_id == get_snapshot_id_from_cont_file(latest_content_file):
+            return []
+
+        # the items are fetched with every field of a snapshot, so they can be saved without requesting them again
+        items = list(iterate_playlist_items(sp, p_uri, item_fields=PLAYLIST_ITEM_FIELDS["snapshot"]))
+        save_uri_content_in_background(p_uri, items, snapshot_id)
 
-        # read old playlist data from file
-        with open(latest_content_file, "r") as old_track_file:
-            old_results = json.load(old_track_file)
-            old_tracks_uris = [song_data["track"]["uri"]
-                               for song_data in old_results["items"] if song_data["track"] is not None]
+        song_data = [get_song_data_from_track(item["track"]) for item in items if item["track"] is not None]
+        return _select_new_songs(song_data, latest_content_file, as_dict)
+
+    elif latest_content_file:
+        # skip the download if the playlist hasn't changed since the content file was saved
+        if _is_unchanged_since(sp, p_uri, latest_content_file):
+            return []
 
         # get the uri, name and artist(s) of every song currently in the playlist
         # entries of song data: {"uri" : <song_uri>,
@@ -264,24 +292,151 @@ def get_new_songs_in_playlist(sp, p_uri, since_date=None, as_dict=False):
         #                        "artists: <song_artist(s)>}
         song_data = get_all_songs_from_playlist(sp, p_uri)
 
-        # check the playlist for new songs by checking whether their uri was already in the old content_file
-        new_songs = [data for data in song_data if not old_tracks_uris.__contains__(data["uri"])]
+        return _select_new_songs(song_data, latest_content_file, as_dict)
 
-        # remove duplicate entries using list comprehension
-        no_duplicates = [s for n, s in enumerate(new_songs) if s not in new_songs[:n]]
+    else:
+        # if there are no records of the playlist yet, create the first record
+        save_uri_content_to_hard_drive(sp, p_uri)
+        return []
 
-        if as_dict:
-            return no_duplicates
-        else:
-            # only return the uris of the new songs
-            return [elem["uri"] for elem in no_duplicates]
+
+async def get_all_songs_from_playlist_async(asp, p_uri):
+    """
+    Async variant of get_all_songs_from_playlist(). Returns a list of dictionaries holding each songs uri, name and
+    artist(s)
+
+    Dictionary fields:
+        - "uri" : str
+        - "name" : str
+        - "artists" : tuple(str)
+
+    :param p_uri: the spotify uri of the playlist
+    :param asp: the asyncio based Spotify API client
+    :type p_uri: str
+    :type asp: Async_operations.AsyncSpotify
+    :return: a list of dictionaries each representing a song in the playlist
+    """
+    first_page = await asp.playlist_items(playlist_id=get_playlist_id_from_uri(p_uri),
+                                          fields=get_page_fields(PLAYLIST_ITEM_FIELDS["display"]))
+    return [get_song_data_from_track(item["track"])
+            async for item in iterate_pages_async(asp, first_page) if item["track"] is not None]
+
+
+async def get_new_songs_in_playlist_async(asp, p_uri, since_date=None, as_dict=False, save_content=False):
+    """
+    Async variant of get_new_songs_in_playlist(). Songs that have newly been added to this playlist will be returned as
+    a list of song URIs or, using the ``as_dict`` flag, as a list of dictionaries holding each songs uri, name and
+    artist(s)
+
+    **If no content file is found for the playlist, a new content file is created.**
+
+    :param p_uri: the spotify uri of the playlist
+    :param asp: the asyncio based Spotify API client
+    :param since_date: a date
+    :param as_dict: flag to return a dictionary with more information about a song
+    :param save_content: flag to save the playlist's current content as well, see get_new_songs_in_playlist()
+    :type p_uri: str
+    :type asp: Async_operations.AsyncSpotify
+    :type since_date: date
+    :type as_dict: bool
+    :type save_content: bool
+    :return: an empty list when no content file is found, a list of uris or a list of dictionaries
+    """
+    latest_content_file = find_latest_content_file(p_uri, since_date)
+
+    if latest_content_file and save_content:
+        snapshot_id = (await asp.playlist(playlist_id=get_playlist_id_from_uri(p_uri),
+                                          fields=PLAYLIST_FIELDS["snapshot_id"]))["snapshot_id"]
+        if snapshot_id == get_snapshot_id_from_cont_file(latest_content_file):
+            return []
+
+        first_page = await asp.playlist_items(playlist_id=get_playlist_id_from_uri(p_uri),
+                                              fields=get_page_fields(PLAYLIST_ITEM_FIELDS["snapshot"]))
+        items = [item async for item in iterate_pages_async(asp, first_page)]
+        save_uri_content_in_background(p_uri, items, snapshot_id)
+
+        song_data = [get_song_data_from_track(item["track"]) for item in items if item["track"] is not None]
+        return _select_new_songs(song_data, latest_content_file, as_dict)
+
+    elif latest_content_file:
+        # skip the download if the playlist hasn't changed since the content file was saved
+        saved_snapshot_id = get_snapshot_id_from_cont_file(latest_content_file)
+        if saved_snapshot_id is not None and saved_snapshot_id == (await asp.playlist(
+                playlist_id=get_playlist_id_from_uri(p_uri), fields=PLAYLIST_FIELDS["snapshot_id"]))["snapshot_id"]:
+            return []
+
+        song_data = await get_all_songs_from_playlist_async(asp, p_uri)
+        return _select_new_songs(song_data, latest_content_file, as_dict)
 
     else:
         # if there are no records of the playlist yet, create the first record
-        save_uri_content_to_hard_drive(sp, p_uri)
+        await save_uri_content_to_hard_drive_async(asp, p_uri)
         return []
 
 
+def get_playlist_snapshot_id(sp, p_uri):
+    """
+    Returns the playlist's snapshot ID. Spotify changes the snapshot ID every time the playlist is changed. Only the
+    snapshot ID is requested, not the playlist's items, so this is a cheap way to check whether a playlist has changed.
+
+    :param p_uri: the spotify uri of the playlist
+    :param sp: the Spotify API client
+    :type p_uri: str
+    :type sp: spotipy.Spotify
+    :return: the snapshot ID
+    """
+    playlist = sp.playlist(playlist_id=get_playlist_id_from_uri(p_uri), fields=PLAYLIST_FIELDS["snapshot_id"])
+    return playlist["snapshot_id"]
+
+
+def _is_unchanged_since(sp, p_uri, content_file):
+    """
+    Checks whether the playlist has changed since the content file was saved, by comparing the saved snapshot ID with
+    the current one. No request is sent if the content file has no snapshot ID.
+
+    :param p_uri: the spotify uri of the playlist
+    :param sp: the Spotify API client
+    :param content_file: a content file of the playlist
+    :type p_uri: str
+    :type sp: spotipy.Spotify
+    :type content_file: pathlib.Path
+    :return: True if the playlist is known to be unchanged, False otherwise
+    """
+    saved_snapshot_id = get_snapshot_id_from_cont_file(content_file)
+    return saved_snapshot_id is not None and saved_snapshot_id == get_playlist_snapshot_id(sp, p_uri)
+
+
+def _select_new_songs(song_data, content_file, as_dict):
+    """
+    Selects the songs that are not part of the content file
+
+    :param song_data: the songs currently in the playlist, as returned by get_all_songs_from_playlist()
+    :param content_file: the content file the songs are compared to
+    :param as_dict: flag to return a dictionary with more information about a song
+    :type song_data: list[dict]
+    :type content_file: pathlib.Path
+    :type as_dict: bool
+    :return: a list of uris or a list of dictionaries
+    """
+    # the uris of the old playlist data, taken from the snapshot store instead of reading the whole file. The songs are
+    # compared by their IDs in 128 bit (see URI_operations.uris_to_ints()), a set of ints takes a fraction of the memory
+    # of a set of URIs
+    seen_ids = set(uris_to_ints(get_item_uris_from_cont_file(content_file), "track"))
+
+    # the new songs are the songs whose ID wasn't part of the old content_file, each one is only returned once
+    no_duplicates = []
+    for song_id, song in zip(uris_to_ints([song["uri"] for song in song_data], "track"), song_data):
+        if song_id not in seen_ids:
+            seen_ids.add(song_id)
+            no_duplicates.append(song)
+
+    if as_dict:
+        return no_duplicates
+    else:
+        # only return the uris of the new songs
+        return [elem["uri"] for elem in no_duplicates]
+
+
 def create_new_private_playlist(sp, name):
     """
     ! REQUIRES LOGIN TO SPOTIFY !
@@ -405,6 +560,8 @@ def remove_duplicate_songs_from_playlist(sp, playlist_uri):
 
     removes all duplicates of all songs in the playlist; only the OLDEST entry of a song will remain
 
+    The whole playlist is checked, the duplicates are removed with one request per 100 duplicates.
+
     :param sp: the Spotify API client
     :param playlist_uri: the uri of the playlist that the songs will be removed from
     :type sp: spotipy.Spotify
@@ -412,33 +569,32 @@ def remove_duplicate_songs_from_playlist(sp, playlist_uri):
     """
     p_id = get_playlist_id_from_uri(playlist_uri)
 
-    # see get_all_songs_from_playlist() for a more detailed documentation of results_dict (json file)
-    results_dict = sp.playlist_items(p_id)
-    if results_dict:
-        song_uris = [results_dict["items"][i]["track"]["uri"]
-                     for i in range(0, len(results_dict["items"])) if results_dict["items"][i]["track"] is not None]
-    else:
-        song_uris = []
-    items_to_remove = []
-
-    # important: j starts at i+1
-    for i in range(0, len(song_uris)):
-        duplicates_indices = []
-        for j in range(i + 1, len(song_uris)):
-            # if a song occurs multiple times
-            if song_uris[i] == song_uris[j]:
-                duplicates_indices.append(j)
-
-        # there are multiple occurrences of the song
-        if len(duplicates_indices) > 0:
-            # data is the format the spotipy library expects when calling playlist_remove_specific_occurrences_of_items
-            data = {"uri": get_song_id_from_uri(song_uris[i]),
-                    "positions": duplicates_indices}
-            items_to_remove.append(data)
+    # the snapshot ID is received together with the first page, so the positions of the songs belong to this snapshot
+    playlist = sp.playlist(playlist_id=p_id, fields=PLAYLIST_FIELDS["snapshot_id_and_items"])
+
+    # see get_all_songs_from_playlist() for a more detailed documentation of an item (json file)
+    # positions count every item, so an item without a track (None) still takes up a position
+    song_uris = [item["track"]["uri"] if item["track"] is not None else None
+                 for item in iterate_pages(sp, playlist["tracks"])]
 
-    # for performance reasons, do not send a request if there are no songs to be removed
-    if len(items_to_remove) > 0:
-        sp.playlist_remove_specific_occurrences_of_items(p_id, items_to_remove)
+    # every occurrence of a song except the first one, as tuples (uri, position)
+    occurrences_to_remove = [(uri, position)
+                             for uri, positions in find_duplicates(song_uris) if uri is not None
+                             for position in positions]
+
+    # Spotify accepts at most 100 occurrences per request. Every request is made against the same snapshot, which
+    # makes Spotify apply the positions to this snapshot even though the previous requests already changed the playlist
+    for segment in _split_into_segments(occurrences_to_remove):
+        # for performance reasons, do not send a request if there are no songs to be removed
+        if segment:
+            positions_by_uri = {}
+            for uri, position in segment:
+                positions_by_uri.setdefault(uri, []).append(position)
+
+            # data is the format the spotipy library expects when calling playlist_remove_specific_occurrences_of_items
+            items_to_remove = [{"uri": uri, "positions": positions} for uri, positions in positions_by_uri.items()]
+            sp.playlist_remove_specific_occurrences_of_items(p_id, items_to_remove,
+                                                             snapshot_id=playlist["snapshot_id"])
 
 
 def _split_into_segments(input_list):
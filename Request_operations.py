@@ -0,0 +1,479 @@
+import asyncio
+import functools
+import random
+import threading
+import time
+
+import spotipy
+
+# priorities of a request, requests with a lower value are sent first
+WRITE = 0
+READ = 1
+
+# methods of spotipy.Spotify that change a playlist. They are only a few requests, but the user waits for them, so they
+# are sent before any bulk read that is waiting for the rate limit
+_WRITE_METHODS = {"playlist_add_items", "playlist_remove_all_occurrences_of_items",
+                  "playlist_remove_specific_occurrences_of_items", "playlist_replace_items", "playlist_reorder_items",
+                  "user_playlist_create", "playlist_change_details"}
+
+# status codes that are retried after a (jittered) backoff. 599 is raised by spotipy when its own retries failed
+_RETRY_STATUS_CODES = {429, 500, 502, 503, 504, 599}
+
+# spotipy.Spotify must not retry on its own (see create_scheduled_spotify()): urllib3 retries every 429 response that
+# has a "Retry-After" header while any retry is left, no matter the status_forcelist. The thread would sleep on its own
+# instead of pausing every thread, and the error raised at last doesn't hold the header anymore. The status_forcelist
+# can't be left empty, spotipy would use its default list including 429. With no retries left, the listed server
+# errors are raised as 599 and retried by the scheduler
+_SPOTIPY_RETRIES = 0
+_SPOTIPY_STATUS_FORCELIST = [500, 502, 503, 504]
+
+
+class RequestScheduler(object):
+    """
+    Every request to Spotify goes through a request scheduler. It makes sure that Spotify's rate limit is not exceeded
+    even when many requests are sent at the same time (see Run_operations.fetch_sources()):
+
+        1. A token bucket limits the number of requests per second. The rate is raised slowly while every request
+           succeeds and halved whenever Spotify answers with 429 (too many requests), so it stays close to the quota.
+        2. When Spotify answers with 429, no request is sent until the time given in the "Retry-After" header has
+           passed, then the request is retried.
+        3. Server errors are retried after a jittered exponential backoff.
+        4. Writes (i.e. adding songs to a playlist) are sent before any waiting read.
+
+    The scheduler is thread safe and can be used by coroutines (see call_async()) at the same time.
+    """
+
+    def __init__(self, rate=10.0, burst=20, min_rate=1.0, max_rate=50.0, max_retries=5, base_backoff=0.5,
+                 max_backoff=30.0):
+        """
+        Creates a RequestScheduler object
+
+        :param rate: the number of requests per second at the start
+        :type rate: float
+        :param burst: the maximum number of requests that can be sent at once after a quiet period
+        :type burst: int
+        :param min_rate: the rate is never lowered below this number of requests per second
+        :type min_rate: float
+        :param max_rate: the rate is never raised above this number of requests per second
+        :type max_rate: float
+        :param max_retries: the number of times a request is retried before the error is raised
+        :type max_retries: int
+        :param base_backoff: the backoff of the first retry in seconds, it doubles with every retry
+        :type base_backoff: float
+        :param max_backoff: the maximum backoff in seconds
+        :type max_backoff: float
+        """
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self._condition = threading.Condition()
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._waiting_writes = 0
+
+    def call(self, function, *args, priority=READ, **kwargs):
+        """
+        Calls the function as soon as the rate limit allows it and retries it if Spotify answers with 429 or a server
+        error.
+
+        :param function: a method of the Spotify API client, i.e. sp.playlist_items
+        :param priority: READ or WRITE
+        :type function: typing.Callable
+        :type priority: int
+        :raise spotipy.SpotifyException: the request failed and can't be retried (anymore)
+        :return: the return value of the function
+        """
+        for attempt in range(self.max_retries + 1):
+            self._acquire(priority)
+            try:
+                result = function(*args, **kwargs)
+            except spotipy.SpotifyException as error:
+                backoff = self._on_error(error, attempt)
+                if backoff is None:
+                    raise
+                time.sleep(backoff)
+            else:
+                self._on_success()
+                return result
+
+    async def call_async(self, coroutine_function, *args, priority=READ, **kwargs):
+        """
+        Async variant of call(). Awaits the coroutine function as soon as the rate limit allows it and retries it if
+        Spotify answers with 429 or a server error. Waiting never blocks the event loop.
+
+        :param coroutine_function: a method of the asyncio based Spotify API client
+        :param priority: READ or WRITE
+        :type coroutine_function: typing.Callable
+        :type priority: int
+        :raise spotipy.SpotifyException: the request failed and can't be retried (anymore)
+        :return: the return value of the coroutine function
+        """
+        for attempt in range(self.max_retries + 1):
+            await self._acquire_async(priority)
+            try:
+                result = await coroutine_function(*args, **kwargs)
+            except spotipy.SpotifyException as error:
+                backoff = self._on_error(error, attempt)
+                if backoff is None:
+                    raise
+                await asyncio.sleep(backoff)
+            else:
+                self._on_success()
+                return result
+
+    def _acquire(self, priority):
+        """
+        Blocks until a request with the given priority may be sent
+        """
+        with self._condition:
+            if priority == WRITE:
+                self._waiting_writes += 1
+            try:
+                wait = self._try_acquire(priority)
+                while wait > 0:
+                    self._condition.wait(wait)
+                    wait = self._try_acquire(priority)
+            finally:
+                if priority == WRITE:
+                    self._waiting_writes -= 1
+                    self._condition.notify_all()
+
+    async def _acquire_async(self, priority):
+        """
+        Waits until a request with the given priority may be sent, without blocking the event loop
+        """
+        with self._condition:
+            if priority == WRITE:
+                self._waiting_writes += 1
+        try:
+            while True:
+                with self._condition:
+                    wait = self._try_acquire(priority)
+                if wait <= 0:
+                    return
+                await asyncio.sleep(wait)
+        finally:
+            if priority == WRITE:
+                with self._condition:
+                    self._waiting_writes -= 1
+                    self._condition.notify_all()
+
+    def _try_acquire(self, priority):
+        """
+        Takes a token from the bucket if possible. Must be called while holding self._condition.
+
+        :return: 0 if a token was taken, otherwise the number of seconds to wait before trying again
+        """
+        now = time.monotonic()
+
+        # refill the bucket with the tokens that accumulated since the last refill
+        self._tokens = min(float(self.burst), self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+        if now < self._paused_until:
+            return self._paused_until - now
+
+        # reads wait until every waiting write has been sent
+        if priority == READ and self._waiting_writes > 0:
+            return 1 / self.rate
+
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+
+        return (1 - self._tokens) / self.rate
+
+    def _on_success(self):
+        """
+        Raises the rate slowly (additive increase)
+        """
+        with self._condition:
+            self.rate = min(self.max_rate, self.rate + 0.1)
+
+    def _on_error(self, error, attempt):
+        """
+        Decides whether a failed request is retried and how long to wait before retrying it
+
+        :type error: spotipy.SpotifyException
+        :param attempt: the number of retries so far
+        :type attempt: int
+        :return: the number of seconds to wait before the retry or None if the request must not be retried
+        """
+        if error.http_status not in _RETRY_STATUS_CODES or attempt >= self.max_retries:
+            return None
+
+        # full jitter: a random time between 0 and the exponential backoff, so the retries of requests that failed at
+        # the same time are spread out
+        backoff = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+
+        if error.http_status == 429:
+            retry_after = _get_retry_after(error)
+            with self._condition:
+                # multiplicative decrease of the rate and a pause for every request, not only this one
+                self.rate = max(self.min_rate, self.rate / 2)
+                if retry_after is not None:
+                    self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                    self._tokens = 0.0
+
+                    # the pause itself is waited for when acquiring the next token, only a little jitter is added
+                    backoff = random.uniform(0, self.base_backoff)
+
+        return backoff
+
+
+class ScheduledSpotify(object):
+    """
+    Wraps a Spotify API client, every method call is sent through the request scheduler. A ScheduledSpotify object can
+    be passed as ``sp`` to every method that takes a spotipy.Spotify object.
+
+    The spotipy.Spotify object must not retry requests on its own, otherwise it retries 429 responses without
+    coordinating with the other threads. Use create_scheduled_spotify() to create both.
+    """
+
+    def __init__(self, sp, scheduler=None):
+        """
+        Creates a ScheduledSpotify object
+
+        :param sp: the Spotify API client
+        :type sp: spotipy.Spotify
+        :param scheduler: the scheduler the requests are sent through, the process wide scheduler if None
+        :type scheduler: RequestScheduler
+        """
+        self.sp = sp
+        self.scheduler = scheduler if scheduler is not None else get_scheduler()
+
+    def __getattr__(self, name):
+        # only called for attributes that are not defined in __init__
+        attribute = getattr(self.sp, name)
+        if not callable(attribute):
+            return attribute
+
+        priority = WRITE if name in _WRITE_METHODS else READ
+
+        def scheduled_call(*args, **kwargs):
+            return self.scheduler.call(attribute, *args, priority=priority, **kwargs)
+
+        return scheduled_call
+
+
+def create_scheduled_spotify(auth_manager):
+    """
+    Creates a Spotify API client that sends every request through the process wide scheduler. Retries are left to the
+    scheduler, spotipy sends every request only once.
+
+    :param auth_manager: the authorization of the client, i.e. a spotipy.oauth2.SpotifyOAuth object
+    :type auth_manager: spotipy.oauth2.SpotifyAuthBase
+    :return: a ScheduledSpotify
+    """
+    return ScheduledSpotify(spotipy.Spotify(auth_manager=auth_manager, retries=_SPOTIPY_RETRIES,
+                                            status_retries=_SPOTIPY_RETRIES,
+                                            status_forcelist=_SPOTIPY_STATUS_FORCELIST))
+
+
+# every request of this process is sent through this scheduler, so the rate limit is shared by every thread
+_scheduler = RequestScheduler()
+
+
+def get_scheduler():
+    """
+    Get the process wide request scheduler
+    """
+    return _scheduler
+
+
+def _get_retry_after(error):
+    """
+    Reads the "Retry-After" header of a 429 response
+
+    :type error: spotipy.SpotifyException
+    :return: the number of seconds to wait or None if the header is missing
+    """
+    # the headers are a dictionary or a case insensitive dictionary, depending on the client that raised the error
+    headers = getattr(error, "headers", None) or {}
+    for name, value in headers.items():
+        if name.lower() == "retry-after":
+            try:
+                return float(value)
+            except ValueError:
+                return None
+    return None
+
+
+# ------------------------------------------------- Field projections -------------------------------------------------
+#
+# Spotify sends a lot of data that is never used by this program (available markets, images, external URLs, the user
+# that added a track, ...). The projections below select only the fields that are needed, using Spotify's syntax for
+# the "fields" parameter: fields are separated by commas, the fields of a nested object are put in parentheses.
+#
+#   "diff":     only what is needed to find new / removed / duplicate entries
+#   "display":  what is needed to show an entry to the user (and to add it to a playlist)
+#   "snapshot": what is saved to the hard drive as content file (see Snapshot_operations.PLAYLIST_COLUMNS)
+#
+# The projections describe a single item of a page, use get_page_fields() to get the projection of a whole page.
+# Only the playlist endpoints support the "fields" parameter. The artist's albums are projected by project() or, when
+# they are saved, by Snapshot_operations after they have been received, so at least nothing that isn't needed is
+# processed or saved.
+#
+PLAYLIST_ITEM_FIELDS = {
+    "diff": "track(uri)",
+    "display": "track(uri,name,artists(name))",
+    "snapshot": "added_at,track(uri,name,artists(name))",
+}
+ALBUM_FIELDS = {
+    "diff": "uri",
+    "display": "uri,name,artists(name),album_group,album_type",
+    "snapshot": "uri,name,artists(name),album_group,album_type,release_date",
+}
+PLAYLIST_FIELDS = {
+    "snapshot_id": "snapshot_id",
+    # the snapshot ID and the first page of the "diff" items, received in the same response
+    "snapshot_id_and_items": "snapshot_id,tracks(items(track(uri)),next)",
+    # the display name, i.e. when playlists are imported into a group (see Import_operations)
+    "name": "name",
+}
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+
+def get_page_fields(item_fields):
+    """
+    Get the projection of a whole page from the projection of a single item. The "next" field is always part of the
+    projection, iterate_pages() needs it to request the following page.
+
+    :param item_fields: the projection of a single item, i.e. PLAYLIST_ITEM_FIELDS["diff"]
+    :type item_fields: str
+    :return: the projection of a page
+    """
+    return "items(" + item_fields + "),next"
+
+
+def project(obj, fields):
+    """
+    Reduces a json object, as returned by the Spotify API, to the given fields. Lists are projected element by element.
+    Fields that are missing in the object are left out.
+
+        project({"uri": "x", "name": "y", "artists": [{"name": "z", "id": "1"}]}, "uri,artists(name)")
+    =>  {"uri": "x", "artists": [{"name": "z"}]}
+
+    :param obj: a json object (dictionary, list, string, ...)
+    :param fields: a projection, i.e. ALBUM_FIELDS["snapshot"]
+    :type fields: str
+    :return: the projected object
+    """
+    return _apply_projection(obj, _parse_fields(fields))
+
+
+def _apply_projection(obj, projection):
+    """
+    Applies a parsed projection (see _parse_fields()) to the object
+
+    :param projection: a dictionary field name -> projection of the field, None selects the whole field
+    :type projection: dict
+    """
+    if projection is None:
+        return obj
+    if isinstance(obj, list):
+        return [_apply_projection(element, projection) for element in obj]
+    if isinstance(obj, dict):
+        return {name: _apply_projection(obj[name], sub_projection)
+                for name, sub_projection in projection.items() if name in obj}
+    return obj
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_fields(fields):
+    """
+    Parses a projection like "items(track(uri,name)),next" into nested dictionaries:
+        {"items": {"track": {"uri": None, "name": None}}, "next": None}
+
+    :type fields: str
+    :raise ValueError: the parentheses don't match
+    :return: a dictionary field name -> projection of the field, None selects the whole field
+    """
+    root = {}
+    stack = [root]  # stack[-1] is the dictionary the next field is added to
+    name = ""
+    last_name = None
+
+    for char in fields + ",":
+        if char in ",()":
+            if name.strip():
+                last_name = name.strip()
+                stack[-1][last_name] = None
+            name = ""
+
+            if char == "(":
+                if last_name is None:
+                    raise ValueError("A '(' must follow a field name: " + fields)
+                stack[-1][last_name] = {}
+                stack.append(stack[-1][last_name])
+                last_name = None
+            elif char == ")":
+                if len(stack) == 1:
+                    raise ValueError("Unmatched ')' in fields: " + fields)
+                stack.pop()
+        else:
+            name += char
+
+    if len(stack) != 1:
+        raise ValueError("Unmatched '(' in fields: " + fields)
+
+    return root
+
+
+def iterate_pages(sp, first_page):
+    """
+    Walks through every page of a Spotify paging object and yields its items one by one.
+
+    Spotify returns long lists (playlist items, artist albums, album tracks, ...) in pages of a fixed size. Each page
+    links to the following page via its "next" field. Only the page that is currently iterated over is held in memory,
+    the following page is requested as soon as the items of the current page have been consumed.
+
+    :param sp: the Spotify API client
+    :param first_page: the first page, as returned by e.g. ``sp.playlist_items()``
+    :type sp: spotipy.Spotify
+    :type first_page: dict
+    :return: a generator yielding every item of every page
+    """
+    # a paging object looks like this:
+    # object{7}:
+    #   "href": https://api.spotify....
+    #   "items" [number_of_items_in_page]:
+    #   "limit" : 100
+    #   "next" : <url of the next page> or null if this is the last page
+    #   "offset": 0
+    #   "previous": null
+    #   "total" : <number of items over all pages>
+    page = first_page
+    while page:
+        for item in page["items"]:
+            yield item
+
+        # sp.next() returns None if there is no next page
+        page = sp.next(page) if page.get("next") else None
+
+
+async def iterate_pages_async(asp, first_page):
+    """
+    Async variant of iterate_pages(). Walks through every page of a Spotify paging object and yields its items one by
+    one, the following page is requested as soon as the items of the current page have been consumed.
+
+    :param asp: the asyncio based Spotify API client
+    :param first_page: the first page, as returned by e.g. ``await asp.playlist_items()``
+    :type asp: Async_operations.AsyncSpotify
+    :type first_page: dict
+    :return: an async generator yielding every item of every page
+    """
+    page = first_page
+    while page:
+        for item in page["items"]:
+            yield item
+
+        # asp.next() returns None if there is no next page
+        page = await asp.next(page) if page.get("next") else None
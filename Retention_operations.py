@@ -0,0 +1,159 @@
+import os
+from datetime import date, datetime
+
+import Lock_operations
+import Snapshot_operations
+
+# the default retention policy, see RetentionPolicy
+DEFAULT_DAILY_DAYS = 30
+DEFAULT_WEEKLY_DAYS = 365
+DEFAULT_COMPACT_AFTER = 7
+
+
+class RetentionPolicy(object):
+    """
+    A retention policy decides which snapshots of a playlist / artist are kept, depending on their age:
+        1. every snapshot of the last ``daily_days`` days (one per day), they stay in the content file directory
+        2. the newest snapshot of every week, up to ``weekly_days`` days
+        3. the newest snapshot of every month after that
+
+    The snapshots older than ``daily_days`` are kept in the pack of the content file directory (see
+    Snapshot_operations.pack_history()). The newest snapshot is always kept in the directory, no matter how old it is.
+
+    A content file directory is only compacted once it holds at least ``compact_after`` content files older than
+    ``daily_days`` days, so the pack isn't rewritten by every run.
+    """
+
+    def __init__(self, daily_days=DEFAULT_DAILY_DAYS, weekly_days=DEFAULT_WEEKLY_DAYS,
+                 compact_after=DEFAULT_COMPACT_AFTER):
+        """
+        Creates a RetentionPolicy object
+
+        :param daily_days: the number of days every snapshot is kept
+        :type daily_days: int
+        :param weekly_days: the number of days the newest snapshot of a week is kept, older snapshots are kept monthly
+        :type weekly_days: int
+        :param compact_after: the number of content files older than daily_days, that trigger the compaction of a
+                              content file directory
+        :type compact_after: int
+        """
+        self.daily_days = daily_days
+        self.weekly_days = weekly_days
+        self.compact_after = compact_after
+
+    def get_daily_days(self): return self.daily_days
+
+    def get_weekly_days(self): return self.weekly_days
+
+    def get_compact_after(self): return self.compact_after
+
+    def select_kept_file_names(self, file_names, today):
+        """
+        Selects the content files that are kept out of the content files older than daily_days
+
+        :param file_names: the names of the content files older than daily_days, i.e. as returned by
+                           Snapshot_operations.list_content_files()
+        :param today: the date the age of the content files is measured from
+        :type file_names: list[str]
+        :type today: date
+        :return: a set of the kept content file names
+        """
+        # maps a week / month to the newest content file of it
+        newest_file_names = {}
+        for file_name in sorted(file_names):
+            file_date = _get_date(file_name)
+            if (today - file_date).days < self.weekly_days:
+                bucket = ("week",) + tuple(file_date.isocalendar()[:2])
+            else:
+                bucket = ("month", file_date.year, file_date.month)
+            newest_file_names[bucket] = file_name
+
+        return set(newest_file_names.values())
+
+
+def get_retention_policy(settings):
+    """
+    Creates the retention policy configured in settings.json:
+        "retention": {"daily_days": 30, "weekly_days": 365, "compact_after": 7}
+
+    Every value is optional, the defaults are used for missing values.
+
+    :param settings: the content of settings.json
+    :type settings: dict
+    :return: a RetentionPolicy
+    """
+    retention = settings.get("retention", {})
+    return RetentionPolicy(daily_days=retention.get("daily_days", DEFAULT_DAILY_DAYS),
+                           weekly_days=retention.get("weekly_days", DEFAULT_WEEKLY_DAYS),
+                           compact_after=retention.get("compact_after", DEFAULT_COMPACT_AFTER))
+
+
+def compact_content_directory(directory, policy, today=None):
+    """
+    Applies the retention policy to the content files of a single playlist / artist. The old snapshots that are kept
+    are moved into the directory's pack, the other old snapshots are removed. The directory is locked meanwhile, so no
+    snapshot is saved to it at the same time (see Lock_operations).
+
+    :param directory: the path of a content file directory
+    :param policy: the retention policy
+    :param today: the date the age of the content files is measured from, today if None
+    :type directory: str
+    :type policy: RetentionPolicy
+    :type today: date
+    :return: True if the directory has been compacted
+    """
+    today = today or date.today()
+    with Lock_operations.FileLock(Lock_operations.get_directory_lock_path(directory)):
+        return _compact_locked_content_directory(directory, policy, today)
+
+
+def _compact_locked_content_directory(directory, policy, today):
+    """
+    Applies the retention policy to a content file directory, see compact_content_directory(). The lock of the
+    directory must be held.
+    """
+    history = [name for name in Snapshot_operations.list_content_files(directory)
+               if Snapshot_operations.get_date_str(name) is not None]
+
+    # the newest snapshot stays in the directory, new snapshots are saved as delta to it
+    old_file_names = [name for name in history[:-1] if (today - _get_date(name)).days >= policy.get_daily_days()]
+
+    # only compact the directory once enough content files have become old, packed snapshots don't count
+    n_of_old_files_in_directory = sum(1 for name in old_file_names if os.path.exists(os.path.join(directory, name)))
+    if not old_file_names or n_of_old_files_in_directory < policy.get_compact_after():
+        return False
+
+    kept_file_names = policy.select_kept_file_names(old_file_names, today)
+    Snapshot_operations.pack_history(
+        directory,
+        packed_file_names=[name for name in old_file_names if name in kept_file_names],
+        dropped_file_names=[name for name in old_file_names if name not in kept_file_names])
+    return True
+
+
+def compact_content_files(content_directory_path, policy, today=None):
+    """
+    Applies the retention policy to every content file directory, see compact_content_directory()
+
+    :param content_directory_path: the path of the directory holding every content file directory
+    :param policy: the retention policy
+    :param today: the date the age of the content files is measured from, today if None
+    :type content_directory_path: str
+    :type policy: RetentionPolicy
+    :type today: date
+    :return: the number of compacted content file directories
+    """
+    n_of_compacted_directories = 0
+    for name in sorted(os.listdir(content_directory_path)):
+        directory = os.path.join(content_directory_path, name)
+        if os.path.isdir(directory) and compact_content_directory(directory, policy, today):
+            n_of_compacted_directories += 1
+
+    return n_of_compacted_directories
+
+
+def _get_date(file_name):
+    """
+    Returns the date of a content file as a date object
+    """
+    return datetime.strptime(Snapshot_operations.get_date_str(file_name), "%Y.%m.%d").date()
@@ -0,0 +1,252 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import URI_operations
+from Artist_operations import get_new_albums, get_artists_songs_from_album
+from Artist_operations import get_new_albums_async, get_artists_songs_from_album_async
+from Playlist_operations import get_new_songs_in_playlist, get_new_songs_in_playlist_async
+
+# the number of playlists / artists that are fetched at the same time when no other limit is set in settings.json
+DEFAULT_MAX_WORKERS = 8
+
+
+def fetch_sources(source_tuples, fetch, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Calls ``fetch`` for every source tuple (name, URI) of a group. Up to ``max_workers`` sources are fetched at the
+    same time, as fetching a source mostly means waiting for Spotify to answer.
+
+    The results are returned in the same order as the source tuples, no matter in which order the fetches finish.
+    If ``fetch`` raises an error for a source, the error is raised again by this method.
+
+    :param source_tuples: a list of tuples (name, URI) of playlists and / or artists
+    :param fetch: a function taking a source tuple and returning the result for this source
+    :param max_workers: the maximum number of sources that are fetched at the same time
+    :type source_tuples: list[tuple[str, str]]
+    :type fetch: typing.Callable
+    :type max_workers: int
+    :return: a list, the n-th element being the result of the n-th source tuple
+    """
+    if not source_tuples:
+        return []
+
+    # executor.map() returns the results in the order of the input, not in the order of completion
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(source_tuples)))) as executor:
+        return list(executor.map(fetch, source_tuples))
+
+
+async def fetch_sources_async(source_tuples, fetch):
+    """
+    Async variant of fetch_sources(). Awaits ``fetch`` for every source tuple (name, URI) of a group, every source is
+    fetched at the same time on the running event loop. The number of requests in flight is limited by the client
+    (see Async_operations.AsyncSpotify), not by this method, so thousands of sources need no thread at all.
+
+    The results are returned in the same order as the source tuples, no matter in which order the fetches finish.
+
+    :param source_tuples: a list of tuples (name, URI) of playlists and / or artists
+    :param fetch: a coroutine function taking a source tuple and returning the result for this source
+    :type source_tuples: list[tuple[str, str]]
+    :type fetch: typing.Callable
+    :return: a list, the n-th element being the result of the n-th source tuple
+    """
+    # gather() returns the results in the order of the input, not in the order of completion
+    return list(await asyncio.gather(*[fetch(source_tuple) for source_tuple in source_tuples]))
+
+
+class RunPlan(object):
+    """
+    A run plan holds the unique sources (name, URI) of one or more groups. A playlist or artist that is listed more
+    than once, be it in the same group under a different name or in several groups, is only fetched once. Its result
+    is then handed to every group and name that references it.
+    """
+
+    def __init__(self, groups, include_artists=True):
+        """
+        Creates a RunPlan object
+
+        :param groups: the groups that are run, i.e. the groups returned by IO_operations.read_groups_from_file()
+        :type groups: list[IO_operations.Group]
+        :param include_artists: flag to also fetch the artists of the groups, otherwise only the playlists are fetched
+        :type include_artists: bool
+        """
+        self.groups = groups
+        self.include_artists = include_artists
+
+        # the unique sources in order of their first appearance, each source keeps the name it was first listed under
+        self.sources = []
+        # maps each URI to a list of tuples (group_id, name), one for every time the URI is listed
+        self.references = {}
+        for group in groups:
+            for name, uri in self.get_source_tuples(group):
+                if uri not in self.references:
+                    self.references[uri] = []
+                    self.sources.append((name, uri))
+                self.references[uri].append((group.get_group_id(), name))
+
+    def get_groups(self): return self.groups
+
+    def get_sources(self): return self.sources
+
+    def get_references(self, uri): return self.references[uri]
+
+    def get_source_tuples(self, group):
+        """
+        Returns the source tuples (name, URI) of the group that are part of this run, duplicates included.
+
+        :param group: one of the groups of this plan
+        :type group: IO_operations.Group
+        :return: a list of tuples (name, URI), the playlists first, then the artists
+        """
+        return group.get_playlist_tuples() + (group.get_artist_tuples() if self.include_artists else [])
+
+    def fan_out(self, results):
+        """
+        Hands the results of the unique sources to every source tuple that references them.
+
+        The result of a source that is listed more than once is the same object for every reference, it is not copied.
+
+        :param results: a list, the n-th element being the result of the n-th source returned by get_sources()
+        :type results: list
+        :return: a list, the n-th element being a list of the results of the n-th group's source tuples, in the order
+                 returned by get_source_tuples()
+        """
+        results_by_uri = dict(zip((uri for _, uri in self.sources), results))
+        return [[results_by_uri[uri] for _, uri in self.get_source_tuples(group)] for group in self.groups]
+
+
+def fetch_groups(groups, fetch, max_workers=DEFAULT_MAX_WORKERS, include_artists=True):
+    """
+    Calls ``fetch`` once for every unique source tuple (name, URI) of the groups, see RunPlan and fetch_sources().
+
+    :param groups: the groups that are run
+    :param fetch: a function taking a source tuple and returning the result for this source
+    :param max_workers: the maximum number of sources that are fetched at the same time
+    :param include_artists: flag to also fetch the artists of the groups, otherwise only the playlists are fetched
+    :type groups: list[IO_operations.Group]
+    :type fetch: typing.Callable
+    :type max_workers: int
+    :type include_artists: bool
+    :return: a list, the n-th element being a list of the results of the n-th group's source tuples
+    """
+    plan = RunPlan(groups, include_artists=include_artists)
+    return plan.fan_out(fetch_sources(plan.get_sources(), fetch, max_workers=max_workers))
+
+
+async def fetch_groups_async(groups, fetch, include_artists=True):
+    """
+    Async variant of fetch_groups(). Awaits ``fetch`` once for every unique source tuple (name, URI) of the groups.
+
+    :param groups: the groups that are run
+    :param fetch: a coroutine function taking a source tuple and returning the result for this source
+    :param include_artists: flag to also fetch the artists of the groups, otherwise only the playlists are fetched
+    :type groups: list[IO_operations.Group]
+    :type fetch: typing.Callable
+    :type include_artists: bool
+    :return: a list, the n-th element being a list of the results of the n-th group's source tuples
+    """
+    plan = RunPlan(groups, include_artists=include_artists)
+    return plan.fan_out(await fetch_sources_async(plan.get_sources(), fetch))
+
+
+def run_groups_async(asp, groups, fetch, include_artists=True):
+    """
+    Runs fetch_groups_async() on a new event loop and waits for its results, so synchronous code (i.e. the GUI) can
+    fetch every source of the groups over a single thread. The connections of the client are closed afterwards, the
+    client can be passed again for the next run.
+
+    :param asp: the asyncio based Spotify API client ``fetch`` sends its requests with
+    :param groups: the groups that are run
+    :param fetch: a coroutine function taking a source tuple and returning the result for this source
+    :param include_artists: flag to also fetch the artists of the groups, otherwise only the playlists are fetched
+    :type asp: Async_operations.AsyncSpotify
+    :type groups: list[IO_operations.Group]
+    :type fetch: typing.Callable
+    :type include_artists: bool
+    :return: a list, the n-th element being a list of the results of the n-th group's source tuples
+    """
+    async def run():
+        try:
+            return await fetch_groups_async(groups, fetch, include_artists=include_artists)
+        finally:
+            await asp.close()
+
+    return asyncio.run(run())
+
+
+def get_new_songs_of_source(sp, info_tuple, since_date=None, save_content=False):
+    """
+    Returns the new songs of a playlist or artist as a list of dictionaries holding each songs uri, name and artist(s).
+    For playlists these are the newly added songs, for artists the songs of newly released albums featuring the artist.
+
+    Dictionary fields:
+        - "uri" : str
+        - "name" : str
+        - "artists" : tuple(str)
+
+    The dictionaries are the shared, read-only song records of the intern table (see
+    Playlist_operations.get_song_data_from_track()). ``dict(song)`` returns a copy that can be changed or saved as json.
+
+    :param sp: the Spotify API client
+    :param info_tuple: a tuple (name, URI) of a playlist or artist
+    :param since_date: a date
+    :param save_content: flag to save the current content of the playlist / artist to the hard drive
+    :type sp: spotipy.Spotify
+    :type info_tuple: tuple[str, str]
+    :type since_date: date
+    :type save_content: bool
+    :raise ValueError: the tuple neither contains a playlist nor an artist URI
+    :return: a list of dictionaries each representing a new song
+    """
+    new_songs = []
+    # tuples of format: (<name>, <uri>)
+    if URI_operations.is_playlist_uri(info_tuple[1]):
+        new_songs = get_new_songs_in_playlist(sp, p_uri=info_tuple[1], since_date=since_date, as_dict=True,
+                                              save_content=save_content)
+
+    elif URI_operations.is_artist_uri(info_tuple[1]):
+        new_albums = get_new_albums(sp, a_uri=info_tuple[1], since_date=since_date, as_dict=True,
+                                    save_content=save_content)
+        for n_album in new_albums:
+            new_songs += get_artists_songs_from_album(sp, alb_uri=n_album["uri"], art_uri=info_tuple[1])
+
+    # if the tuple somehow neither contains a p_uri nor a_uri, throw an error
+    else:
+        raise ValueError("The tuple " + repr(info_tuple) + " does not represent a playlist or an artist!")
+
+    return new_songs
+
+
+async def get_new_songs_of_source_async(asp, info_tuple, since_date=None, save_content=False):
+    """
+    Async variant of get_new_songs_of_source(). Returns the new songs of a playlist or artist as a list of dictionaries
+    holding each songs uri, name and artist(s).
+
+    :param asp: the asyncio based Spotify API client
+    :param info_tuple: a tuple (name, URI) of a playlist or artist
+    :param since_date: a date
+    :param save_content: flag to save the current content of the playlist / artist to the hard drive
+    :type asp: Async_operations.AsyncSpotify
+    :type info_tuple: tuple[str, str]
+    :type since_date: date
+    :type save_content: bool
+    :raise ValueError: the tuple neither contains a playlist nor an artist URI
+    :return: a list of dictionaries each representing a new song
+    """
+    new_songs = []
+    if URI_operations.is_playlist_uri(info_tuple[1]):
+        new_songs = await get_new_songs_in_playlist_async(asp, p_uri=info_tuple[1], since_date=since_date,
+                                                          as_dict=True, save_content=save_content)
+
+    elif URI_operations.is_artist_uri(info_tuple[1]):
+        new_albums = await get_new_albums_async(asp, a_uri=info_tuple[1], since_date=since_date, as_dict=True,
+                                                save_content=save_content)
+
+        # the tracks of every new album are requested at the same time
+        for album_songs in await asyncio.gather(*[get_artists_songs_from_album_async(asp, alb_uri=n_album["uri"],
+                                                                                     art_uri=info_tuple[1])
+                                                  for n_album in new_albums]):
+            new_songs += album_songs
+
+    else:
+        raise ValueError("The tuple " + repr(info_tuple) + " does not represent a playlist or an artist!")
+
+    return new_songs
@@ -0,0 +1,983 @@
+import filecmp
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import zipfile
+
+import Lock_operations
+from Diff_operations import diff_snapshots
+
+# ------------------------------------------------ Compact Snapshots ------------------------------------------------
+#
+# A snapshot is the content of a playlist / artist at the time it was saved. Older versions of this program saved the
+# raw response of the Spotify API as a .json content file, a snapshot only keeps the fields that are read later on.
+# The fields are stored column-wise (every URI, then every name, ...) and the file is compressed with gzip:
+#
+#   {"snapshot_id": "<snapshot_id>",            <- playlists only, always the first field (see read_snapshot_id())
+#    "content_hash": "<sha256>",                <- the hash of the columns, see get_content_hash()
+#    "version": 1,
+#    "kind": "playlist",                        <- "playlist" or "artist"
+#    "total": <number of items>,
+#    "columns": {"uri": [...], "name": [...], "artists": [[<artist name>, ...], ...], "added_at": [...]}}
+#
+# Columns of the same kind of values compress a lot better than the raw items, where every value is surrounded by the
+# rest of the item. read_content_file() turns both the compact and the raw format back into a list of items.
+#
+# ------------------------------------------------- Snapshot History -------------------------------------------------
+#
+# Consecutive snapshots of a playlist / artist usually differ by a few songs, so most snapshots are saved as a delta:
+# the changes since the previous snapshot of the same URI. Every now and then a full snapshot (a checkpoint) is saved.
+#
+#   spotify_playlist_<id>_content_raw(2021.01.01).json.gz           <- checkpoint
+#   spotify_playlist_<id>_content_raw(2021.01.02).delta.json.gz     <- changes since 2021.01.01
+#   spotify_playlist_<id>_content_raw(2021.01.05).delta.json.gz     <- changes since 2021.01.02
+#
+#   {"snapshot_id": "<snapshot_id>", "version": 1, "kind": "playlist", "total": <number of items>,
+#    "base": "<file name of the previous snapshot>",
+#    "removed": [<positions in the previous snapshot>, ...],
+#    "inserted": {"positions": [<positions in this snapshot>, ...], "columns": {<the columns of the inserted items>}}}
+#
+# A snapshot is rebuilt by reading the nearest checkpoint before it and replaying every delta up to it. Raw content
+# files saved by older versions of this program are checkpoints as well.
+#
+# ----------------------------------------------------- Aliases -----------------------------------------------------
+#
+# Snapshots are identified by the hash of their columns (the content hash). If nothing has changed since the previous
+# snapshot, no new file is written: the previous file is hard linked under today's name instead (an alias). An alias
+# keeps the extension of the file it links to and takes no space on the hard drive, everything that lists or reads the
+# content files treats it like a copy of that file.
+#
+#   spotify_artist_<id>_content_raw(2021.01.02).delta.json.gz
+#   spotify_artist_<id>_content_raw(2021.01.03).delta.json.gz      <- alias of 2021.01.02
+#
+# ------------------------------------------------------ Packs ------------------------------------------------------
+#
+# Old snapshots are moved into a single pack file per URI (see Retention_operations), a zip archive holding the
+# snapshots as checkpoints and deltas, just like the content files. A packed snapshot keeps its path: a content file
+# that isn't found in its directory is read from the directory's pack, so everything that finds and reads content files
+# works the same for packed snapshots.
+#
+#   spotify_playlist_<id>/spotify_playlist_<id>_pack.zip
+#       spotify_playlist_<id>_content_raw(2020.05.31).json.gz
+#       spotify_playlist_<id>_content_raw(2020.06.07).delta.json.gz     <- changes since 2020.05.31
+#
+SNAPSHOT_FILE_EXTENSION = ".json.gz"
+DELTA_FILE_EXTENSION = ".delta" + SNAPSHOT_FILE_EXTENSION
+LEGACY_FILE_EXTENSION = ".json"
+# snapshots are written to a temporary file first, which is renamed to the content file once it is complete
+TEMPORARY_FILE_EXTENSION = ".tmp"
+PACK_FILE_SUFFIX = "_pack.zip"
+
+# a checkpoint is saved after this many deltas, so at most CHECKPOINT_INTERVAL - 1 deltas are replayed
+CHECKPOINT_INTERVAL = 30
+# a checkpoint is also saved when more than this share of the items has changed, then the delta isn't much smaller
+_MAX_DELTA_RATIO = 0.5
+
+_FORMAT_VERSION = 1
+
+# the columns of each kind of snapshot, in the order they are written
+PLAYLIST_COLUMNS = ("uri", "name", "artists", "added_at")
+ARTIST_COLUMNS = ("uri", "name", "artists", "album_group", "album_type", "release_date")
+
+# content files of playlists begin with {"snapshot_id": "<snapshot_id>", ...
+# snapshot IDs are about 60 characters long, so the snapshot ID is always part of the first 200 characters
+_SNAPSHOT_ID_RE = re.compile(r'\{"snapshot_id":\s*(?P<SNAPSHOT_ID>"(?:[^"\\]|\\.)*")')
+_SNAPSHOT_ID_MAX_LENGTH = 200
+
+# the content hash follows the snapshot ID, so it is part of the first 300 characters as well
+_CONTENT_HASH_RE = re.compile(r'"content_hash":\s*"(?P<CONTENT_HASH>[0-9a-f]{64})"')
+_CONTENT_HASH_MAX_LENGTH = 300
+
+# the arrays read by read_item_uris(): the URI column of a compact snapshot and the items of a raw content file
+_URI_COLUMN = ("uri",)
+_URI_COLUMN_RE = re.compile(r'"columns":\s*\{"uri":\s*\[')
+_ITEMS_RE = re.compile(r'"items":\s*\[')
+_MAX_ARRAY_START_LENGTH = 32
+_CHUNK_SIZE = 64 * 1024
+
+# content files end with the date they were saved at, i.e. spotify_playlist_<id>_content_raw(2021.01.14).json.gz
+_CONTENT_FILE_DATE_RE = re.compile(r"_content_raw\((?P<DATE>\d{4}\.\d{2}\.\d{2})\)")
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+
+def get_content_directory_name(uri):
+    """
+    Returns the name of the directory holding the content files of the URI. ":" must not be part of a directory name
+    on some OS, so every ":" is replaced with "_"
+
+        get_content_directory_name("spotify:playlist:<id>") = "spotify_playlist_<id>"
+
+    :param uri: the spotify URI of a playlist / artist
+    :type uri: str
+    :return: the name of the directory
+    """
+    return uri.replace(":", "_")
+
+
+def get_date_str(file_name):
+    """
+    Extracts the date from the name of a content file, no matter if it's a checkpoint, a delta or a raw content file
+
+        get_date_str("spotify_playlist_<id>_content_raw(2021.01.14).json.gz") = "2021.01.14"
+
+    :param file_name: the name of a content file
+    :type file_name: str
+    :return: the date as a string of the format yyyy.mm.dd or None if the name contains no date
+    """
+    match = _CONTENT_FILE_DATE_RE.search(file_name)
+    return match.group("DATE") if match else None
+
+
+def is_snapshot_file(file_path):
+    """
+    Checks whether the file is a compact snapshot (checkpoint or delta) or a raw content file saved by older versions of
+    this program
+
+    :param file_path: the path of a content file
+    :type file_path: str or pathlib.Path
+    :return: True if the file is a compact snapshot
+    """
+    return str(file_path).endswith(SNAPSHOT_FILE_EXTENSION)
+
+
+def is_delta_file(file_path):
+    """
+    Checks whether the file is a delta, that only holds the changes since the previous snapshot
+
+    :param file_path: the path of a content file
+    :type file_path: str or pathlib.Path
+    :return: True if the file is a delta
+    """
+    return str(file_path).endswith(DELTA_FILE_EXTENSION)
+
+
+def is_content_file(file_name):
+    """
+    Checks whether the file is a content file of any format
+
+    :param file_name: the name or path of a file
+    :type file_name: str or pathlib.Path
+    :return: True if the file is a checkpoint, delta or raw content file
+    """
+    return str(file_name).endswith(SNAPSHOT_FILE_EXTENSION) or str(file_name).endswith(LEGACY_FILE_EXTENSION)
+
+
+def get_pack_path(directory):
+    """
+    Returns the path of the pack file of a content file directory, see the description of packs at the top
+
+    :param directory: the path of a content file directory
+    :type directory: str
+    :return: the path of the pack file, the file might not exist
+    """
+    return os.path.join(directory, os.path.basename(os.path.normpath(directory)) + PACK_FILE_SUFFIX)
+
+
+def list_content_files(directory):
+    """
+    Lists the content files of a content file directory, the packed ones included. If a snapshot of a day is part of
+    the directory and of the pack (i.e. packing was interrupted), the one in the directory is listed.
+
+    :param directory: the path of a content file directory
+    :type directory: str
+    :return: the names of the content files, oldest first
+    """
+    names = [name for name in os.listdir(directory) if is_content_file(name)]
+    dates = {get_date_str(name) for name in names}
+
+    pack_path = get_pack_path(directory)
+    if os.path.exists(pack_path):
+        with zipfile.ZipFile(pack_path) as pack:
+            names += [name for name in pack.namelist() if get_date_str(name) not in dates]
+
+    return sorted(names)
+
+
+def open_content_file(file_path):
+    """
+    Opens a content file for reading text, no matter if it is a compact snapshot, a raw content file or a packed
+    snapshot.
+
+    :param file_path: the path of a content file
+    :type file_path: str or pathlib.Path
+    :raise FileNotFoundError: the content file is neither part of its directory nor of the directory's pack
+    :return: a file object opened in text mode
+    """
+    if not os.path.exists(file_path):
+        directory, file_name = os.path.split(str(file_path))
+        try:
+            with zipfile.ZipFile(get_pack_path(directory)) as pack:
+                # packed snapshots are small, they are read at once so the pack can be closed right away
+                data = pack.read(file_name)
+        except KeyError:
+            raise FileNotFoundError("The content file " + repr(str(file_path)) + " doesn't exist")
+
+        return gzip.open(io.BytesIO(data), "rt", encoding="utf-8")
+
+    if is_snapshot_file(file_path):
+        return gzip.open(file_path, "rt", encoding="utf-8")
+    else:
+        return open(file_path, "r")
+
+
+def save_snapshot(file_path, items, kind, snapshot_id=None):
+    """
+    Saves the items as the newest snapshot of the URI, either as a checkpoint or as a delta to the previous snapshot.
+    Any other snapshot of the same day is replaced. The file is written under a temporary name and renamed once it is
+    complete, so a crash never leaves a truncated content file behind. The content file directory is locked while the
+    snapshot is saved, see Lock_operations.
+
+    :param file_path: the path of today's checkpoint, a delta is saved next to it (see DELTA_FILE_EXTENSION)
+    :param items: the items of a playlist (as returned by playlist_items()) or the albums of an artist (as returned by
+                  artist_albums()), i.e. the generator returned by Request_operations.iterate_pages
+    :param kind: "playlist" or "artist"
+    :param snapshot_id: the snapshot ID of the playlist
+    :type file_path: str
+    :type items: typing.Iterable[dict]
+    :type kind: str
+    :type snapshot_id: str
+    :return: the path of the saved file
+    """
+    # another process saving a snapshot of the URI at the same time could remove the base of the delta
+    with Lock_operations.FileLock(Lock_operations.get_directory_lock_path(os.path.dirname(file_path))):
+        staged_snapshot = stage_snapshot(file_path, items, kind, snapshot_id)
+        commit_snapshots([staged_snapshot])
+
+    return staged_snapshot[1]
+
+
+def stage_snapshot(file_path, items, kind, snapshot_id=None):
+    """
+    Writes the items as the newest snapshot of the URI to a temporary file next to the content file (see
+    save_snapshot()). The snapshot is only part of the URI's history once it has been committed with
+    commit_snapshots(). At most one snapshot per URI can be staged at a time, a delta is always based on the committed
+    content files. The lock of the content file directory (see Lock_operations.get_directory_lock_path()) must be held
+    until the snapshot has been committed.
+
+    :param file_path: the path of today's checkpoint, a delta is saved next to it (see DELTA_FILE_EXTENSION)
+    :param items: the items of a playlist or the albums of an artist, see save_snapshot()
+    :param kind: "playlist" or "artist"
+    :param snapshot_id: the snapshot ID of the playlist
+    :type file_path: str
+    :type items: typing.Iterable[dict]
+    :type kind: str
+    :type snapshot_id: str
+    :return: a tuple (temporary file path, content file path) that is passed on to commit_snapshots()
+    """
+    columns = _items_to_columns(items, kind)
+    content_hash = get_content_hash(columns)
+
+    directory, file_name = os.path.split(file_path)
+    file_stem = file_name[:-len(SNAPSHOT_FILE_EXTENSION)]
+
+    # the content files of the URI saved before today, oldest first
+    history = sorted(name for name in os.listdir(directory) if is_content_file(name) and not name.startswith(file_stem))
+
+    # nothing has changed since the previous snapshot, it is linked under today's name
+    if history and read_snapshot_id(os.path.join(directory, history[-1])) == snapshot_id \
+            and read_content_hash(os.path.join(directory, history[-1]), kind) == content_hash:
+        staged_snapshot = _stage_alias(directory, history[-1], file_stem)
+        if staged_snapshot is not None:
+            return staged_snapshot
+
+    snapshot = {"columns": columns}
+    if history and _count_trailing_deltas(history) < CHECKPOINT_INTERVAL - 1:
+        snapshot = _encode_snapshot(_read_columns(os.path.join(directory, history[-1]), kind), columns, kind)
+        snapshot["base"] = history[-1]
+
+    if "columns" in snapshot:
+        saved_file_path = file_path
+    else:
+        saved_file_path = os.path.join(directory, file_stem + DELTA_FILE_EXTENSION)
+
+    temporary_file_path = saved_file_path + TEMPORARY_FILE_EXTENSION
+    with open(temporary_file_path, "wb") as file:
+        write_snapshot(file, snapshot, kind, snapshot_id, total=len(columns["uri"]), content_hash=content_hash)
+        file.close()
+
+    return temporary_file_path, saved_file_path
+
+
+def commit_snapshots(staged_snapshots):
+    """
+    Makes staged snapshots (see stage_snapshot()) part of the history of their URIs. Every temporary file is flushed to
+    the hard drive before it is renamed to its content file, so a content file is either complete or not there at all.
+    The directories are flushed once after every file has been renamed, no matter how many files they hold.
+
+    :param staged_snapshots: tuples (temporary file path, content file path) as returned by stage_snapshot(), at most
+                             one per URI
+    :type staged_snapshots: list[tuple[str, str]]
+    """
+    for temporary_file_path, _ in staged_snapshots:
+        _fsync(temporary_file_path)
+
+    directories = set()
+    for temporary_file_path, saved_file_path in staged_snapshots:
+        os.replace(temporary_file_path, saved_file_path)
+
+        directory, saved_file_name = os.path.split(saved_file_path)
+        _remove_other_files_of_today(directory, saved_file_name)
+        directories.add(directory)
+
+    # the renames are only permanent once the directories have been flushed as well
+    for directory in directories:
+        _fsync(directory)
+
+
+def pack_history(directory, packed_file_names, dropped_file_names):
+    """
+    Moves old snapshots of a URI into the pack of its content file directory (see the description of packs at the top)
+    and removes the snapshots that are no longer needed. The pack is rewritten as a whole: the packed snapshots are
+    saved as a chain of checkpoints and deltas of their own. The oldest content file that is left in the directory is
+    turned into a checkpoint, in case it was a delta to a snapshot that has been packed or removed.
+
+    :param directory: the path of a content file directory
+    :param packed_file_names: the names of the content files (in the directory or the pack) that are part of the pack
+                              afterwards
+    :param dropped_file_names: the names of the content files (in the directory or the pack) that are removed. Every
+                               packed and dropped content file must be older than every content file that is left.
+    :type directory: str
+    :type packed_file_names: typing.Collection[str]
+    :type dropped_file_names: typing.Collection[str]
+    :raise ValueError: a content file that is left is older than a packed or dropped content file
+    """
+    history = list_content_files(directory)
+    n_of_old_files = len(packed_file_names) + len(dropped_file_names)
+    if not packed_file_names or set(history[:n_of_old_files]) != set(packed_file_names) | set(dropped_file_names):
+        raise ValueError("Only the oldest content files of a directory can be packed or dropped")
+
+    kind = _get_kind_of_directory(directory)
+    file_stem_prefix = os.path.basename(os.path.normpath(directory)) + "_content_raw("
+
+    # every packed snapshot and the oldest snapshot that is left are rebuilt by replaying the history once
+    packed_snapshots = []
+    first_columns = None
+    for n, (file_name, columns) in enumerate(_iter_history(directory, history[:n_of_old_files + 1], kind)):
+        if n == n_of_old_files:
+            first_columns = columns
+        elif file_name in packed_file_names:
+            snapshot_id = read_snapshot_id(os.path.join(directory, file_name))
+            packed_snapshots.append((get_date_str(file_name), columns, snapshot_id))
+
+    # write the new pack next to the old one, then replace it
+    temporary_pack_path = get_pack_path(directory) + TEMPORARY_FILE_EXTENSION
+    with zipfile.ZipFile(temporary_pack_path, "w", compression=zipfile.ZIP_STORED) as pack:
+        previous_name, previous_columns, n_of_deltas = None, None, 0
+        for date_str, columns, snapshot_id in packed_snapshots:
+            snapshot = {"columns": columns}
+            if previous_name is not None and n_of_deltas < CHECKPOINT_INTERVAL - 1:
+                snapshot = _encode_snapshot(previous_columns, columns, kind)
+                snapshot["base"] = previous_name
+
+            is_delta = "columns" not in snapshot
+            extension = DELTA_FILE_EXTENSION if is_delta else SNAPSHOT_FILE_EXTENSION
+            name = file_stem_prefix + date_str + ")" + extension
+            data = io.BytesIO()
+            write_snapshot(data, snapshot, kind, snapshot_id, total=len(columns["uri"]),
+                           content_hash=get_content_hash(columns))
+            # a fixed time stamp, so packing the same snapshots again results in the same pack
+            pack.writestr(zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0)), data.getvalue())
+
+            previous_name, previous_columns, n_of_deltas = name, columns, n_of_deltas + 1 if is_delta else 0
+
+    _fsync(temporary_pack_path)
+    os.replace(temporary_pack_path, get_pack_path(directory))
+
+    # the oldest content file that is left must not be based on a packed or dropped snapshot
+    first_file_name = history[n_of_old_files] if n_of_old_files < len(history) else None
+    if first_file_name is not None and is_delta_file(first_file_name):
+        # the aliases of the oldest content file are based on the same snapshot, they become aliases of the checkpoint
+        alias_names = []
+        for file_name in history[n_of_old_files + 1:]:
+            if not _is_alias(directory, file_name, first_file_name):
+                break
+            alias_names.append(file_name)
+
+        first_file_path = os.path.join(directory, first_file_name)
+        checkpoint_path = first_file_path[:-len(DELTA_FILE_EXTENSION)] + SNAPSHOT_FILE_EXTENSION
+        with open(checkpoint_path + TEMPORARY_FILE_EXTENSION, "wb") as file:
+            write_snapshot(file, {"columns": first_columns}, kind, read_snapshot_id(first_file_path),
+                           total=len(first_columns["uri"]), content_hash=get_content_hash(first_columns))
+        commit_snapshots([(checkpoint_path + TEMPORARY_FILE_EXTENSION, checkpoint_path)])
+
+        for file_name in alias_names:
+            alias_stem = file_name[:file_name.rindex(")") + 1]
+            staged_snapshot = _stage_alias(directory, os.path.basename(checkpoint_path), alias_stem)
+            if staged_snapshot is None:
+                # the file system doesn't support hard links, the alias becomes a copy of the checkpoint
+                alias_path = os.path.join(directory, alias_stem + SNAPSHOT_FILE_EXTENSION)
+                shutil.copyfile(checkpoint_path, alias_path + TEMPORARY_FILE_EXTENSION)
+                staged_snapshot = (alias_path + TEMPORARY_FILE_EXTENSION, alias_path)
+            commit_snapshots([staged_snapshot])
+
+    # the packed and dropped snapshots are removed from the directory, the old pack only held snapshots that are
+    # packed again or dropped
+    for file_name in history[:n_of_old_files]:
+        if os.path.exists(os.path.join(directory, file_name)):
+            os.remove(os.path.join(directory, file_name))
+    _fsync(directory)
+
+
+def _stage_alias(directory, previous_file_name, file_stem):
+    """
+    Hard links the previous content file to a temporary file, which is renamed to today's content file by
+    commit_snapshots(). See the description of aliases at the top.
+
+    :param directory: the content file directory
+    :param previous_file_name: the name of the newest content file before today
+    :param file_stem: the name of today's content files without extension
+    :type directory: str
+    :type previous_file_name: str
+    :type file_stem: str
+    :return: a tuple (temporary file path, content file path) or None if the file system doesn't support hard links
+    """
+    # the alias keeps the extension of the previous file, so a delta stays a delta
+    extension = previous_file_name[previous_file_name.rindex(")") + 1:]
+    alias_path = os.path.join(directory, file_stem + extension)
+    temporary_file_path = alias_path + TEMPORARY_FILE_EXTENSION
+
+    # a temporary file left behind by a crash is replaced
+    if os.path.exists(temporary_file_path):
+        os.remove(temporary_file_path)
+    try:
+        os.link(os.path.join(directory, previous_file_name), temporary_file_path)
+    except OSError:
+        return None
+
+    return temporary_file_path, alias_path
+
+
+def _remove_other_files_of_today(directory, saved_file_name):
+    """
+    Removes the other snapshot of today, if the content was already saved today as a checkpoint / delta / alias
+    """
+    file_stem = saved_file_name[:saved_file_name.rindex(")") + 1]
+    for name in os.listdir(directory):
+        if name.startswith(file_stem) and name != saved_file_name and is_content_file(name):
+            os.remove(os.path.join(directory, name))
+
+
+def _fsync(path):
+    """
+    Flushes a file or directory to the hard drive. Directories can't be opened on Windows, they are skipped there.
+    """
+    try:
+        file_descriptor = os.open(path, os.O_RDONLY)
+    except (IsADirectoryError, PermissionError):
+        return
+    try:
+        os.fsync(file_descriptor)
+    finally:
+        os.close(file_descriptor)
+
+
+def write_snapshot(file, snapshot, kind, snapshot_id=None, total=None, content_hash=None):
+    """
+    Writes a checkpoint ({"columns": ...}) or a delta ({"base": ..., "removed": ..., "inserted": ...}) to the file
+
+    :param file: a file opened for writing bytes
+    :param snapshot: the body of the checkpoint or delta
+    :param kind: "playlist" or "artist"
+    :param snapshot_id: the snapshot ID of the playlist
+    :param total: the number of items of the snapshot
+    :param content_hash: the hash of the snapshot's columns, see get_content_hash()
+    :type file: typing.BinaryIO
+    :type snapshot: dict
+    :type kind: str
+    :type snapshot_id: str
+    :type total: int
+    :type content_hash: str
+    """
+    # the snapshot ID is the first field, so read_snapshot_id() only needs to decompress the file's beginning
+    content = {} if snapshot_id is None else {"snapshot_id": snapshot_id}
+    if content_hash is not None:
+        content["content_hash"] = content_hash
+    content.update({"version": _FORMAT_VERSION,
+                    "kind": kind,
+                    "total": total if total is not None else len(snapshot["columns"]["uri"])})
+    content.update(snapshot)
+
+    with gzip.GzipFile(fileobj=file, mode="wb", mtime=0) as gzip_file:
+        gzip_file.write(json.dumps(content, separators=(",", ":")).encode("utf-8"))
+
+
+def read_content_file(file_path):
+    """
+    Reads a content file and returns its content in the format of the raw content files:
+    {"snapshot_id": <snapshot_id>, "items": [...], "total": <number of items>}
+
+    The items of a compact snapshot only hold the saved fields:
+        - playlist item: {"added_at": str, "track": {"uri": str, "name": str, "artists": [{"name": str}, ...]}}
+                         "track" is None if the item had no track
+        - album: {"uri": str, "name": str, "artists": [{"name": str}, ...], "album_group": str, "album_type": str,
+                  "release_date": str}
+
+    :param file_path: the path of a content file
+    :type file_path: str or pathlib.Path
+    :return: a dictionary with the fields "items", "total" and, for playlists, "snapshot_id"
+    """
+    with open_content_file(file_path) as file:
+        content = json.load(file)
+
+    # raw content files already have the expected format
+    if "kind" not in content:
+        return content
+
+    # a delta is rebuilt from the nearest checkpoint
+    columns = content["columns"] if "columns" in content else _replay(file_path, content)
+    if content["kind"] == "playlist":
+        items = [{"added_at": added_at,
+                  "track": None if uri is None else {"uri": uri,
+                                                     "name": name,
+                                                     "artists": [{"name": artist} for artist in artists]}}
+                 for uri, name, artists, added_at in zip(*[columns[column] for column in PLAYLIST_COLUMNS])]
+    else:
+        items = [dict(zip(ARTIST_COLUMNS, row)) for row in zip(*[columns[column] for column in ARTIST_COLUMNS])]
+        for item in items:
+            item["artists"] = [{"name": artist} for artist in item["artists"]]
+
+    result = {"items": items, "total": content["total"]}
+    if "snapshot_id" in content:
+        result["snapshot_id"] = content["snapshot_id"]
+
+    return result
+
+
+def read_snapshot_id(file_path):
+    """
+    Reads the snapshot ID of the playlist that was saved together with the content file. Only the beginning of the
+    file is read (and decompressed).
+
+    :param file_path: the path of a content file
+    :type file_path: str or pathlib.Path
+    :return: the snapshot ID or None if the content file has no snapshot ID (i.e. content files of artists and content
+             files saved by older versions of this program)
+    """
+    with open_content_file(file_path) as file:
+        beginning = file.read(_SNAPSHOT_ID_MAX_LENGTH)
+
+    match = _SNAPSHOT_ID_RE.match(beginning)
+    if match:
+        return json.loads(match.group("SNAPSHOT_ID"))
+    else:
+        return None
+
+
+def read_content_hash(file_path, kind):
+    """
+    Reads the content hash of a content file (see get_content_hash()). Only the beginning of the file is read, unless
+    the file was saved without a content hash (i.e. by older versions of this program), then the hash is computed from
+    the file's columns.
+
+    :param file_path: the path of a content file
+    :param kind: "playlist" or "artist", needed for raw content files
+    :type file_path: str or pathlib.Path
+    :type kind: str
+    :return: the content hash
+    """
+    with open_content_file(file_path) as file:
+        beginning = file.read(_CONTENT_HASH_MAX_LENGTH)
+
+    match = _CONTENT_HASH_RE.search(beginning)
+    if match:
+        return match.group("CONTENT_HASH")
+    else:
+        return get_content_hash(_read_columns(file_path, kind))
+
+
+def get_content_hash(columns):
+    """
+    Returns the content hash of a snapshot: the SHA-256 hash of its columns. Two snapshots have the same content hash if
+    they hold the same items in the same order, no matter if they are saved as checkpoint, delta or raw content file.
+
+    :param columns: a dictionary column name -> list of values, as returned by _items_to_columns()
+    :type columns: dict
+    :return: the hash as a hexadecimal string of 64 characters
+    """
+    normalized = json.dumps(columns, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def read_item_uris(file_path):
+    """
+    Reads the URIs of the songs (playlists) or albums (artists) of a content file, in the order they were saved in. The
+    URIs are streamed out of the file, the rest of the content is skipped (compact snapshots) or decoded one item at a
+    time (raw content files), so the content is never held in memory as a whole.
+
+    :param file_path: the path of a content file
+    :type file_path: str or pathlib.Path
+    :return: a list of URIs, an item of a playlist that has no track is None
+    """
+    return _read_columns(file_path, kind=None, column_names=_URI_COLUMN)["uri"]
+
+
+def _read_columns(file_path, kind, column_names=None):
+    """
+    Reads the columns of any content file (checkpoint, delta or raw content file)
+
+    :param file_path: the path of a content file
+    :param kind: "playlist" or "artist", needed for raw content files
+    :param column_names: the columns that are needed, every column if None. Only the URI column (_URI_COLUMN) can be
+                         read without reading the rest of the content
+    :type file_path: str or pathlib.Path
+    :type kind: str
+    :type column_names: tuple[str]
+    :return: a dictionary column name -> list of values
+    """
+    if column_names == _URI_COLUMN and not is_delta_file(file_path):
+        return {"uri": _stream_item_uris(file_path)}
+
+    with open_content_file(file_path) as file:
+        content = json.load(file)
+
+    if "kind" not in content:
+        return _items_to_columns(content["items"], kind)
+    elif "columns" in content:
+        return content["columns"]
+    else:
+        return _replay(file_path, content, column_names)
+
+
+def _stream_item_uris(file_path):
+    """
+    Streams the URIs out of a checkpoint or raw content file, see read_item_uris()
+
+    :param file_path: the path of a checkpoint or raw content file
+    :type file_path: str or pathlib.Path
+    :return: a list of URIs, an item of a playlist that has no track is None
+    """
+    with open_content_file(file_path) as file:
+        if is_snapshot_file(file_path):
+            # the URI column is an array of strings
+            return list(_iter_json_array(file, _URI_COLUMN_RE))
+        else:
+            # items of playlists hold the song as "track" (None if the item has no track), albums are items themselves
+            return [(item["track"] or {}).get("uri") if "track" in item else item["uri"]
+                    for item in _iter_json_array(file, _ITEMS_RE)]
+
+
+def _iter_json_array(file, start_re):
+    """
+    Yields the elements of the first JSON array in the file that starts at the end of a match of start_re. The file is
+    read in chunks, only the chunk holding the current element is kept in memory.
+
+    :param file: a file opened for reading text
+    :param start_re: a regular expression that ends with the "[" that opens the array
+    :type file: typing.TextIO
+    :type start_re: re.Pattern
+    :raise ValueError: the array isn't found or the file ends inside the array
+    :return: a generator yielding the decoded elements
+    """
+    decoder = json.JSONDecoder()
+
+    # find the beginning of the array
+    buffer = ""
+    while True:
+        chunk = file.read(_CHUNK_SIZE)
+        buffer += chunk
+        match = start_re.search(buffer)
+        if match:
+            position = match.end()
+            break
+        if not chunk:
+            raise ValueError("The file holds no array matching " + repr(start_re.pattern))
+        # keep the end of the buffer, the beginning of the array might be split between two chunks
+        buffer = buffer[-_MAX_ARRAY_START_LENGTH:]
+
+    while True:
+        # skip the white space and the comma between two elements
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+
+        if position < len(buffer) and buffer[position] == "]":
+            return
+
+        try:
+            if position == len(buffer):
+                raise json.JSONDecodeError("Unexpected end of chunk", buffer, position)
+            element, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # the element continues in the next chunk (only strings, objects and null are expected, which can't be
+            # decoded before they are complete)
+            chunk = file.read(_CHUNK_SIZE)
+            if not chunk:
+                raise ValueError("The file ends inside of the array")
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+
+        yield element
+
+
+def _replay(file_path, content, column_names=None):
+    """
+    Rebuilds the columns of a delta by replaying every delta since the nearest checkpoint
+
+    :param file_path: the path of the delta
+    :param content: the content of the delta
+    :param column_names: the columns that are rebuilt, every column if None
+    :type file_path: str or pathlib.Path
+    :type content: dict
+    :type column_names: tuple[str]
+    :raise ValueError: a snapshot between the checkpoint and the delta is missing
+    :return: a dictionary column name -> list of values
+    """
+    column_names = column_names or _get_column_names(content["kind"])
+
+    directory, file_name = os.path.split(str(file_path))
+    history = list_content_files(directory)
+    position = history.index(file_name)
+
+    # the nearest checkpoint is the newest file before the delta that isn't a delta
+    checkpoint_position = position - _count_trailing_deltas(history[:position + 1])
+    if checkpoint_position < 0:
+        raise ValueError("There is no checkpoint before the delta " + repr(file_name))
+
+    columns = _read_columns(os.path.join(directory, history[checkpoint_position]), content["kind"], column_names)
+    for n in range(checkpoint_position + 1, position + 1):
+        if n == position:
+            delta = content
+        else:
+            with open_content_file(os.path.join(directory, history[n])) as file:
+                delta = json.load(file)
+
+        if not _is_based_on(delta, history[n - 1]):
+            # an alias of the previous delta is based on the same snapshot, it doesn't change the columns
+            if _is_alias(directory, history[n], history[n - 1]):
+                continue
+            # every delta must be based on the snapshot before it, otherwise a snapshot has been deleted
+            raise ValueError("The delta " + repr(history[n]) + " is based on " + repr(delta["base"]) + ", not on " +
+                             repr(history[n - 1]))
+        columns = _apply_delta(columns, delta, column_names)
+
+    return columns
+
+
+def _iter_history(directory, history, kind):
+    """
+    Rebuilds the snapshots of the history one after another, every delta is applied to the snapshot before it. The
+    history must begin with a checkpoint.
+
+    :param directory: the path of a content file directory
+    :param history: the names of consecutive content files, oldest first
+    :param kind: "playlist" or "artist"
+    :type directory: str
+    :type history: list[str]
+    :type kind: str
+    :raise ValueError: the history doesn't begin with a checkpoint or a snapshot in between is missing
+    :return: a generator yielding tuples (content file name, columns)
+    """
+    columns = None
+    for n, file_name in enumerate(history):
+        file_path = os.path.join(directory, file_name)
+        if not is_delta_file(file_name):
+            columns = _read_columns(file_path, kind)
+        elif n == 0:
+            raise ValueError("There is no checkpoint before the delta " + repr(file_name))
+        else:
+            with open_content_file(file_path) as file:
+                delta = json.load(file)
+
+            if not _is_based_on(delta, history[n - 1]):
+                if not _is_alias(directory, file_name, history[n - 1]):
+                    raise ValueError("The delta " + repr(file_name) + " is based on " + repr(delta["base"]) +
+                                     ", not on " + repr(history[n - 1]))
+            else:
+                columns = _apply_delta(columns, delta, _get_column_names(kind))
+
+        yield file_name, columns
+
+
+def _is_based_on(delta, file_name):
+    """
+    Checks whether the delta is based on the content file. Only the dates are compared, because packing an old snapshot
+    can turn a delta into a checkpoint (see pack_history()), which changes its extension.
+    """
+    return get_date_str(delta["base"]) == get_date_str(file_name)
+
+
+def _is_alias(directory, file_name, previous_file_name):
+    """
+    Checks whether the content file is an alias of the previous one. Files are compared byte by byte, so a hard link
+    that has been turned into a copy (i.e. by a backup) is recognized as well. Packed snapshots are never aliases.
+    """
+    file_path = os.path.join(directory, file_name)
+    previous_file_path = os.path.join(directory, previous_file_name)
+    if not (os.path.exists(file_path) and os.path.exists(previous_file_path)):
+        return False
+
+    return filecmp.cmp(file_path, previous_file_path, shallow=False)
+
+
+def _count_trailing_deltas(history):
+    """
+    Counts the deltas at the end of the sorted list of content files, which is the number of deltas since the newest
+    checkpoint
+
+    :param history: the names of the content files, oldest first
+    :type history: list[str]
+    :return: the number of deltas after the newest checkpoint
+    """
+    n_of_deltas = 0
+    for name in reversed(history):
+        if not is_delta_file(name):
+            break
+        n_of_deltas += 1
+
+    return n_of_deltas
+
+
+def _encode_delta(old_columns, new_columns, kind):
+    """
+    Encodes the changes between two snapshots as the positions of the removed items of the old snapshot and the
+    positions and columns of the inserted items of the new snapshot. A moved item is removed and inserted again.
+
+    :param old_columns: the columns of the previous snapshot
+    :param new_columns: the columns of the new snapshot
+    :param kind: "playlist" or "artist"
+    :type old_columns: dict
+    :type new_columns: dict
+    :type kind: str
+    :return: a dictionary with the fields "removed" and "inserted", see the file's description at the top
+    """
+    column_names = _get_column_names(kind)
+    # every field of an item is compared, so a renamed song is replaced as well
+    snapshot_diff = diff_snapshots(_columns_to_rows(old_columns, column_names),
+                                   _columns_to_rows(new_columns, column_names),
+                                   key=lambda row: row)
+
+    removed = sorted([position for position, _ in snapshot_diff.get_removed()] +
+                     [old_position for old_position, _, _ in snapshot_diff.get_moved()])
+    inserted = sorted([(position, row) for position, row in snapshot_diff.get_added()] +
+                      [(new_position, row) for _, new_position, row in snapshot_diff.get_moved()])
+
+    return {"removed": removed,
+            "inserted": {"positions": [position for position, _ in inserted],
+                         "columns": _rows_to_columns([row for _, row in inserted], column_names)}}
+
+
+def _encode_snapshot(previous_columns, columns, kind):
+    """
+    Encodes a snapshot as a delta to the previous snapshot or, if most of the items have changed, as a checkpoint
+
+    :param previous_columns: the columns of the previous snapshot
+    :param columns: the columns of the snapshot
+    :param kind: "playlist" or "artist"
+    :type previous_columns: dict
+    :type columns: dict
+    :type kind: str
+    :return: the body of a checkpoint ({"columns": ...}) or a delta without its base ({"removed": ..., "inserted": ...})
+    """
+    delta = _encode_delta(previous_columns, columns, kind)
+
+    # if most of the items have changed, a checkpoint is barely bigger
+    if len(delta["removed"]) + len(delta["inserted"]["positions"]) > _MAX_DELTA_RATIO * len(columns["uri"]):
+        return {"columns": columns}
+
+    return delta
+
+
+def _apply_delta(columns, delta, column_names):
+    """
+    Applies a delta to the columns of the previous snapshot
+
+    :param columns: the columns of the previous snapshot
+    :param delta: the content of the delta
+    :param column_names: the columns that are rebuilt
+    :type columns: dict
+    :type delta: dict
+    :type column_names: tuple[str]
+    :return: the columns of the delta's snapshot
+    """
+    removed = set(delta["removed"])
+    kept_rows = iter([row for position, row in enumerate(_columns_to_rows(columns, column_names))
+                      if position not in removed])
+    inserted = dict(zip(delta["inserted"]["positions"],
+                        _columns_to_rows(delta["inserted"]["columns"], column_names)))
+
+    # the kept items keep their order, the inserted items are put in between at their positions
+    rows = [inserted[position] if position in inserted else next(kept_rows) for position in range(delta["total"])]
+    return _rows_to_columns(rows, column_names)
+
+
+def _get_column_names(kind):
+    return PLAYLIST_COLUMNS if kind == "playlist" else ARTIST_COLUMNS
+
+
+def _get_kind_of_directory(directory):
+    """
+    Returns the kind of the snapshots of a content file directory, see get_content_directory_name()
+    """
+    return "playlist" if os.path.basename(os.path.normpath(directory)).startswith("spotify_playlist_") else "artist"
+
+
+def _columns_to_rows(columns, column_names):
+    """
+    Turns the columns into a list of hashable rows (tuples), the list of artist names is turned into a tuple as well
+
+    :param columns: a dictionary column name -> list of values
+    :param column_names: the names of the columns, in the order of the row's values
+    :type columns: dict
+    :type column_names: tuple[str]
+    :return: a list of tuples
+    """
+    return [tuple(tuple(value) if isinstance(value, list) else value for value in row)
+            for row in zip(*[columns[column] for column in column_names])]
+
+
+def _rows_to_columns(rows, column_names):
+    """
+    Turns a list of rows, as returned by _columns_to_rows(), back into columns
+
+    :param rows: a list of tuples
+    :param column_names: the names of the columns, in the order of the row's values
+    :type rows: list[tuple]
+    :type column_names: tuple[str]
+    :return: a dictionary column name -> list of values
+    """
+    columns = {column: [] for column in column_names}
+    for row in rows:
+        for column, value in zip(column_names, row):
+            columns[column].append(list(value) if isinstance(value, tuple) else value)
+
+    return columns
+
+
+def _items_to_columns(items, kind):
+    """
+    Splits the items into columns, see write_snapshot()
+
+    :param items: playlist items or albums
+    :param kind: "playlist" or "artist"
+    :type items: typing.Iterable[dict]
+    :type kind: str
+    :raise ValueError: the kind is neither "playlist" nor "artist"
+    :return: a dictionary column name -> list of values
+    """
+    if kind == "playlist":
+        columns = {column: [] for column in PLAYLIST_COLUMNS}
+        for item in items:
+            track = item["track"]
+            columns["uri"].append(track["uri"] if track is not None else None)
+            columns["name"].append(track["name"] if track is not None else None)
+            columns["artists"].append([artist["name"] for artist in track["artists"]] if track is not None else [])
+            columns["added_at"].append(item.get("added_at"))
+
+    elif kind == "artist":
+        columns = {column: [] for column in ARTIST_COLUMNS}
+        for album in items:
+            for column in ARTIST_COLUMNS:
+                if column == "artists":
+                    columns[column].append([artist["name"] for artist in album["artists"]])
+                else:
+                    columns[column].append(album.get(column))
+
+    else:
+        raise ValueError("The kind of a snapshot must be \"playlist\" or \"artist\", not " + repr(kind))
+
+    return columns
@@ -0,0 +1,468 @@
+import os
+import sqlite3
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+import Snapshot_operations
+
+# the database is saved in the content directory, next to the content file directories
+DATABASE_NAME = "snapshots.sqlite3"
+
+# ---------------------------------------------------- Schema ----------------------------------------------------
+#
+#   directories:  every content file directory that has been indexed, with its modification time at that moment.
+#                 A directory is only listed again when its modification time has changed (a file has been added or
+#                 removed), i.e. by another program or by hand
+#   snapshots:    one row per content file, dates are saved as yyyy.mm.dd like in the file names (they sort like dates)
+#   memberships:  the URIs of the songs / albums of every snapshot, in the order of the snapshot
+#   intervals:    the membership intervals of every song / album: it was part of every snapshot from first_date up to
+#                 (but not including) end_date, end_date is NULL if it is part of the newest snapshot. A song that has
+#                 been removed and added again has several intervals. See History_operations for the queries.
+#
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS directories (
+    directory   TEXT PRIMARY KEY,
+    mtime_ns    INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id          INTEGER PRIMARY KEY,
+    directory   TEXT NOT NULL,
+    date        TEXT NOT NULL,
+    file_name   TEXT NOT NULL UNIQUE,
+    snapshot_id TEXT,
+    total       INTEGER NOT NULL,
+    UNIQUE (directory, date)
+);
+CREATE TABLE IF NOT EXISTS memberships (
+    snapshot    INTEGER NOT NULL REFERENCES snapshots (id) ON DELETE CASCADE,
+    position    INTEGER NOT NULL,
+    item_uri    TEXT NOT NULL,
+    PRIMARY KEY (snapshot, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS intervals (
+    directory   TEXT NOT NULL,
+    item_uri    TEXT NOT NULL,
+    first_date  TEXT NOT NULL,
+    end_date    TEXT,
+    PRIMARY KEY (directory, item_uri, first_date)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS intervals_by_date ON intervals (directory, first_date);
+CREATE INDEX IF NOT EXISTS open_intervals ON intervals (directory, end_date);
+"""
+
+# the version of the schema, saved as the database's user_version. Databases of older versions are upgraded when the
+# store is created: version 1 added the intervals
+_SCHEMA_VERSION = 1
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+
+class SnapshotStore(object):
+    """
+    A snapshot store indexes the content files of every playlist / artist in an SQLite database. The content files
+    stay the source of the saved content, the store answers the questions that used to require listing and reading
+    them:
+        1. which content file holds the content of a URI at a given date (see find_content_file())
+        2. which songs / albums were part of a content file (see get_item_uris())
+        3. what is the snapshot ID of the newest content file of a URI (see get_newest_snapshot_id())
+        4. which songs / albums were part of a URI at a date, have been added in between two dates or when a song /
+           album has been part of a URI (see the queries below get_intervals())
+
+    The dates, names and snapshot IDs of the content files of every directory that has been used are also kept in
+    memory (the manifest), sorted by date. As long as a directory's modification time hasn't changed, a content file is
+    found by a binary search in memory, without querying the database.
+
+    The store is thread safe, every query and change is made while holding a lock.
+    """
+
+    def __init__(self, content_directory_path):
+        """
+        Creates a SnapshotStore object, the database is created if it doesn't exist yet
+
+        :param content_directory_path: the path of the directory holding every content file directory
+        :type content_directory_path: str
+        """
+        self.content_directory_path = content_directory_path
+        os.makedirs(content_directory_path, exist_ok=True)
+
+        self.lock = threading.Lock()
+        # the connection is shared by every thread, the lock makes sure only one thread uses it at a time
+        self.connection = sqlite3.connect(os.path.join(content_directory_path, DATABASE_NAME),
+                                          check_same_thread=False)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        with self.connection:
+            self.connection.executescript(_SCHEMA)
+
+            # the intervals of a database of an older version are built from the memberships
+            if self.connection.execute("PRAGMA user_version").fetchone()[0] < _SCHEMA_VERSION:
+                for (directory,) in self.connection.execute("SELECT DISTINCT directory FROM snapshots").fetchall():
+                    self._rebuild_intervals(directory)
+                self.connection.execute("PRAGMA user_version = " + str(_SCHEMA_VERSION))
+
+        # maps the name of a content file directory to a tuple (mtime_ns, dates, file_names, snapshot_ids), the lists
+        # are sorted by date. mtime_ns is the directory's modification time when the entry was loaded
+        self.manifest = {}
+
+    def find_content_file(self, uri, since_date=None):
+        """
+        When since_date is None:
+            Returns the newest content file of the URI that is not from today.
+
+        When since_date is NOT None:
+            Returns the content file of the URI from the given date. If there is none, the newest content file before
+            the given date is returned, or the oldest content file after it if there is no older content file.
+
+        :param uri: the spotify URI of the playlist / artist
+        :param since_date: a date
+        :type uri: str
+        :type since_date: date or str
+        :return: the path of the content file or None if no content file is found
+        """
+        directory = Snapshot_operations.get_content_directory_name(uri)
+
+        with self.lock:
+            _, dates, file_names, _ = self._get_manifest_entry(directory)
+
+        if since_date is None:
+            # the newest content file before today
+            index = bisect_left(dates, _to_date_str(date.today())) - 1
+        else:
+            # the content file of the date or the newest one before it, otherwise the oldest one after it
+            index = max(bisect_right(dates, _to_date_str(since_date)) - 1, 0)
+
+        if 0 <= index < len(file_names):
+            return os.path.join(self.content_directory_path, directory, file_names[index])
+        else:
+            return None
+
+    def get_item_uris(self, content_file):
+        """
+        Returns the URIs of the songs (playlists) or albums (artists) that are part of the content file, without
+        reading the content file
+
+        :param content_file: the path of a content file
+        :type content_file: str or pathlib.Path
+        :return: a list of URIs in the order of the content file or None if the content file is not indexed
+        """
+        directory = os.path.basename(os.path.dirname(str(content_file)))
+        file_name = os.path.basename(str(content_file))
+
+        with self.lock:
+            if file_name not in self._get_manifest_entry(directory)[2]:
+                return None
+
+            row = self.connection.execute("SELECT id FROM snapshots WHERE file_name = ?", (file_name,)).fetchone()
+
+            return [item_uri for (item_uri,) in self.connection.execute(
+                "SELECT item_uri FROM memberships WHERE snapshot = ? ORDER BY position", row)]
+
+    def get_newest_snapshot_id(self, uri):
+        """
+        Returns the snapshot ID of the newest content file of the URI (today's content file included)
+
+        :param uri: the spotify URI of a playlist
+        :type uri: str
+        :return: the snapshot ID, None if the URI has no content file or the content file has no snapshot ID
+        """
+        directory = Snapshot_operations.get_content_directory_name(uri)
+
+        with self.lock:
+            snapshot_ids = self._get_manifest_entry(directory)[3]
+
+        return snapshot_ids[-1] if snapshot_ids else None
+
+    def add_content_file(self, content_file):
+        """
+        Indexes a content file that has just been saved. Another content file of the same URI and day is replaced.
+
+        :param content_file: the path of the content file
+        :type content_file: str or pathlib.Path
+        """
+        directory = os.path.basename(os.path.dirname(str(content_file)))
+        file_name = os.path.basename(str(content_file))
+
+        with self.lock:
+            # a new file changes the directory and is indexed by the refresh. A file that has been overwritten doesn't
+            # change the directory, so it is indexed again here
+            mtime_ns = self._stat(directory)
+            if file_name not in self._refresh(directory, mtime_ns):
+                with self.connection:
+                    if not self._index_file(directory, file_name):
+                        self._rebuild_intervals(directory)
+
+            # the manifest entry is replaced, even if the directory's modification time hasn't changed
+            self.manifest[directory] = self._load_manifest_entry(directory, mtime_ns)
+
+    def get_intervals(self, uri, item_uri):
+        """
+        Returns the membership intervals of a song / album: the periods it was part of the playlist / artist
+
+        :param uri: the spotify URI of the playlist / artist
+        :param item_uri: the spotify URI of the song / album
+        :type uri: str
+        :type item_uri: str
+        :return: a list of tuples (first_date, end_date), oldest first. The dates are strings of the format yyyy.mm.dd,
+                 first_date is the date of the first snapshot holding the song / album, end_date of the first snapshot
+                 after it that doesn't hold it anymore or None if the newest snapshot holds it
+        """
+        directory = Snapshot_operations.get_content_directory_name(uri)
+
+        with self.lock:
+            self._get_manifest_entry(directory)
+            return self.connection.execute(
+                "SELECT first_date, end_date FROM intervals WHERE directory = ? AND item_uri = ? ORDER BY first_date",
+                (directory, item_uri)).fetchall()
+
+    def get_item_uris_on_date(self, uri, a_date):
+        """
+        Returns the URIs of the songs / albums that were part of the playlist / artist at the date, which are the songs
+        / albums of the newest snapshot saved on or before the date
+
+        :param uri: the spotify URI of the playlist / artist
+        :param a_date: a date
+        :type uri: str
+        :type a_date: date or str
+        :return: a list of URIs in the order of the snapshot, empty if there is no snapshot before the date
+        """
+        directory = Snapshot_operations.get_content_directory_name(uri)
+
+        with self.lock:
+            self._get_manifest_entry(directory)
+            return [item_uri for (item_uri,) in self.connection.execute(
+                "SELECT item_uri FROM memberships WHERE snapshot = "
+                "(SELECT id FROM snapshots WHERE directory = ? AND date <= ? ORDER BY date DESC LIMIT 1) "
+                "ORDER BY position", (directory, _to_date_str(a_date)))]
+
+    def get_item_uris_added_between(self, uri, since_date, until_date):
+        """
+        Returns the URIs of the songs / albums that have been added to the playlist / artist after since_date, up to
+        and including until_date. A song / album that was part of the playlist / artist at since_date hasn't been
+        added, even if it has been removed and added again in between.
+
+        :param uri: the spotify URI of the playlist / artist
+        :param since_date: a date
+        :param until_date: a date
+        :type uri: str
+        :type since_date: date or str
+        :type until_date: date or str
+        :return: a list of tuples (item URI, date it has been added first), in the order they have been added
+        """
+        directory = Snapshot_operations.get_content_directory_name(uri)
+        since_date_str, until_date_str = _to_date_str(since_date), _to_date_str(until_date)
+
+        with self.lock:
+            self._get_manifest_entry(directory)
+            return self.connection.execute(
+                "SELECT item_uri, MIN(first_date) AS added_date FROM intervals "
+                "WHERE directory = ? AND first_date > ? AND first_date <= ? AND item_uri NOT IN ("
+                "    SELECT item_uri FROM intervals WHERE directory = ? AND first_date <= ? "
+                "    AND (end_date IS NULL OR end_date > ?)) "
+                "GROUP BY item_uri ORDER BY added_date, item_uri",
+                (directory, since_date_str, until_date_str, directory, since_date_str, since_date_str)).fetchall()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def _get_manifest_entry(self, directory):
+        """
+        Returns the manifest entry of the content file directory. The entry is loaded again if the directory has changed
+        since it was loaded. Must be called while holding the lock.
+
+        :param directory: the name of the content file directory
+        :type directory: str
+        :return: a tuple (mtime_ns, dates, file_names, snapshot_ids), the lists are sorted by date
+        """
+        mtime_ns = self._stat(directory)
+        entry = self.manifest.get(directory)
+        if entry is None or entry[0] != mtime_ns:
+            self._refresh(directory, mtime_ns)
+            entry = self._load_manifest_entry(directory, mtime_ns)
+            self.manifest[directory] = entry
+
+        return entry
+
+    def _load_manifest_entry(self, directory, mtime_ns):
+        """
+        Loads the manifest entry of the content file directory from the database. Must be called while holding the lock.
+
+        :param directory: the name of the content file directory
+        :param mtime_ns: the directory's modification time, as returned by _stat()
+        :type directory: str
+        :type mtime_ns: int
+        :return: a tuple (mtime_ns, dates, file_names, snapshot_ids), the lists are sorted by date
+        """
+        rows = self.connection.execute(
+            "SELECT date, file_name, snapshot_id FROM snapshots WHERE directory = ? ORDER BY date",
+            (directory,)).fetchall()
+        dates, file_names, snapshot_ids = (list(column) for column in zip(*rows)) if rows else ([], [], [])
+
+        return mtime_ns, dates, file_names, snapshot_ids
+
+    def _stat(self, directory):
+        """
+        Returns the modification time of the content file directory in nanoseconds or None if it doesn't exist
+        """
+        try:
+            return os.stat(os.path.join(self.content_directory_path, directory)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _refresh(self, directory, mtime_ns):
+        """
+        Indexes the content file directory again if it has changed since it has been indexed the last time, only the
+        added and removed content files are read / removed from the index. Must be called while holding the lock.
+
+        :param directory: the name of the content file directory
+        :param mtime_ns: the directory's modification time, as returned by _stat(). The directory must be stat-ed before
+                         it is listed, so a change made while listing it is noticed by the next refresh
+        :type directory: str
+        :type mtime_ns: int
+        :return: the names of the content files that have been indexed
+        """
+        directory_path = os.path.join(self.content_directory_path, directory)
+
+        row = self.connection.execute("SELECT mtime_ns FROM directories WHERE directory = ?", (directory,)).fetchone()
+        if row is not None and row[0] == mtime_ns:
+            return set()
+
+        with self.connection:
+            # packed snapshots are listed as well, see Snapshot_operations.list_content_files()
+            file_names = set() if mtime_ns is None else {
+                name for name in Snapshot_operations.list_content_files(directory_path)
+                if Snapshot_operations.get_date_str(name) is not None}
+            indexed_file_names = {name for (name,) in self.connection.execute(
+                "SELECT file_name FROM snapshots WHERE directory = ?", (directory,))}
+
+            removed_file_names = indexed_file_names - file_names
+            for name in removed_file_names:
+                self.connection.execute("DELETE FROM snapshots WHERE file_name = ?", (name,))
+
+            # oldest first, a delta can only be read once the snapshots before it are in place
+            new_file_names = file_names - indexed_file_names
+            are_intervals_updated = not removed_file_names
+            for name in sorted(new_file_names):
+                are_intervals_updated = self._index_file(directory, name) and are_intervals_updated
+
+            if not are_intervals_updated:
+                self._rebuild_intervals(directory)
+
+            if mtime_ns is None:
+                self.connection.execute("DELETE FROM directories WHERE directory = ?", (directory,))
+            else:
+                self._save_mtime(directory, mtime_ns)
+
+        return new_file_names
+
+    def _index_file(self, directory, file_name):
+        """
+        Reads the content file and saves it with its songs / albums in the database. The intervals are only updated if
+        the content file is newer than every other content file of the directory, otherwise they must be rebuilt (see
+        _rebuild_intervals()). Must be called while holding the lock and inside a transaction.
+
+        :param directory: the name of the content file directory
+        :param file_name: the name of the content file
+        :type directory: str
+        :type file_name: str
+        :return: True if the intervals have been updated
+        """
+        file_path = os.path.join(self.content_directory_path, directory, file_name)
+        date_str = Snapshot_operations.get_date_str(file_name)
+
+        newest_date_str = self.connection.execute(
+            "SELECT MAX(date) FROM snapshots WHERE directory = ?", (directory,)).fetchone()[0]
+        is_newest = newest_date_str is None or date_str > newest_date_str
+
+        self.connection.execute("DELETE FROM snapshots WHERE directory = ? AND date = ?", (directory, date_str))
+
+        # an alias (see Snapshot_operations) is a hard link to the previous content file, its songs / albums are copied
+        # from the previous snapshot instead of reading the file again
+        previous = self.connection.execute(
+            "SELECT id, file_name, snapshot_id, total FROM snapshots WHERE directory = ? AND date < ? "
+            "ORDER BY date DESC LIMIT 1", (directory, date_str)).fetchone()
+        if previous is not None and _is_same_file(os.path.join(self.content_directory_path, directory, previous[1]),
+                                                  file_path):
+            snapshot = self.connection.execute(
+                "INSERT INTO snapshots (directory, date, file_name, snapshot_id, total) VALUES (?, ?, ?, ?, ?)",
+                (directory, date_str, file_name, previous[2], previous[3])).lastrowid
+            self.connection.execute(
+                "INSERT INTO memberships (snapshot, position, item_uri) "
+                "SELECT ?, position, item_uri FROM memberships WHERE snapshot = ?", (snapshot, previous[0]))
+
+        else:
+            # only the URIs are read from the content file, the rest of the content isn't needed
+            item_uris = Snapshot_operations.read_item_uris(file_path)
+            snapshot = self.connection.execute(
+                "INSERT INTO snapshots (directory, date, file_name, snapshot_id, total) VALUES (?, ?, ?, ?, ?)",
+                (directory, date_str, file_name, Snapshot_operations.read_snapshot_id(file_path),
+                 len(item_uris))).lastrowid
+
+            self.connection.executemany(
+                "INSERT INTO memberships (snapshot, position, item_uri) VALUES (?, ?, ?)",
+                [(snapshot, position, item_uri) for position, item_uri in enumerate(item_uris) if item_uri is not None])
+
+        if is_newest:
+            self._extend_intervals(directory, snapshot, date_str)
+        return is_newest
+
+    def _extend_intervals(self, directory, snapshot, date_str):
+        """
+        Updates the intervals of the directory with its newest snapshot: the intervals of the songs / albums that are
+        no longer part of it end at the snapshot's date, the songs / albums that have been added start a new interval.
+        Must be called while holding the lock and inside a transaction.
+
+        :param directory: the name of the content file directory
+        :param snapshot: the ID of the snapshot in the database
+        :param date_str: the date of the snapshot, format: yyyy.mm.dd
+        :type directory: str
+        :type snapshot: int
+        :type date_str: str
+        """
+        self.connection.execute(
+            "UPDATE intervals SET end_date = ? WHERE directory = ? AND end_date IS NULL "
+            "AND item_uri NOT IN (SELECT item_uri FROM memberships WHERE snapshot = ?)",
+            (date_str, directory, snapshot))
+        self.connection.execute(
+            "INSERT INTO intervals (directory, item_uri, first_date) "
+            "SELECT DISTINCT ?, item_uri, ? FROM memberships WHERE snapshot = ? "
+            "AND item_uri NOT IN (SELECT item_uri FROM intervals WHERE directory = ? AND end_date IS NULL)",
+            (directory, date_str, snapshot, directory))
+
+    def _rebuild_intervals(self, directory):
+        """
+        Builds the intervals of the directory from scratch, i.e. after a snapshot in the middle of its history has been
+        added or removed. Must be called while holding the lock and inside a transaction.
+
+        :param directory: the name of the content file directory
+        :type directory: str
+        """
+        self.connection.execute("DELETE FROM intervals WHERE directory = ?", (directory,))
+        for snapshot, date_str in self.connection.execute(
+                "SELECT id, date FROM snapshots WHERE directory = ? ORDER BY date", (directory,)).fetchall():
+            self._extend_intervals(directory, snapshot, date_str)
+
+    def _save_mtime(self, directory, mtime_ns):
+        self.connection.execute("INSERT OR REPLACE INTO directories (directory, mtime_ns) VALUES (?, ?)",
+                                (directory, mtime_ns))
+
+
+def _is_same_file(file_path, other_file_path):
+    """
+    Checks whether both paths are links to the same file, packed snapshots are no links (and not found on their path)
+    """
+    try:
+        return os.path.samefile(file_path, other_file_path)
+    except FileNotFoundError:
+        return False
+
+
+def _to_date_str(a_date):
+    """
+    Converts a date (or a string of the format yyyy-mm-dd) to the date format of the content files: yyyy.mm.dd
+
+    :param a_date: a date
+    :type a_date: date or str
+    :return: the date as a string of the format yyyy.mm.dd
+    """
+    return str(a_date)[:10].replace("-", ".")
@@ -1,6 +1,8 @@
+import collections
+import functools
 import re
 
-import IO_operations
+import Config_operations
 
 # ------------------------------------------------ Regular Expressions ------------------------------------------------
 #
@@ -18,6 +20,202 @@ import IO_operations
 #         https://open.spotify.com/<type>/<id>?si=<some_parameter_id>
 _LINK_RE = "https:\/\/open\.spotify\.com\/(?P<type>(?:playlist)|(?:artist)|(?:track)|(?:episode))\/(?P<id>\S*)\?\S*"
 
+# a reference is a URI or a link to a playlist / artist / ..., as pasted into a text or CSV file (see Import_operations)
+#         spotify:<kind>:<id>
+#         spotify:user:<user_id>:<kind>:<id>                                  (older playlist URIs)
+#         https://open.spotify.com/<kind>/<id>?si=<some_parameter_id>
+#         open.spotify.com/intl-<language>/<kind>/<id>                        (the scheme and parameters are optional)
+# the RE has the named groups 'kind' and 'id', the ID must have 22 digits in base 62 (see URI Codec below)
+REFERENCE_RE = r"(?:spotify:(?:user:[^:\s]+:)?" \
+               r"|(?:https?://)?open\.spotify\.com/(?:intl-[\w-]+/)?(?:user/[^/\s]+/)?)" \
+               r"(?P<kind>[a-z]+)[:/](?P<id>[0-9a-zA-Z]{22})(?:[?#]\S*)?"
+
+# the patterns are compiled once, instead of every time a string is checked
+_LINK_PATTERN = re.compile(_LINK_RE)
+_REFERENCE_PATTERN = re.compile(r"\s*" + REFERENCE_RE + r"\s*")
+_PLAYLIST_URI_PATTERN = re.compile(Config_operations.URI_PLAYLIST_RE)
+_ARTIST_URI_PATTERN = re.compile(Config_operations.URI_ARTIST_RE)
+
+# ---------------------------------------------------- URI Codec ----------------------------------------------------
+#
+# A URI has the format spotify:<kind>:<id>, where the ID is a number with 22 digits in base 62 (0-9, a-z, A-Z). Spotify
+# IDs are 128 bit numbers, so an ID can be stored as an int instead of a string of 22 characters. An int of 128 bit
+# takes less memory than the string and hashes faster, i.e. in a set of millions of track IDs. See id_to_int() and
+# int_to_id() for a single ID, parse_uri() for a URI of any kind and uris_to_ints() / ints_to_uris() for lists of URIs
+# of the same kind.
+#
+# The ID is converted two digits at a time, from the 62 * 62 = 3844 pairs of digits.
+#
+_BASE62_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_BASE62_PAIRS = [first + second for first in _BASE62_DIGITS for second in _BASE62_DIGITS]
+_BASE62_PAIR_VALUES = {pair: value for value, pair in enumerate(_BASE62_PAIRS)}
+
+# the number of digits of a spotify ID, 22 digits in base 62 can hold numbers of up to 131 bit
+ID_LENGTH = 22
+_PAIR_POSITIONS = tuple(range(0, ID_LENGTH, 2))
+# every spotify ID is less than this number (128 bit)
+_ID_LIMIT = 2 ** 128
+
+# the number of parsed URIs that are cached, see parse_uri() and _split_uri()
+PARSE_CACHE_SIZE = 65536
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+
+class SpotifyUri(collections.namedtuple("SpotifyUri", ["kind", "id"])):
+    """
+    A spotify URI as a typed value, see parse_uri():
+        1. the kind: "track", "playlist", "artist", "album", ...
+        2. the ID as an int (at most 128 bit), see id_to_int()
+
+    Two SpotifyUri objects are equal if their kind and ID are equal, they can be used in sets and as dictionary keys.
+    """
+    __slots__ = ()
+
+    def get_kind(self): return self.kind
+
+    def get_id(self): return self.id
+
+    def to_uri(self):
+        """
+        Returns the URI as a string, i.e. spotify:track:6rqhFgbbKwnb9MLmUQDhG6
+        """
+        return "spotify:" + self.kind + ":" + int_to_id(self.id)
+
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_uri(uri):
+    """
+    Parses a URI into its kind and its ID as an int. The most recently parsed URIs are cached, so a URI that is parsed
+    again (i.e. the URI of a playlist every time it is checked) is only looked up.
+
+    :param uri: a spotify URI, i.e. spotify:track:6rqhFgbbKwnb9MLmUQDhG6
+    :type uri: str
+    :raise ValueError: the string is not a URI or its ID is not a spotify ID, see id_to_int()
+    :return: a SpotifyUri
+    """
+    scheme, _, rest = uri.partition(":")
+    kind, _, spotify_id = rest.partition(":")
+    if scheme != "spotify" or not kind:
+        raise ValueError("Not a spotify URI: " + uri)
+
+    return SpotifyUri(kind, id_to_int(spotify_id))
+
+
+def id_to_int(spotify_id):
+    """
+    Converts a spotify ID from base 62 into an int
+
+    :param spotify_id: an ID with 22 digits in base 62, i.e. 6rqhFgbbKwnb9MLmUQDhG6
+    :type spotify_id: str
+    :raise ValueError: the ID doesn't have 22 digits in base 62 or it is too big to be a spotify ID (128 bit)
+    :return: the ID as an int
+    """
+    if len(spotify_id) != ID_LENGTH:
+        raise ValueError("Not a spotify ID: " + spotify_id)
+
+    value = 0
+    try:
+        for position in _PAIR_POSITIONS:
+            value = value * 3844 + _BASE62_PAIR_VALUES[spotify_id[position:position + 2]]
+    except KeyError:
+        # a digit is not part of base 62
+        raise ValueError("Not a spotify ID: " + spotify_id) from None
+
+    if value >= _ID_LIMIT:
+        raise ValueError("Not a spotify ID: " + spotify_id)
+
+    return value
+
+
+def int_to_id(value):
+    """
+    Converts an ID that has been converted by id_to_int() back into base 62
+
+    :param value: the ID as an int
+    :type value: int
+    :raise ValueError: the int is negative or too big to be a spotify ID (128 bit)
+    :return: the ID with 22 digits in base 62, i.e. 6rqhFgbbKwnb9MLmUQDhG6
+    """
+    if not 0 <= value < _ID_LIMIT:
+        raise ValueError("Not a spotify ID: " + str(value))
+
+    pairs = []
+    for _ in range(ID_LENGTH // 2):
+        value, pair_value = divmod(value, 3844)
+        pairs.append(_BASE62_PAIRS[pair_value])
+
+    return "".join(reversed(pairs))
+
+
+def uri_to_int(uri, kind):
+    """
+    Converts a URI of the kind into its ID as an int, see id_to_int(). Unlike parse_uri(), the URI isn't cached and a
+    string that is not a URI of the kind (i.e. the URI of a local file or of a podcast episode in a playlist of songs)
+    is returned as it is. An int is never equal to a string, so the result can be used as key of a song either way.
+
+    :param uri: a spotify URI, i.e. spotify:track:6rqhFgbbKwnb9MLmUQDhG6
+    :param kind: the kind of URI that is converted, i.e. "track"
+    :type uri: str
+    :type kind: str
+    :return: the ID as an int or the URI if it is not a URI of the kind
+    """
+    return _uri_to_int(uri, "spotify:" + kind + ":")
+
+
+def uris_to_ints(uris, kind):
+    """
+    Converts a list of URIs of the kind at once, see uri_to_int(). The URIs are not cached, so converting a whole
+    playlist doesn't push the URIs that are parsed again and again out of the cache of parse_uri().
+
+    :param uris: the URIs, i.e. the songs of a playlist
+    :param kind: the kind of URI that is converted, i.e. "track"
+    :type uris: typing.Iterable[str]
+    :type kind: str
+    :return: a list, the n-th element being the ID of the n-th URI as int or the URI if it is not a URI of the kind
+    """
+    prefix = "spotify:" + kind + ":"
+    return [_uri_to_int(uri, prefix) for uri in uris]
+
+
+def ints_to_uris(ints, kind):
+    """
+    Converts a list of IDs that have been converted by uris_to_ints() back into URIs of the kind
+
+    :param ints: the IDs as ints, an element that is a string (a URI that was not of the kind) is kept as it is
+    :param kind: the kind of every URI, i.e. "track"
+    :type ints: typing.Iterable[int | str]
+    :type kind: str
+    :raise ValueError: an int is negative or too big to be a spotify ID, see int_to_id()
+    :return: a list of URIs
+    """
+    prefix = "spotify:" + kind + ":"
+    return [prefix + int_to_id(value) if isinstance(value, int) else value for value in ints]
+
+
+def _uri_to_int(uri, prefix):
+    """
+    Converts a URI that starts with the prefix spotify:<kind>: into its ID as an int, see uri_to_int()
+    """
+    if uri.startswith(prefix):
+        try:
+            return id_to_int(uri[len(prefix):])
+        except ValueError:
+            # i.e. spotify:track:<a shorter or longer ID>
+            pass
+
+    return uri
+
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _split_uri(uri):
+    """
+    Splits a URI into its kind and its ID, i.e. ("playlist", "37xk3QZF1DX36edUJpD76c"). Unlike parse_uri(), the ID
+    isn't checked.
+    """
+    kind, _, spotify_id = uri.partition(":")[2].partition(":")
+    return kind, spotify_id
+
 
 def get_playlist_id_from_uri(uri):
     """
@@ -30,11 +228,11 @@ def get_playlist_id_from_uri(uri):
     :raise ValueError: URI is not a playlist URI
     :return: the ID of the playlist
     """
-    temp = uri.partition(":")[2]
-    if temp.partition(":")[0] != "playlist":
-        raise ValueError("URI is not not a playlist URI! URI type: " + temp.partition(":")[0])
+    kind, spotify_id = _split_uri(uri)
+    if kind != "playlist":
+        raise ValueError("URI is not not a playlist URI! URI type: " + kind)
 
-    return temp.partition(":")[2]
+    return spotify_id
 
 
 def get_artist_id_from_uri(uri):
@@ -48,11 +246,11 @@ def get_artist_id_from_uri(uri):
     :raise ValueError: URI is not a artist URI
     :return: the ID of the playlist
     """
-    temp = uri.partition(":")[2]
-    if temp.partition(":")[0] != "artist":
-        raise ValueError("URI is not not an artist URI! URI type: " + temp.partition(":")[0])
+    kind, spotify_id = _split_uri(uri)
+    if kind != "artist":
+        raise ValueError("URI is not not an artist URI! URI type: " + kind)
 
-    return temp.partition(":")[2]
+    return spotify_id
 
 
 def get_song_id_from_uri(uri):
@@ -66,11 +264,11 @@ def get_song_id_from_uri(uri):
     :raise ValueError: URI is not a artist URI
     :return: the ID of the playlist
     """
-    temp = uri.partition(":")[2]
-    if temp.partition(":")[0] != "track":
-        raise ValueError("URI is not not a song URI! URI type: " + temp.partition(":")[0])
+    kind, spotify_id = _split_uri(uri)
+    if kind != "track":
+        raise ValueError("URI is not not a song URI! URI type: " + kind)
 
-    return temp.partition(":")[2]
+    return spotify_id
 
 
 def is_playlist_uri(given_string):
@@ -86,14 +284,8 @@ def is_playlist_uri(given_string):
     :type given_string: str
     :return: True when the given string is a Spotify playlist URI, False when not
     """
-    uri_playlist_re = IO_operations.get_playlist_re()
-
-    # if there is a match and the match is the whole original string, the match is correct
-    match = re.match(uri_playlist_re, given_string)
-    if match and match.group(0) == given_string:
-        return True
-    else:
-        return False
+    # the match must be the whole original string
+    return _PLAYLIST_URI_PATTERN.fullmatch(given_string) is not None
 
 
 def is_artist_uri(given_string):
@@ -109,14 +301,8 @@ def is_artist_uri(given_string):
     :type given_string: str
     :return: True when the given string is a Spotify artist URI, False when not
     """
-    uri_artist_re = IO_operations.get_artist_re()
-
-    # if there is a match and the match is the whole original string, the match is correct
-    match = re.match(uri_artist_re, given_string)
-    if match and match.group(0) == given_string:
-        return True
-    else:
-        return False
+    # the match must be the whole original string
+    return _ARTIST_URI_PATTERN.fullmatch(given_string) is not None
 
 
 def is_link(given_link):
@@ -131,12 +317,8 @@ def is_link(given_link):
     :type given_link: str
     :return: True when the given link is a link to one of the above specified entities (playlist / ...), False when not
     """
-    # if there is a match and the match is the whole original string, the match is correct
-    match = re.match(_LINK_RE, given_link)
-    if match and match.group(0) == given_link:
-        return True
-    else:
-        return False
+    # the match must be the whole original string
+    return _LINK_PATTERN.fullmatch(given_link) is not None
 
 
 def transform_link_to_uri(given_link):
@@ -155,8 +337,8 @@ def transform_link_to_uri(given_link):
     :return: the uri of the playlist or artist the link refers to
     """
     # if there is a match and the match is the whole original string, the match is correct
-    match = re.match(_LINK_RE, given_link)
-    if match and match.group(0) == given_link:
+    match = _LINK_PATTERN.fullmatch(given_link)
+    if match:
         # transform the link to an uri
         # uri format: spotify:<type>:<id>
         uri = "spotify:" + match.group('type') + ":" + match.group('id')
@@ -164,3 +346,36 @@ def transform_link_to_uri(given_link):
 
     else:
         return None
+
+
+def normalize_reference(given_string):
+    """
+    Converts a URI or a link to a playlist / artist / ..., with or without surrounding whitespace, into a regular
+    spotify URI. See REFERENCE_RE for the accepted formats, i.e. both
+        https://open.spotify.com/playlist/37i9dQZF1DX36edUJpD76c?si=1a2b3c
+        spotify:playlist:37i9dQZF1DX36edUJpD76c
+    are normalized to spotify:playlist:37i9dQZF1DX36edUJpD76c
+
+    :param given_string: the URI or link
+    :type given_string: str
+    :return: the URI or None if the string is not a valid URI or link
+    """
+    match = _REFERENCE_PATTERN.fullmatch(given_string)
+    if match is None:
+        return None
+
+    return "spotify:" + match.group("kind") + ":" + match.group("id")
+
+
+def normalize_references(given_strings):
+    """
+    Normalizes a list of URIs and links at once, see normalize_reference()
+
+    :param given_strings: the URIs and links, i.e. the lines of an import file
+    :type given_strings: typing.Iterable[str]
+    :return: a list, the n-th element being the URI of the n-th string or None if it is not a valid URI or link
+    """
+    # the bound method is looked up once instead of once per string
+    fullmatch = _REFERENCE_PATTERN.fullmatch
+    return ["spotify:" + match.group("kind") + ":" + match.group("id") if match is not None else None
+            for match in map(fullmatch, given_strings)]
@@ -0,0 +1,172 @@
+import os
+import queue
+import threading
+
+import Lock_operations
+import Snapshot_operations
+
+# the maximum number of snapshots that are committed together, see SnapshotWriter
+MAX_BATCH_SIZE = 32
+
+
+class SnapshotWriter(object):
+    """
+    A snapshot writer saves snapshots on a background thread (write-behind), so whoever fetched the content of a
+    playlist / artist can go on right away instead of waiting for the hard drive.
+
+    Snapshots are taken from a queue in batches. Every snapshot of a batch is written to a temporary file, then the
+    whole batch is committed at once (see Snapshot_operations.commit_snapshots()): the files are flushed to the hard
+    drive and renamed to their content files, and every directory is flushed a single time. A crash therefore never
+    leaves a truncated content file behind, at worst the snapshots that have not been committed yet are lost.
+    """
+
+    def __init__(self, on_saved=None):
+        """
+        Creates a SnapshotWriter object, the background thread is started when the first snapshot is saved
+
+        :param on_saved: a function that is called with the path of every saved content file, i.e. to index it
+        :type on_saved: typing.Callable
+        """
+        self.on_saved = on_saved
+
+        # tuples (file_path, items, kind, snapshot_id), None tells the background thread to stop
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        # the first error of the background thread, it is raised by flush()
+        self.error = None
+
+    def save(self, file_path, items, kind, snapshot_id=None):
+        """
+        Queues the items to be saved as the newest snapshot of the URI, see Snapshot_operations.save_snapshot(). Returns
+        right away, the snapshot is saved by the background thread.
+
+        :param file_path: the path of today's checkpoint
+        :param items: the items of a playlist or the albums of an artist, they must not be changed after they are queued
+        :param kind: "playlist" or "artist"
+        :param snapshot_id: the snapshot ID of the playlist
+        :type file_path: str
+        :type items: list[dict]
+        :type kind: str
+        :type snapshot_id: str
+        """
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+        self.queue.put((file_path, items, kind, snapshot_id))
+
+    def flush(self):
+        """
+        Waits until every queued snapshot has been saved
+
+        :raise Exception: the first error that occurred while saving a snapshot
+        """
+        self.queue.join()
+
+        with self.lock:
+            error, self.error = self.error, None
+        if error is not None:
+            raise error
+
+    def close(self):
+        """
+        Saves every queued snapshot and stops the background thread
+        """
+        with self.lock:
+            thread, self.thread = self.thread, None
+
+        if thread is not None:
+            self.queue.put(None)
+            thread.join()
+
+    def _run(self):
+        while True:
+            jobs = [self.queue.get()]
+            # every snapshot that is queued by now is committed together with the first one
+            while len(jobs) < MAX_BATCH_SIZE:
+                try:
+                    jobs.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self._save_batch([job for job in jobs if job is not None])
+            finally:
+                for _ in jobs:
+                    self.queue.task_done()
+
+            if None in jobs:
+                return
+
+    def _save_batch(self, jobs):
+        """
+        Stages and commits the snapshots. A snapshot of a URI that is already staged is only staged once the batch so
+        far has been committed, because a delta is based on the committed content files.
+
+        The content file directory of every staged snapshot is locked until the snapshot has been committed (see
+        Lock_operations). If another process holds the lock of a directory, the batch so far is committed before
+        waiting for it, so the writer never waits while holding a lock, which could end in a deadlock with another
+        writer.
+
+        :param jobs: tuples (file_path, items, kind, snapshot_id)
+        :type jobs: list[tuple]
+        """
+        staged_snapshots = []
+        # content file directory -> its FileLock, for every directory of the staged snapshots
+        locks = {}
+        try:
+            for file_path, items, kind, snapshot_id in jobs:
+                directory = os.path.dirname(file_path)
+                if directory in locks:
+                    self._commit(staged_snapshots, locks)
+                    staged_snapshots = []
+
+                try:
+                    lock = Lock_operations.FileLock(Lock_operations.get_directory_lock_path(directory))
+                    if not lock.acquire(blocking=False):
+                        self._commit(staged_snapshots, locks)
+                        staged_snapshots = []
+                        lock.acquire()
+                except Exception as error:
+                    self._set_error(error)
+                    continue
+                locks[directory] = lock
+
+                try:
+                    staged_snapshots.append(Snapshot_operations.stage_snapshot(file_path, items, kind, snapshot_id))
+                except Exception as error:
+                    self._set_error(error)
+
+            self._commit(staged_snapshots, locks)
+        finally:
+            # the directories are only left locked if committing the batch has failed unexpectedly
+            for lock in locks.values():
+                lock.release()
+
+    def _commit(self, staged_snapshots, locks):
+        """
+        Commits the staged snapshots and releases the locks of their directories
+        """
+        try:
+            Snapshot_operations.commit_snapshots(staged_snapshots)
+        except Exception as error:
+            self._set_error(error)
+            return
+        finally:
+            for lock in locks.values():
+                lock.release()
+            locks.clear()
+
+        for _, saved_file_path in staged_snapshots:
+            if self.on_saved is not None:
+                try:
+                    self.on_saved(saved_file_path)
+                except Exception as error:
+                    self._set_error(error)
+
+    def _set_error(self, error):
+        with self.lock:
+            if self.error is None:
+                self.error = error
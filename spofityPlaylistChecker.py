@@ -1,10 +1,14 @@
+import json
 import sys
 
-import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials, SpotifyOAuth
 
+import Async_operations
+import Diff_operations
 import Playlist_operations
-from IO_operations import read_groups_from_file
+import Request_operations
+import Run_operations
+from IO_operations import compact_content_files, find_malformed_groups, read_groups_from_file
 from IO_operations import save_uri_content_to_hard_drive
 from URI_operations import get_playlist_id_from_uri
 
@@ -23,40 +27,53 @@ if len(sys.argv) > 1:
             flag_authorization_code_flow = True
 
 
-# TODO: currently only the first group can be read with this script
-group = read_groups_from_file()[0]
-RELEASE_RADAR = group.get_target_playlist()
+# every group is checked, a playlist that is listed more than once (in one or more groups) is only fetched once
+groups = read_groups_from_file()
+run_plan = Run_operations.RunPlan(groups, include_artists=False)
+
+# groups that don't have the format of a group are skipped
+for line_number, line in find_malformed_groups():
+    print("skipping malformed group in line " + str(line_number) + ": " + line)
 
 if flag_authorization_code_flow:
     scope = "playlist-modify-private, user-follow-modify"  # to add more just add them separated by a comma
-    sp = spotipy.Spotify(auth_manager=SpotifyOAuth(scope=scope, redirect_uri=REDIRECT_URI))
-
-    new_tracks = []
-    no_duplicates = []
-    for playlist_data in group.get_playlist_tuples():
-        name = playlist_data[0]
-        uri = playlist_data[1]
-
-        new_tracks = new_tracks + Playlist_operations.get_new_songs_in_playlist(sp, uri)
-
-        # remove duplicates using list comprehension
-        no_duplicates = [s for n, s in enumerate(new_tracks) if s not in new_tracks[:n]]
-
-    if no_duplicates:
-        print("emptying playlist")
-        Playlist_operations.remove_all_songs_from_playlist(sp, RELEASE_RADAR)
-        print("adding songs")
-        Playlist_operations.add_songs_to_playlist(sp, RELEASE_RADAR, no_duplicates)
-    else:
-        print("no new songs")
+    auth_manager = SpotifyOAuth(scope=scope, redirect_uri=REDIRECT_URI)
+    sp = Request_operations.create_scheduled_spotify(auth_manager=auth_manager)
+
+    # every playlist is fetched at the same time on one event loop. playlist_data is a tuple (name, URI),
+    # new_tracks_lists[n] holds a list per playlist of the n-th group, holding the new tracks of that playlist
+    asp = Async_operations.AsyncSpotify(auth_manager=auth_manager)
+    new_tracks_lists = Run_operations.run_groups_async(
+        asp,
+        groups=groups,
+        fetch=lambda playlist_data: Playlist_operations.get_new_songs_in_playlist_async(asp, playlist_data[1]),
+        include_artists=False)
+
+    for group, group_new_tracks_lists in zip(groups, new_tracks_lists):
+        print("############ " + group.get_group_name() + " ############")
+        # merge the new tracks of every playlist of the group, a track that is new in several playlists is added once
+        no_duplicates = Diff_operations.merge_unique(group_new_tracks_lists)
+
+        if no_duplicates:
+            print("emptying playlist")
+            Playlist_operations.remove_all_songs_from_playlist(sp, group.get_target_playlist())
+            print("adding songs")
+            Playlist_operations.add_songs_to_playlist(sp, group.get_target_playlist(), no_duplicates)
+        else:
+            print("no new songs")
     print("done")
 
 else:
-    sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials())
-
-    # playlist_data is a tuple (name, URI)
-    for playlist_data in group.get_playlist_tuples():
-        name = playlist_data[0]
+    auth_manager = SpotifyClientCredentials()
+    # the playlists are read through the asyncio based client, its synchronous facade takes the place of spotipy
+    sp = Async_operations.SyncSpotify(
+        Async_operations.AsyncSpotify(auth_manager=auth_manager),
+        fallback_sp=Request_operations.create_scheduled_spotify(auth_manager=auth_manager))
+
+    # playlist_data is a tuple (name, URI), every playlist is checked once, no matter how often it is listed
+    for playlist_data in run_plan.get_sources():
+        # show every name the playlist is listed under
+        name = "' / '".join(dict.fromkeys(reference[1] for reference in run_plan.get_references(playlist_data[1])))
         uri = playlist_data[1]
         playlist_id = get_playlist_id_from_uri(uri)
 
@@ -69,3 +86,10 @@ else:
         if flag_save_content_to_file:
             print("############ Saving Content of " + name + " To Hard Drive ############")
             save_uri_content_to_hard_drive(sp, uri)
+
+    # old content files are packed / removed according to the retention policy set in settings.json
+    if flag_save_content_to_file:
+        with open("settings.json", "r") as settings_file:
+            compact_content_files(json.load(settings_file))
+
+    sp.close()
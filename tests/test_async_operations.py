@@ -0,0 +1,180 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import spotipy
+
+import Async_operations
+import Request_operations
+
+# the number of seconds the local server asks the client to wait after a 429 response
+RETRY_AFTER_SECONDS = 1
+
+
+class _SpotifyStandIn(BaseHTTPRequestHandler):
+    """
+    A local stand-in for the Spotify Web API. It answers:
+        /v1/playlists/paged/tracks      a playlist with three items on two pages, the second page is sent chunked
+        /v1/playlists/limited           a 429 response with a "Retry-After" header, then the playlist
+        /v1/playlists/plain             the playlist
+        /v1/playlists/missing           a 404 response in Spotify's error format
+    """
+
+    # HTTP/1.1, so connections are kept open and chunked bodies can be sent
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get("Authorization")))
+        path, _, query = self.path.partition("?")
+        offset = int(urllib.parse.parse_qs(query).get("offset", ["0"])[0])
+
+        if path == "/v1/playlists/paged/tracks" and offset == 0:
+            self._send_json(200, {"items": [{"track": {"uri": "spotify:track:1"}},
+                                            {"track": {"uri": "spotify:track:2"}}],
+                                  "next": self.server.url + "playlists/paged/tracks?offset=2&limit=2"})
+        elif path == "/v1/playlists/paged/tracks":
+            self._send_json(200, {"items": [{"track": {"uri": "spotify:track:3"}}], "next": None}, chunked=True)
+        elif path == "/v1/playlists/limited":
+            self.server.limited_count += 1
+            if self.server.limited_count == 1:
+                self._send_json(429, {"error": {"status": 429, "message": "API rate limit exceeded"}},
+                                headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+            else:
+                self._send_json(200, {"name": "limited"})
+        elif path == "/v1/playlists/plain":
+            self._send_json(200, {"name": "plain"})
+        else:
+            self._send_json(404, {"error": {"status": 404, "message": "Not found."}})
+
+    def _send_json(self, status, data, headers=None, chunked=False):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+
+        if chunked:
+            # the body is split into chunks of 10 bytes
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for start in range(0, len(body), 10):
+                chunk = body[start:start + 10]
+                self.wfile.write(format(len(chunk), "x").encode("ascii") + b"\r\n" + chunk + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        # keep the test output clean
+        pass
+
+
+class _SlowAuthManager(object):
+    """
+    An auth manager that blocks for a while, like SpotifyOAuth when it refreshes the access token
+    """
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.call_count = 0
+        self.finished_at = None
+
+    def get_access_token(self, as_dict=True):
+        self.call_count += 1
+        time.sleep(self.delay)
+        self.finished_at = time.monotonic()
+        return "slow-token"
+
+
+class AsyncSpotifyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _SpotifyStandIn)
+        self.server.url = "http://127.0.0.1:" + str(self.server.server_port) + "/v1/"
+        self.server.requests = []
+        self.server.limited_count = 0
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+
+        # a scheduler of its own, so the rate and pauses of the process wide scheduler are not changed by the test
+        self.scheduler = Request_operations.RequestScheduler(rate=1000.0, burst=1000, max_rate=1000.0,
+                                                             base_backoff=0.01)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.server_thread.join()
+
+    def create_client(self, **kwargs):
+        kwargs.setdefault("access_token", "test-token")
+        return Async_operations.AsyncSpotify(base_url=self.server.url, scheduler=self.scheduler, **kwargs)
+
+    def run_with_client(self, client, coroutine_function):
+        async def run():
+            try:
+                return await coroutine_function(client)
+            finally:
+                await client.close()
+
+        return asyncio.run(run())
+
+    def test_pages_are_followed_and_chunked_bodies_are_read(self):
+        async def read_all_items(asp):
+            first_page = await asp.playlist_items("spotify:playlist:paged", limit=2)
+            return [item["track"]["uri"] async for item in Request_operations.iterate_pages_async(asp, first_page)]
+
+        uris = self.run_with_client(self.create_client(), read_all_items)
+
+        self.assertEqual(["spotify:track:1", "spotify:track:2", "spotify:track:3"], uris)
+        self.assertEqual(2, len(self.server.requests))
+        self.assertTrue(all(token == "Bearer test-token" for _, token in self.server.requests))
+
+    def test_429_is_retried_after_retry_after(self):
+        start = time.monotonic()
+        playlist = self.run_with_client(self.create_client(), lambda asp: asp.playlist("limited"))
+
+        self.assertEqual({"name": "limited"}, playlist)
+        self.assertEqual(2, self.server.limited_count)
+        self.assertGreaterEqual(time.monotonic() - start, RETRY_AFTER_SECONDS)
+
+    def test_errors_are_raised_as_spotify_exception(self):
+        with self.assertRaises(spotipy.SpotifyException) as context:
+            self.run_with_client(self.create_client(), lambda asp: asp.playlist("missing"))
+
+        self.assertEqual(404, context.exception.http_status)
+        self.assertIn("Not found.", context.exception.msg)
+
+    def test_token_is_read_without_blocking_the_event_loop(self):
+        auth_manager = _SlowAuthManager(delay=0.3)
+
+        async def fetch_while_ticking(asp):
+            ticks = []
+
+            async def tick():
+                # runs while the token is read, as long as the auth manager doesn't block the event loop
+                while len(ticks) < 5:
+                    ticks.append(time.monotonic())
+                    await asyncio.sleep(0.02)
+
+            playlists = await asyncio.gather(asp.playlist("plain"), asp.playlist("plain"), tick())
+            return playlists[:2], ticks
+
+        playlists, ticks = self.run_with_client(self.create_client(access_token=None, auth_manager=auth_manager),
+                                                fetch_while_ticking)
+
+        self.assertEqual([{"name": "plain"}] * 2, playlists)
+        # every tick happened while the auth manager was still busy
+        self.assertLess(ticks[-1], auth_manager.finished_at)
+        # both requests waited for the same token
+        self.assertEqual(1, auth_manager.call_count)
+        self.assertTrue(all(token == "Bearer slow-token" for _, token in self.server.requests))
+
+
+if __name__ == "__main__":
+    unittest.main()